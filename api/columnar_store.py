@@ -0,0 +1,268 @@
+# api/columnar_store.py
+import os
+import shutil
+import tempfile
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from api.derivative_io import logical_path, stored_path
+from api.sorted_derivatives import read_range
+
+# <base>.parquet next to <base>.jsonl: the same events, in the same order, as typed columns
+COLUMNAR_SUFFIX = ".parquet"
+# Rows per Parquet row group (and per write batch)
+COLUMNAR_ROW_GROUP = int(os.getenv("COLUMNAR_ROW_GROUP", "65536"))
+COLUMNAR_COMPRESSION = os.getenv("COLUMNAR_COMPRESSION", "zstd")
+
+_DICT = pa.dictionary(pa.int32(), pa.string())
+
+# "offset" is the byte offset of the event's line in the .jsonl, "timestamp"
+# its timeline time (the ts_us field of the line)
+SCHEMAS: Dict[str, pa.Schema] = {
+    "evtx": pa.schema([
+        ("offset", pa.uint64()),
+        ("timestamp", pa.timestamp("us")),
+        ("record_number", pa.int64()),
+        ("event_id", pa.int32()),
+        ("channel", _DICT),
+        ("computer", _DICT),
+        ("data", pa.map_(pa.string(), pa.string())),
+    ]),
+    "registry": pa.schema([
+        ("offset", pa.uint64()),
+        ("timestamp", pa.timestamp("us")),
+        ("hive", _DICT),
+        ("category", _DICT),
+        ("key_path", _DICT),
+        ("value_name", pa.string()),
+        ("value", pa.string()),
+        ("value_type", _DICT),
+    ]),
+}
+
+# Derivative fields the timeline reads, per source (see api/timeline.py:timeline_event)
+TIMELINE_COLUMNS: Dict[str, List[str]] = {
+    "evtx": ["offset", "timestamp", "event_id", "channel", "computer", "data"],
+    "registry": ["offset", "timestamp", "hive", "category", "key_path", "value_name", "value"],
+}
+
+
+def columnar_path(jsonl_path: str) -> str:
+    return os.path.splitext(logical_path(jsonl_path))[0] + COLUMNAR_SUFFIX
+
+
+def _text(value: Any) -> Optional[str]:
+    """Values of any JSON type as the text the timeline shows for them."""
+    if value is None or isinstance(value, str):
+        return value
+    return str(value)
+
+
+def _int(value: Any) -> Optional[int]:
+    return value if isinstance(value, int) and not isinstance(value, bool) else None
+
+
+def _row(source: str, event: Dict[str, Any], offset: int) -> List[Any]:
+    ts_us = _int(event.get("ts_us"))
+    if source == "evtx":
+        data = event.get("data")
+        return [
+            offset, ts_us, _int(event.get("record_number")), _int(event.get("event_id")),
+            _text(event.get("channel")), _text(event.get("computer")),
+            list(data.items()) if isinstance(data, dict) else None,
+        ]
+    return [
+        offset, ts_us, _text(event.get("hive")), _text(event.get("category")), _text(event.get("key_path")),
+        _text(event.get("value_name")), _text(event.get("value")), _text(event.get("value_type")),
+    ]
+
+
+class ColumnarWriter:
+    """
+    Writes one derivative's events as <base>.parquet, a row group at a time.
+    Driven by SortedDerivativeWriter, which hands over each event with its
+    line offset and, if the lines had to be reordered, the final order.
+    """
+
+    def __init__(self, source: str, jsonl_path: str):
+        self.source = source
+        self.schema = SCHEMAS[source]
+        self.path = columnar_path(jsonl_path)
+        self._tmp = self.path + ".tmp"
+        self._writer = pq.ParquetWriter(self._tmp, self.schema, compression=COLUMNAR_COMPRESSION)
+        self._rows: List[List[Any]] = []
+
+    def write(self, event: Dict[str, Any], offset: int) -> None:
+        self._rows.append(_row(self.source, event, offset))
+        if len(self._rows) >= COLUMNAR_ROW_GROUP:
+            self._flush()
+
+    def _flush(self) -> None:
+        if not self._rows:
+            return
+        columns = list(zip(*self._rows))
+        self._rows = []
+        arrays = []
+        for col, field in zip(columns, self.schema):
+            try:
+                arrays.append(pa.array(col, type=field.type))
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                # EVTX data values are strings; anything else is stored as its text
+                col = [None if d is None else [(str(k), _text(v)) for k, v in d] for d in col]
+                arrays.append(pa.array(col, type=field.type))
+        self._writer.write_table(pa.Table.from_arrays(arrays, schema=self.schema), row_group_size=COLUMNAR_ROW_GROUP)
+
+    def finish(self, order: Optional[np.ndarray] = None, offsets: Optional[np.ndarray] = None) -> None:
+        """
+        Close the file. order (row -> written row) and offsets (new line
+        offset per row) are given when the .jsonl lines were reordered.
+        """
+        self._flush()
+        self._writer.close()
+        if order is None:
+            os.replace(self._tmp, self.path)
+            return
+        with pq.ParquetFile(self._tmp) as pf:
+            if pf.metadata.num_rows <= COLUMNAR_ROW_GROUP:
+                # one row group: no cheaper way than reading it
+                table = pq.read_table(self._tmp).take(pa.array(order))
+                table = table.set_column(0, "offset", pa.array(offsets, type=pa.uint64()))
+                pq.write_table(table, self.path, compression=COLUMNAR_COMPRESSION, row_group_size=COLUMNAR_ROW_GROUP)
+            else:
+                self._reorder(pf, order, offsets)
+        os.remove(self._tmp)
+
+    def _reorder(self, pf: pq.ParquetFile, order: np.ndarray, offsets: np.ndarray) -> None:
+        """
+        Rewrite the rows in the given order a row group at a time, so memory
+        holds one row group (plus order's inverse), not the file: pass one
+        deals each written row group's rows to the output row group they
+        belong to (an Arrow stream per output group, in a temp directory),
+        pass two sorts each output group and writes it.
+        """
+        size = COLUMNAR_ROW_GROUP
+        position = np.empty(len(order), dtype=np.int64)  # written row -> new row
+        position[order] = np.arange(len(order))
+        n_groups = (len(order) + size - 1) // size
+        parts_dir = tempfile.mkdtemp(dir=os.path.dirname(self.path) or ".", prefix=".columnar.")
+        try:
+            schema = self.schema.append(pa.field("_position", pa.int64()))
+            parts = [pa.ipc.new_stream(os.path.join(parts_dir, f"{g}.arrows"), schema) for g in range(n_groups)]
+            try:
+                start = 0
+                for batch in pf.iter_batches(batch_size=size):
+                    new = position[start : start + batch.num_rows]
+                    start += batch.num_rows
+                    by_group = np.argsort(new // size, kind="stable")
+                    groups = new[by_group] // size
+                    bounds = np.flatnonzero(np.diff(groups)) + 1
+                    for rows in np.split(by_group, bounds):
+                        piece = batch.take(pa.array(rows)).append_column("_position", pa.array(new[rows]))
+                        parts[int(new[rows[0]] // size)].write_batch(piece)
+            finally:
+                for part in parts:
+                    part.close()
+
+            writer = pq.ParquetWriter(self.path, self.schema, compression=COLUMNAR_COMPRESSION)
+            try:
+                for g in range(n_groups):
+                    with pa.OSFile(os.path.join(parts_dir, f"{g}.arrows")) as f:
+                        table = pa.ipc.open_stream(f).read_all()
+                    table = table.take(pa.array(np.argsort(table.column("_position").to_numpy())))
+                    table = table.drop_columns(["_position"])
+                    table = table.set_column(0, "offset", pa.array(offsets[g * size : (g + 1) * size], type=pa.uint64()))
+                    writer.write_table(table, row_group_size=size)
+            finally:
+                writer.close()
+        finally:
+            shutil.rmtree(parts_dir, ignore_errors=True)
+
+    def abort(self) -> None:
+        try:
+            self._writer.close()
+        except Exception:
+            pass
+        try:
+            os.remove(self._tmp)
+        except OSError:
+            pass
+
+
+def open_columnar(jsonl_path: str) -> Optional[pq.ParquetFile]:
+    """
+    The derivative's columnar copy, or None if there is none or it wasn't
+    written with the current .jsonl (checked against the .range.json sidecar).
+    """
+    info = read_range(jsonl_path)
+    stamp = (info or {}).get("columnar")
+    if not stamp:
+        return None
+    path = columnar_path(jsonl_path)
+    try:
+        st = os.stat(path)
+        if stamp.get("size") != st.st_size or stamp.get("mtime_ns") != st.st_mtime_ns:
+            return None
+        return pq.ParquetFile(path)
+    except (OSError, pa.ArrowException):
+        return None
+
+
+def _pylist(array: pa.Array) -> List[Any]:
+    """array.to_pylist(), several times faster for string and dictionary columns."""
+    if pa.types.is_dictionary(array.type):
+        values = _pylist(array.dictionary)
+        if array.null_count:
+            return [None if i is None else values[i] for i in array.indices.to_pylist()]
+        return [values[i] for i in array.indices.to_numpy().tolist()]
+    if pa.types.is_string(array.type) or pa.types.is_large_string(array.type):
+        return array.to_numpy(zero_copy_only=False).tolist()
+    return array.to_pylist()
+
+
+def _dicts(array: pa.MapArray) -> List[Optional[Dict[str, Any]]]:
+    keys, items = _pylist(array.keys), _pylist(array.items)
+    offsets = array.offsets.to_numpy().tolist()
+    valid = array.is_valid().to_numpy(zero_copy_only=False).tolist()
+    return [
+        dict(zip(keys[offsets[i]:offsets[i + 1]], items[offsets[i]:offsets[i + 1]])) if valid[i] else None
+        for i in range(len(array))
+    ]
+
+
+def iter_columnar_records(
+    pf: pq.ParquetFile, columns: Sequence[str], batch_size: int = COLUMNAR_ROW_GROUP
+) -> Iterator[Dict[str, Any]]:
+    """
+    Records with just the given columns, shaped like the .jsonl lines:
+    "timestamp" becomes ts_us (epoch microseconds) and "data" a dict.
+    """
+    if pf.metadata.num_row_groups == 0:
+        return  # a derivative without events (empty hive, no matching EVTX records)
+    columns = list(columns)
+    names = ["ts_us" if name == "timestamp" else name for name in columns]
+    for batch in pf.iter_batches(batch_size=batch_size, columns=columns):
+        values = []
+        for name in columns:
+            col = batch.column(name)
+            if name == "timestamp":
+                values.append(col.cast(pa.int64()).to_pylist())
+            elif name == "data":
+                values.append(_dicts(col))
+            else:
+                values.append(_pylist(col))
+        for row in zip(*values):
+            yield dict(zip(names, row))
+
+
+def columnar_stats(jsonl_path: str) -> Dict[str, Any]:
+    """Sizes of a derivative's row and columnar forms, for reports and benches."""
+    out: Dict[str, Any] = {"jsonl_bytes": os.path.getsize(stored_path(jsonl_path))}
+    pf = open_columnar(jsonl_path)
+    if pf is not None:
+        out["parquet_bytes"] = os.path.getsize(columnar_path(jsonl_path))
+        out["rows"] = pf.metadata.num_rows
+        out["ratio"] = round(out["jsonl_bytes"] / max(1, out["parquet_bytes"]), 2)
+    return out
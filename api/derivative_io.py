@@ -0,0 +1,252 @@
+# api/derivative_io.py
+import io
+import os
+import struct
+from bisect import bisect_right
+from typing import Any, List, Optional, Union
+
+import zstandard
+
+# Derivatives (artifacts/*/<base>.jsonl/.txt, *_summaries.jsonl) are stored
+# as <name>.zst in the zstd seekable format: independent frames plus a seek
+# table, so readers can seek to any uncompressed offset. "none" writes them plain.
+DERIVATIVE_COMPRESSION = os.getenv("DERIVATIVE_COMPRESSION", "zstd").lower()
+DERIVATIVE_ZSTD_LEVEL = int(os.getenv("DERIVATIVE_ZSTD_LEVEL", "3"))
+# Uncompressed bytes per frame: a random read decompresses at most one frame
+DERIVATIVE_FRAME_BYTES = int(os.getenv("DERIVATIVE_FRAME_BYTES", str(256 * 1024)))
+
+ZSTD_SUFFIX = ".zst"
+
+# https://github.com/facebook/zstd/blob/dev/contrib/seekable_format/zstd_seekable_compression_format.md
+_SKIPPABLE_MAGIC = 0x184D2A5E
+_SEEKABLE_MAGIC = 0x8F92EAB1
+_FOOTER = struct.Struct("<IBI")  # number of frames, descriptor, seekable magic
+_ENTRY = struct.Struct("<II")  # compressed size, decompressed size
+
+_COPY_BLOCK = 1 << 20
+
+
+def compress_derivatives() -> bool:
+    return DERIVATIVE_COMPRESSION == "zstd"
+
+
+def logical_path(path: str) -> str:
+    """The name a derivative is known by, whether it is stored compressed or not."""
+    return path[: -len(ZSTD_SUFFIX)] if path.endswith(ZSTD_SUFFIX) else path
+
+
+def stored_path(path: str) -> str:
+    """Where the derivative named path is on disk: <path>.zst if present, else path."""
+    path = logical_path(path)
+    compressed = path + ZSTD_SUFFIX
+    return compressed if os.path.exists(compressed) else path
+
+
+def derivative_exists(path: str) -> bool:
+    return os.path.exists(stored_path(path))
+
+
+class DerivativeWriter:
+    """
+    Writes a derivative (bytes or str, UTF-8) to <path>.zst, or to path when
+    compression is off, through a temp file swapped in on close(). The other
+    form of the same derivative, if any, is removed then.
+    """
+
+    def __init__(self, path: str, compress: Optional[bool] = None):
+        if compress is None:
+            compress = compress_derivatives()
+        base = logical_path(path)
+        self.path = base + ZSTD_SUFFIX if compress else base
+        self._other = base if compress else base + ZSTD_SUFFIX
+        self._tmp = self.path + ".part"
+        self._f = open(self._tmp, "wb")
+        self._compress = compress
+        self._cctx = zstandard.ZstdCompressor(level=DERIVATIVE_ZSTD_LEVEL) if compress else None
+        self._buf = bytearray()
+        self._frames: List[bytes] = []
+        self.bytes_in = 0
+
+    def write(self, data: Union[bytes, str]) -> int:
+        if isinstance(data, str):
+            data = data.encode("utf-8", "surrogatepass")
+        self.bytes_in += len(data)
+        if not self._compress:
+            self._f.write(data)
+            return len(data)
+        self._buf += data
+        while len(self._buf) >= DERIVATIVE_FRAME_BYTES:
+            self._frame(bytes(self._buf[:DERIVATIVE_FRAME_BYTES]))
+            del self._buf[:DERIVATIVE_FRAME_BYTES]
+        return len(data)
+
+    def _frame(self, data: bytes) -> None:
+        frame = self._cctx.compress(data)
+        self._f.write(frame)
+        self._frames.append(_ENTRY.pack(len(frame), len(data)))
+
+    def take(self, src_path: str) -> None:
+        """Finish with the content of the plain file src_path, which is consumed."""
+        if self._compress:
+            with open(src_path, "rb") as src:
+                while True:
+                    block = src.read(_COPY_BLOCK)
+                    if not block:
+                        break
+                    self.write(block)
+            self.close()
+            os.remove(src_path)
+            return
+        self.abort()
+        self.bytes_in = os.path.getsize(src_path)
+        os.replace(src_path, self.path)
+        try:
+            os.remove(self._other)
+        except OSError:
+            pass
+
+    def close(self) -> None:
+        if self._f.closed:
+            return
+        if self._compress:
+            if self._buf:
+                self._frame(bytes(self._buf))
+                self._buf = bytearray()
+            table = b"".join(self._frames) + _FOOTER.pack(len(self._frames), 0, _SEEKABLE_MAGIC)
+            self._f.write(struct.pack("<II", _SKIPPABLE_MAGIC, len(table)) + table)
+        self._f.close()
+        os.replace(self._tmp, self.path)
+        try:
+            os.remove(self._other)
+        except OSError:
+            pass
+
+    def abort(self) -> None:
+        try:
+            self._f.close()
+            os.remove(self._tmp)
+        except OSError:
+            pass
+
+    def __enter__(self) -> "DerivativeWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class _SeekableZstdReader(io.RawIOBase):
+    """Raw reader over a seekable .zst: offsets, seek() and tell() are in uncompressed bytes."""
+
+    def __init__(self, path: str):
+        self._f = open(path, "rb")
+        try:
+            self._read_seek_table()
+        except Exception:
+            self._f.close()
+            raise
+        self._dctx = zstandard.ZstdDecompressor()
+        self._pos = 0
+        self._frame_no = -1
+        self._frame = b""
+
+    def _read_seek_table(self) -> None:
+        size = self._f.seek(0, os.SEEK_END)
+        if size < _FOOTER.size:
+            raise ValueError("not a seekable zstd file")
+        self._f.seek(size - _FOOTER.size)
+        frames, descriptor, magic = _FOOTER.unpack(self._f.read(_FOOTER.size))
+        if magic != _SEEKABLE_MAGIC:
+            raise ValueError("not a seekable zstd file (no seek table)")
+        entry_size = _ENTRY.size + (4 if descriptor & 0x80 else 0)
+        self._f.seek(size - _FOOTER.size - frames * entry_size)
+        table = self._f.read(frames * entry_size)
+        self._c_offsets = [0]
+        self._d_offsets = [0]
+        for i in range(frames):
+            c_size, d_size = _ENTRY.unpack_from(table, i * entry_size)
+            self._c_offsets.append(self._c_offsets[-1] + c_size)
+            self._d_offsets.append(self._d_offsets[-1] + d_size)
+
+    @property
+    def length(self) -> int:
+        return self._d_offsets[-1]
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        if whence == os.SEEK_CUR:
+            offset += self._pos
+        elif whence == os.SEEK_END:
+            offset += self.length
+        if offset < 0:
+            raise ValueError("negative seek position")
+        self._pos = offset
+        return offset
+
+    def _load(self, frame_no: int) -> None:
+        if frame_no != self._frame_no:
+            self._f.seek(self._c_offsets[frame_no])
+            compressed = self._f.read(self._c_offsets[frame_no + 1] - self._c_offsets[frame_no])
+            self._frame = self._dctx.decompress(
+                compressed, max_output_size=self._d_offsets[frame_no + 1] - self._d_offsets[frame_no]
+            )
+            self._frame_no = frame_no
+
+    def readinto(self, b: Any) -> int:
+        if self._pos >= self.length:
+            return 0
+        frame_no = bisect_right(self._d_offsets, self._pos) - 1
+        self._load(frame_no)
+        start = self._pos - self._d_offsets[frame_no]
+        n = min(len(b), len(self._frame) - start)
+        b[:n] = self._frame[start : start + n]
+        self._pos += n
+        return n
+
+    def close(self) -> None:
+        if not self.closed:
+            self._f.close()
+        super().close()
+
+
+def open_derivative(path: str, mode: str = "rb", buffering: int = 1 << 16):
+    """
+    Open a derivative for reading by its plain name or stored name, whichever
+    form it is stored in. "rb" gives a seekable binary file (positions are
+    uncompressed byte offsets, as in the plain file); "r" a UTF-8 text file
+    with undecodable bytes dropped.
+    """
+    if mode not in ("rb", "r"):
+        raise ValueError(f"Unsupported mode {mode!r}")
+    path = stored_path(path)
+    if not path.endswith(ZSTD_SUFFIX):
+        if mode == "r":
+            return open(path, "r", encoding="utf-8", errors="ignore")
+        return open(path, "rb")
+    f = io.BufferedReader(_SeekableZstdReader(path), buffer_size=buffering)
+    if mode == "r":
+        return io.TextIOWrapper(f, encoding="utf-8", errors="ignore")
+    return f
+
+
+def derivative_length(path: str) -> int:
+    """Uncompressed size of a derivative."""
+    path = stored_path(path)
+    if not path.endswith(ZSTD_SUFFIX):
+        return os.path.getsize(path)
+    reader = _SeekableZstdReader(path)
+    try:
+        return reader.length
+    finally:
+        reader.close()
@@ -0,0 +1,166 @@
+# api/embed_cache.py
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+ARTIFACT_DIR = os.environ.get("ARTIFACT_DIR", "/data/artifacts")
+
+# Set EMBED_CACHE_ENABLED=0 to always encode.
+EMBED_CACHE_ENABLED = os.getenv("EMBED_CACHE_ENABLED", "1") not in ("0", "false", "False", "")
+# A file at the top of ARTIFACT_DIR (a directory there would be listed as a case)
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", os.path.join(ARTIFACT_DIR, "embedding_cache.sqlite"))
+# ~1.5 KB per 384-d float32 vector; least recently used entries are evicted past this
+EMBED_CACHE_MAX_ENTRIES = int(os.getenv("EMBED_CACHE_MAX_ENTRIES", "1000000"))
+# Hits refresh their LRU time in memory; the refreshed times are written at
+# most this often (or with the next insert), so lookups stay read-only
+EMBED_CACHE_TOUCH_S = float(os.getenv("EMBED_CACHE_TOUCH_S", "60"))
+
+
+def normalize_text(text: str) -> str:
+    """
+    Whitespace-only normalization: the tokenizer splits on whitespace anyway,
+    so this never changes the vector a text encodes to.
+    """
+    return " ".join((text or "").split())
+
+
+class EmbeddingCache:
+    """
+    On-disk (SQLite) cache of normalized embeddings keyed by
+    sha256(model name + normalized text), with LRU eviction by entry count.
+    Safe to share between threads and between the api/worker processes.
+    """
+
+    def __init__(self, path: str, model_name: str, max_entries: int = EMBED_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.model_name = model_name
+        self.max_entries = max(1, int(max_entries))
+
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        # key -> last_used not yet written, see _flush_touches
+        self._touched: Dict[bytes, int] = {}
+        self._touch_flushed = time.monotonic()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key BLOB PRIMARY KEY,"
+            " vec BLOB NOT NULL,"
+            " last_used INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings(last_used)")
+        self._conn.commit()
+        self._entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def key(self, text: str) -> bytes:
+        return hashlib.sha256(f"{self.model_name}\0{normalize_text(text)}".encode("utf-8", "surrogatepass")).digest()
+
+    def get_many(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """Cached vectors in input order, None for misses. Hits are marked as used (see EMBED_CACHE_TOUCH_S)."""
+        keys = [self.key(t) for t in texts]
+        found: Dict[bytes, List[float]] = {}
+
+        with self._lock:
+            uniq = list(dict.fromkeys(keys))
+            for start in range(0, len(uniq), 500):
+                part = uniq[start : start + 500]
+                marks = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT key, vec FROM embeddings WHERE key IN ({marks})", part
+                ).fetchall()
+                for k, vec in rows:
+                    found[k] = np.frombuffer(vec, dtype=np.float32).tolist()
+
+            if found:
+                now = time.time_ns()
+                for k in found:
+                    self._touched[k] = now
+                if time.monotonic() - self._touch_flushed >= EMBED_CACHE_TOUCH_S:
+                    self._flush_touches()
+                    self._conn.commit()
+
+            out = [found.get(k) for k in keys]
+            hits = sum(1 for v in out if v is not None)
+            self._hits += hits
+            self._misses += len(out) - hits
+        return out
+
+    def put_many(self, texts: List[str], vectors: List[List[float]]) -> None:
+        if not texts:
+            return
+        now = time.time_ns()
+        rows = [
+            (self.key(t), np.asarray(v, dtype=np.float32).tobytes(), now)
+            for t, v in zip(texts, vectors)
+        ]
+        with self._lock:
+            self._flush_touches()
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, vec, last_used) VALUES (?, ?, ?)", rows
+            )
+            self._entries += self._conn.total_changes - before
+            if self._entries > self.max_entries:
+                self._evict()
+            self._conn.commit()
+
+    def _flush_touches(self) -> None:
+        """Write the pending LRU refreshes (the caller commits)."""
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE key = ?", [(t, k) for k, t in self._touched.items()]
+            )
+            self._touched = {}
+        self._touch_flushed = time.monotonic()
+
+    def _evict(self) -> None:
+        # Drop down to 90% so eviction isn't paid on every insert
+        target = int(self.max_entries * 0.9)
+        self._entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        excess = self._entries - target
+        if excess <= 0:
+            return
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE key IN ("
+            " SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+            (excess,),
+        )
+        self._entries -= excess
+        self._evictions += excess
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "enabled": True,
+                "path": self.path,
+                "model": self.model_name,
+                "entries": self._entries,
+                "max_entries": self.max_entries,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": (self._hits / lookups) if lookups else 0.0,
+                "evictions": self._evictions,
+            }
+
+
+def open_embedding_cache(model_name: str) -> Optional[EmbeddingCache]:
+    """Cache configured from the environment, or None if disabled/unavailable."""
+    if not EMBED_CACHE_ENABLED:
+        return None
+    try:
+        return EmbeddingCache(EMBED_CACHE_PATH, model_name)
+    except Exception as e:
+        print(f"[EMBED_CACHE] disabled, cannot open {EMBED_CACHE_PATH}: {e}")
+        return None
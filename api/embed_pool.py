@@ -0,0 +1,122 @@
+# api/embed_pool.py
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+# Separate embedding processes, each with its own model copy. 0 = disabled
+# (encode in the API process, as before).
+EMBED_POOL_SIZE = int(os.getenv("EMBED_POOL_SIZE", "0"))
+# torch/onnxruntime threads per pool process; 0 = cores / pool size
+EMBED_POOL_THREADS = int(os.getenv("EMBED_POOL_THREADS", "0"))
+# Texts per task sent to a pool process
+EMBED_POOL_SHARD = int(os.getenv("EMBED_POOL_SHARD", "256"))
+# Smaller encodes (e.g. search queries) stay in-process and never queue behind a reindex
+EMBED_POOL_MIN_TEXTS = int(os.getenv("EMBED_POOL_MIN_TEXTS", "256"))
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+_stats = {"shards": 0, "texts": 0, "restarts": 0}
+_stats_lock = threading.Lock()
+
+# Per-process model, set by _init_worker in each pool process
+_worker_model = None
+
+
+def _threads_per_process() -> int:
+    if EMBED_POOL_THREADS > 0:
+        return EMBED_POOL_THREADS
+    return max(1, (os.cpu_count() or 1) // max(1, EMBED_POOL_SIZE))
+
+
+def _init_worker(backend: str, threads: int) -> None:
+    global _worker_model
+    from api.embedder import load_model
+
+    _worker_model = load_model(backend, threads=threads)
+
+
+def _encode_shard(texts: List[str]) -> np.ndarray:
+    return np.asarray(_worker_model.encode(texts, normalize_embeddings=True), dtype=np.float32)
+
+
+def pool_enabled() -> bool:
+    return EMBED_POOL_SIZE > 0
+
+
+def _get_pool(backend: str) -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            threads = _threads_per_process()
+            print(f"[EMBED_POOL] starting {EMBED_POOL_SIZE} processes x {threads} threads ({backend})")
+            # spawn: the API process has threads (and maybe a loaded model) that must not be forked
+            _pool = ProcessPoolExecutor(
+                max_workers=EMBED_POOL_SIZE,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(backend, threads),
+            )
+        return _pool
+
+
+def _reset_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+            with _stats_lock:
+                _stats["restarts"] += 1
+
+
+def pool_encode_iter(texts: List[str], backend: str) -> Iterator[np.ndarray]:
+    """
+    Shard texts across the pool and yield each shard's normalized vectors in
+    input order, as soon as that shard (and all before it) are done.
+    """
+    shards = [texts[i : i + EMBED_POOL_SHARD] for i in range(0, len(texts), EMBED_POOL_SHARD)]
+    try:
+        for vecs in _get_pool(backend).map(_encode_shard, shards):
+            with _stats_lock:
+                _stats["shards"] += 1
+                _stats["texts"] += len(vecs)
+            yield vecs
+    except BrokenProcessPool:
+        # A worker died (e.g. OOM); start a fresh pool next time
+        _reset_pool()
+        raise
+
+
+def pool_encode(texts: List[str], backend: str) -> List[List[float]]:
+    out: List[List[float]] = []
+    for vecs in pool_encode_iter(texts, backend):
+        out.extend(vecs.tolist())
+    return out
+
+
+def embed_pool_stats() -> Dict[str, Any]:
+    if not pool_enabled():
+        return {"enabled": False}
+    with _stats_lock:
+        stats = dict(_stats)
+    return {
+        "enabled": True,
+        "processes": EMBED_POOL_SIZE,
+        "threads_per_process": _threads_per_process(),
+        "running": _pool is not None,
+        "min_texts": EMBED_POOL_MIN_TEXTS,
+        **stats,
+    }
+
+
+def shutdown_embed_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True, cancel_futures=True)
+            _pool = None
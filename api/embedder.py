@@ -1,90 +1,300 @@
 # api/embedder.py
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Optional
 import os
-import uuid
+import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
 
-import chromadb
-from sentence_transformers import SentenceTransformer
+from api.embed_cache import open_embedding_cache, normalize_text
+from api.embed_pool import EMBED_POOL_MIN_TEXTS, pool_enabled, pool_encode
+from api.lexical_index import open_lexical_index
+from api.search_filters import build_where, filters_cache_key, normalize_filters, where_matcher
+from api.search_cache import (
+    case_generation,
+    invalidate_case_results,
+    query_embedding_cache,
+    search_result_cache,
+)
+from api.vector_store import VECTOR_STORE, make_vector_store
 
-# Use a single model for BOTH indexing and querying
-_model = SentenceTransformer("all-MiniLM-L6-v2")
+EMBED_MODEL_NAME = "all-MiniLM-L6-v2"
 
-CHROMA_HOST = os.getenv("CHROMA_HOST", "chroma")  # docker-compose service name
-CHROMA_PORT = int(os.getenv("CHROMA_PORT", "8000"))
+# torch = sentence-transformers (PyTorch, fp32); onnx = ONNX Runtime export (fp32);
+# onnx-int8 = the same export with int8 dynamic quantization. See api/onnx_embedder.py.
+EMBED_BACKENDS = ("torch", "onnx", "onnx-int8")
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "torch").strip().lower()
+
+# Use a single model for BOTH indexing and querying.
+# The model and the vector store (and their heavy imports) load on first use,
+# so importing this module stays cheap for code paths that never embed.
+_model = None
+_model_lock = threading.Lock()
+_store = None
+_store_lock = threading.Lock()
+
+# Seconds spent in each lazy load, for /metrics
+_load_times: Dict[str, float] = {}
+
+# On-disk cache of normalized vectors, shared by indexing and querying, opened
+# on first encode (not in every process that imports this module, such as the
+# embed pool workers). ONNX vectors are cached apart from the torch ones they approximate.
+_cache = None
+_cache_opened = False
+_cache_lock = threading.Lock()
 
 # Cosine distance threshold: 0 = identical, ~1 = very far
 # Start stricter for demos (0.55–0.65). Loosen only if too many empty results.
 SEARCH_MAX_DISTANCE = float(os.getenv("SEARCH_MAX_DISTANCE", "0.70"))
 
+# vector | lexical | hybrid (see semantic_search)
+SEARCH_MODES = ("vector", "lexical", "hybrid")
+# Candidates taken from each side before fusing (lexical/hybrid modes)
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "50"))
+# Reciprocal rank fusion constant; 60 is the usual choice
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+# Cross-case search (semantic_search_cases): cases searched in parallel, and
+# the default time budget after which slow cases are reported, not awaited
+CROSS_CASE_WORKERS = int(os.getenv("CROSS_CASE_WORKERS", "8"))
+CROSS_CASE_BUDGET_S = float(os.getenv("CROSS_CASE_BUDGET_S", "5"))
+_cross_case_pool = None
+_cross_case_lock = threading.Lock()
 
-def _make_client():
+
+def load_model(backend: str = EMBED_BACKEND, threads: Optional[int] = None):
     """
-    In docker-compose you should ALWAYS talk to the chroma service.
-    Avoid falling back to PersistentClient('/data') because that creates a *different*
-    DB in your artifacts volume and causes confusing 'count=0' mismatches.
+    A model with SentenceTransformer's encode() for the given backend.
+    threads caps the intra-op threads (None = library default).
     """
-    return chromadb.HttpClient(host=CHROMA_HOST, port=CHROMA_PORT)
+    if backend == "torch":
+        from sentence_transformers import SentenceTransformer
 
+        if threads:
+            import torch
 
-_client = _make_client()
+            torch.set_num_threads(threads)
+        return SentenceTransformer(EMBED_MODEL_NAME)
+    if backend in EMBED_BACKENDS:
+        from api.onnx_embedder import load_onnx_embedder
 
+        kwargs = {"threads": threads} if threads else {}
+        return load_onnx_embedder(EMBED_MODEL_NAME, quantized=backend == "onnx-int8", **kwargs)
+    raise ValueError(f"EMBED_BACKEND must be one of {', '.join(EMBED_BACKENDS)}, got {backend!r}")
 
-def _get_collection(case_id: str):
-    return _client.get_or_create_collection(
-        name=f"case_{case_id}",
-        metadata={"hnsw:space": "cosine"},
-    )
 
+def _get_model():
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                t0 = time.perf_counter()
+                model = load_model(EMBED_BACKEND)
+                _load_times["model_load_s"] = round(time.perf_counter() - t0, 3)
+                print(f"[EMBED] loaded {EMBED_MODEL_NAME} ({EMBED_BACKEND}) in {_load_times['model_load_s']}s")
+                _model = model
+    return _model
+
+
+def _get_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = make_vector_store(VECTOR_STORE)
+    return _store
+
+
+def _get_cache():
+    """The embedding cache, or None if it is disabled or can't be opened."""
+    global _cache, _cache_opened
+    if not _cache_opened:
+        with _cache_lock:
+            if not _cache_opened:
+                _cache = open_embedding_cache(
+                    EMBED_MODEL_NAME if EMBED_BACKEND == "torch" else f"{EMBED_MODEL_NAME}:{EMBED_BACKEND}"
+                )
+                _cache_opened = True
+    return _cache
+
+
+def warm_up() -> Dict[str, float]:
+    """
+    Load the model and connect the vector store now instead of on the first
+    request, and run one encode so the first real query doesn't pay for it either.
+    """
+    t0 = time.perf_counter()
+    _get_model().encode(["warm up"], normalize_embeddings=True)
+    _get_store().connect()
+    _load_times["warm_up_s"] = round(time.perf_counter() - t0, 3)
+    return dict(_load_times)
+
+
+def embedder_load_stats() -> Dict[str, Any]:
+    return {
+        "backend": EMBED_BACKEND,
+        "model_loaded": _model is not None,
+        "vector_store": VECTOR_STORE,
+        "client_connected": _store is not None and _store.connected(),
+        **_load_times,
+    }
+
+
+def invalidate_collection(case_id: str) -> None:
+    """Forget what the store cached for the case; the next use opens it again."""
+    _get_store().forget_case(case_id)
+    invalidate_case_results(case_id)
+
+
+def delete_case_collection(case_id: str) -> None:
+    try:
+        _get_store().delete_case(case_id)
+    finally:
+        invalidate_case_results(case_id)
+
+
+def vector_store_stats() -> Dict[str, Any]:
+    if _store is None:
+        return {"backend": VECTOR_STORE, "connected": False}
+    return _store.stats()
+
+
+def _encode_uncached(texts: List[str]) -> List[List[float]]:
+    # Large batches (reindex) go to the embedding processes so this process
+    # stays free for requests; small ones (queries) are encoded right here.
+    if pool_enabled() and len(texts) >= EMBED_POOL_MIN_TEXTS:
+        try:
+            return pool_encode(texts, EMBED_BACKEND)
+        except Exception as e:
+            print(f"[EMBED_POOL] failed, encoding in-process: {e}")
+    return _get_model().encode(texts, normalize_embeddings=True).tolist()
+
+
+def _encode(texts: List[str]) -> List[List[float]]:
+    """
+    Normalized embeddings for texts, in order. Cached vectors are reused;
+    only the misses are batch-encoded (once per distinct text) and stored.
+    """
+    cache = _get_cache()
+    if cache is None:
+        return _encode_uncached(texts)
+
+    try:
+        vectors = cache.get_many(texts)
+    except Exception as e:
+        print(f"[EMBED_CACHE] lookup failed: {e}")
+        vectors = [None] * len(texts)
+
+    missing: Dict[str, List[int]] = {}
+    for i, vec in enumerate(vectors):
+        if vec is None:
+            missing.setdefault(texts[i], []).append(i)
+
+    if missing:
+        miss_texts = list(missing)
+        fresh = _encode_uncached(miss_texts)
+        for text, vec in zip(miss_texts, fresh):
+            for i in missing[text]:
+                vectors[i] = vec
+        try:
+            cache.put_many(miss_texts, fresh)
+        except Exception as e:
+            print(f"[EMBED_CACHE] store failed: {e}")
 
-def embed_texts(case_id: str, texts: List[str], metadata_list: List[Dict[str, Any]]) -> None:
+    return vectors
+
+
+def embedding_cache_stats() -> Dict[str, Any]:
+    cache = _get_cache()
+    if cache is None:
+        return {"enabled": False}
+    return cache.stats()
+
+
+def chunk_id(case_id: str, text: str, metadata: Dict[str, Any]) -> str:
+    """
+    Content-addressed ID from (source file, line/chunk index, text), so the
+    same chunk gets the same ID on every reindex.
+    """
+    meta = metadata or {}
+    index = meta.get("line", meta.get("chunk"))
+    key = "\x1f".join([str(meta.get("file") or ""), "" if index is None else str(index), text])
+    digest = hashlib.sha256(key.encode("utf-8", "surrogatepass")).hexdigest()[:32]
+    return f"{case_id}_{digest}"
+
+
+def embed_texts(case_id: str, texts: List[str], metadata_list: List[Dict[str, Any]]) -> Dict[str, int]:
+    """
+    Upsert chunks into the case's vector store. Only chunks whose ID is not in
+    it yet are embedded; for existing ones only the metadata is refreshed.
+
+    Returns {"added": n, "unchanged": n}.
+    """
     if not texts:
-        return
+        return {"added": 0, "unchanged": 0}
     if len(texts) != len(metadata_list):
         raise ValueError("texts and metadata_list must have same length")
 
-    coll = _get_collection(case_id)
-
-    # Normalize vectors so cosine distances behave correctly
-    embeddings = _model.encode(texts, normalize_embeddings=True).tolist()
+    # Chroma rejects repeated IDs within one call; first occurrence wins
+    first: Dict[str, int] = {}
+    for i, (text, meta) in enumerate(zip(texts, metadata_list)):
+        first.setdefault(chunk_id(case_id, text, meta), i)
+    ids = list(first)
 
-    # Unique IDs avoid collisions across multiple ingests/reindexes
-    ids = [f"{case_id}_{uuid.uuid4().hex}" for _ in texts]
+    store = _get_store()
+    existing = store.existing_ids(case_id, ids)
+    new_ids = [cid for cid in ids if cid not in existing]
+    old_ids = [cid for cid in ids if cid in existing]
 
-    coll.add(
-        ids=ids,
-        documents=texts,
-        metadatas=metadata_list,
-        embeddings=embeddings,
-    )
+    if old_ids:
+        store.update_metadata(case_id, old_ids, [metadata_list[first[cid]] for cid in old_ids])
 
+    if new_ids:
+        new_texts = [texts[first[cid]] for cid in new_ids]
 
-def semantic_search(case_id: str, query: str, top_k: int = 5) -> Dict[str, Any]:
-    query = (query or "").strip()
-    if not query:
-        return {"results": []}
+        # Normalize vectors so cosine distances behave correctly
+        embeddings = _encode(new_texts)
 
-    top_k = int(top_k or 5)
-    if top_k < 1:
-        top_k = 5
+        store.upsert(
+            case_id,
+            ids=new_ids,
+            documents=new_texts,
+            metadatas=[metadata_list[first[cid]] for cid in new_ids],
+            embeddings=embeddings,
+        )
 
-    coll = _get_collection(case_id)
+    invalidate_case_results(case_id)
+    return {"added": len(new_ids), "unchanged": len(texts) - len(new_ids)}
 
-    q_emb = _model.encode([query], normalize_embeddings=True)[0].tolist()
 
-    # IMPORTANT (Chroma 0.5.3):
-    # include cannot contain "ids" — ids come back automatically.
-    res = coll.query(
-        query_embeddings=[q_emb],
-        n_results=top_k,
-        include=["documents", "metadatas", "distances"],
+def prune_stale_chunks(case_id: str, run_id: str, sources: Iterable[str], page_size: int = 5000) -> int:
+    """
+    Delete chunks of the given sources whose metadata index_run is not run_id,
+    i.e. content that a full reindex no longer produced. The Chroma store pages
+    through the collection so memory stays bounded. Returns the number removed.
+    """
+    where = {"source": {"$in": list(sources)}}
+    removed = _get_store().prune(
+        case_id, where, keep=lambda meta: meta.get("index_run") == run_id, page_size=page_size
     )
+    if removed:
+        invalidate_case_results(case_id)
+    return removed
 
-    hits = []
-    ids0 = (res.get("ids") or [[]])[0]
-    dists0 = (res.get("distances") or [[]])[0]
-    docs0 = (res.get("documents") or [[]])[0]
-    metas0 = (res.get("metadatas") or [[]])[0]
 
+def _hits_from_query(res: Dict[str, Any], row: int) -> List[Dict[str, Any]]:
+    """Hits for the row-th query embedding of a store query() result."""
+
+    def column(name: str) -> list:
+        rows = res.get(name) or []
+        return (rows[row] or []) if row < len(rows) else []
+
+    ids0 = column("ids")
+    dists0 = column("distances")
+    docs0 = column("documents")
+    metas0 = column("metadatas")
+
+    hits = []
     for i in range(min(len(ids0), len(dists0), len(docs0), len(metas0))):
         dist = dists0[i]
         if dist is None:
@@ -103,5 +313,294 @@ def semantic_search(case_id: str, query: str, top_k: int = 5) -> Dict[str, Any]:
                 "metadata": metas0[i],
             }
         )
+    return hits
+
+
+def _lexical_hits(
+    case_id: str, query: str, n: int, where: Optional[Dict[str, Any]], where_document: Optional[Dict[str, Any]]
+) -> List[Dict[str, Any]]:
+    index = open_lexical_index(case_id)
+    if index is None:
+        return []
+    hits = index.search(query, n, accept=where_matcher(where, where_document))
+    for h in hits:
+        h["distance"] = None
+    return hits
+
+
+def _fuse_rrf(ranked: List[List[Dict[str, Any]]], top_k: int) -> List[Dict[str, Any]]:
+    """Reciprocal rank fusion: sum of 1 / (RRF_K + rank) over the lists a hit is in."""
+    fused: Dict[str, Dict[str, Any]] = {}
+    for hits in ranked:
+        for rank, h in enumerate(hits, start=1):
+            entry = fused.get(h["id"])
+            if entry is None:
+                entry = fused[h["id"]] = {**h, "rrf": 0.0}
+            else:
+                for k, v in h.items():
+                    if entry.get(k) is None:
+                        entry[k] = v
+            entry["rrf"] += 1.0 / (RRF_K + rank)
+    return sorted(fused.values(), key=lambda e: -e["rrf"])[:top_k]
+
+
+def _candidates(mode: str, top_k: int) -> int:
+    return top_k if mode == "vector" else max(top_k, HYBRID_CANDIDATES)
+
+
+def _rank_hits(
+    mode: str, vector_hits: List[Dict[str, Any]], lexical_hits: List[Dict[str, Any]], top_k: int
+) -> List[Dict[str, Any]]:
+    if mode == "vector":
+        return vector_hits
+    if mode == "lexical":
+        return lexical_hits[:top_k]
+    return _fuse_rrf([vector_hits, lexical_hits], top_k)
+
+
+def _query_vector(norm_query: str) -> List[float]:
+    vec = query_embedding_cache.get(norm_query)
+    if vec is None:
+        vec = _encode([norm_query])[0]
+        query_embedding_cache.put(norm_query, vec)
+    return vec
+
+
+# How merged multi-case hits are ordered, per mode
+_MERGE_KEYS = {
+    "vector": lambda h: h["distance"],
+    "lexical": lambda h: -h["bm25"],
+    "hybrid": lambda h: -h["rrf"],
+}
+
+
+def _check_mode(mode: Optional[str]) -> str:
+    mode = (mode or "vector").lower()
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"mode must be one of {', '.join(SEARCH_MODES)}, got {mode!r}")
+    return mode
+
+
+def semantic_search(
+    case_id: str,
+    query: str,
+    top_k: int = 5,
+    filters: Optional[Dict[str, Any]] = None,
+    mode: str = "vector",
+) -> Dict[str, Any]:
+    """
+    Top-k chunks for query in case_<id>. filters (source, file glob, event_id,
+    category, start/end, contains) are applied inside the vector store, before ranking;
+    see api/search_filters.py. Raises ValueError for invalid filters or mode.
+
+    mode: vector (embeddings, SEARCH_MAX_DISTANCE cutoff), lexical (the case's
+    BM25 index; exact tokens such as EventID=4625, IPs, hashes, key paths) or
+    hybrid (both, fused by reciprocal rank).
+    """
+    query = (query or "").strip()
+    if not query:
+        return {"results": []}
+
+    top_k = int(top_k or 5)
+    if top_k < 1:
+        top_k = 5
+
+    mode = _check_mode(mode)
+    filters = normalize_filters(filters)
+
+    # Results are cached per collection generation, so any write to the case
+    # (reindex, ingest, prune) makes earlier entries unreachable
+    norm_query = normalize_text(query)
+    key = (case_id, case_generation(case_id), norm_query, top_k, filters_cache_key(filters), mode)
+    cached = search_result_cache.get(key)
+    if cached is not None:
+        return {"results": [dict(h) for h in cached], "cached": True}
+
+    where, where_document, matchable = build_where(case_id, filters)
+    if not matchable:
+        return {"results": [], "cached": False}
+
+    n = _candidates(mode, top_k)
+    vector_hits: List[Dict[str, Any]] = []
+    if mode != "lexical":
+        q_emb = _query_vector(norm_query)
+        res = _get_store().query(case_id, [q_emb], n, where=where, where_document=where_document)
+        vector_hits = _hits_from_query(res, 0)
+
+    lexical_hits: List[Dict[str, Any]] = []
+    if mode != "vector":
+        lexical_hits = _lexical_hits(case_id, query, n, where, where_document)
+
+    hits = _rank_hits(mode, vector_hits, lexical_hits, top_k)
+
+    search_result_cache.put(key, hits)
+    # Copies: callers may strip fields from the hits they return
+    return {"results": [dict(h) for h in hits], "cached": False}
+
+
+def semantic_search_batch(
+    case_ids: List[str],
+    queries: List[str],
+    top_k: int = 5,
+    filters: Optional[Dict[str, Any]] = None,
+    mode: str = "vector",
+) -> Dict[str, Any]:
+    """
+    Many queries over one or more cases: the uncached queries are encoded in a
+    single call and sent to each case's vector store in a single query().
+    filters and mode apply to every query (see semantic_search).
+
+    Returns {"results": [{"query": q, "results": [hit + case_id, ...]}, ...]}
+    in the order of queries; each case contributes up to top_k hits per query,
+    merged by distance (lexical: BM25 score, hybrid: fused score).
+    """
+    top_k = int(top_k or 5)
+    if top_k < 1:
+        top_k = 5
+
+    mode = _check_mode(mode)
+    filters = normalize_filters(filters)
+    fkey = filters_cache_key(filters)
+    n = _candidates(mode, top_k)
+
+    case_ids = list(dict.fromkeys(c for c in case_ids if c))
+    uniq = list(dict.fromkeys(q for q in (normalize_text(q) for q in queries) if q))
+
+    found: Dict[tuple, List[Dict[str, Any]]] = {}
+    todo: Dict[str, List[str]] = {}
+    generations = {cid: case_generation(cid) for cid in case_ids}
+    cached = 0
+    for cid in case_ids:
+        for q in uniq:
+            hits = search_result_cache.get((cid, generations[cid], q, top_k, fkey, mode))
+            if hits is None:
+                todo.setdefault(cid, []).append(q)
+            else:
+                found[(cid, q)] = hits
+                cached += 1
+
+    # Query vectors: in-process LRU first, then one encode for all the rest
+    vectors: Dict[str, List[float]] = {}
+    need = list(dict.fromkeys(q for qs in todo.values() for q in qs)) if mode != "lexical" else []
+    missing = []
+    for q in need:
+        vec = query_embedding_cache.get(q)
+        if vec is None:
+            missing.append(q)
+        else:
+            vectors[q] = vec
+    if missing:
+        for q, vec in zip(missing, _encode(missing)):
+            vectors[q] = vec
+            query_embedding_cache.put(q, vec)
+
+    for cid, qs in todo.items():
+        where, where_document, matchable = build_where(cid, filters)
+        res: Dict[str, Any] = {}
+        if matchable and mode != "lexical":
+            res = _get_store().query(
+                cid, [vectors[q] for q in qs], n, where=where, where_document=where_document
+            )
+        for row, q in enumerate(qs):
+            lexical_hits = _lexical_hits(cid, q, n, where, where_document) if matchable and mode != "vector" else []
+            hits = _rank_hits(mode, _hits_from_query(res, row), lexical_hits, top_k)
+            search_result_cache.put((cid, generations[cid], q, top_k, fkey, mode), hits)
+            found[(cid, q)] = hits
+
+    sort_key = _MERGE_KEYS[mode]
+
+    results = []
+    for query in queries:
+        q = normalize_text(query)
+        merged = [{**h, "case_id": cid} for cid in case_ids for h in found.get((cid, q), [])]
+        merged.sort(key=sort_key)
+        results.append({"query": query, "results": merged})
+
+    return {
+        "results": results,
+        "queries": len(uniq),
+        "cases": len(case_ids),
+        "encoded": len(missing),
+        "cached": cached,
+    }
+
+
+def _get_cross_case_pool() -> ThreadPoolExecutor:
+    global _cross_case_pool
+    if _cross_case_pool is None:
+        with _cross_case_lock:
+            if _cross_case_pool is None:
+                _cross_case_pool = ThreadPoolExecutor(
+                    max_workers=max(1, CROSS_CASE_WORKERS), thread_name_prefix="cross-case"
+                )
+    return _cross_case_pool
+
+
+def semantic_search_cases(
+    case_ids: List[str],
+    query: str,
+    top_k: int = 5,
+    filters: Optional[Dict[str, Any]] = None,
+    mode: str = "vector",
+    budget_s: Optional[float] = None,
+) -> Dict[str, Any]:
+    """
+    One query over many cases ("where else have we seen this Run key?"):
+    semantic_search runs for every case on a thread pool and the hits are
+    merged like semantic_search_batch (each case contributes up to top_k).
+
+    Cases still running after budget_s (default CROSS_CASE_BUDGET_S) are
+    listed in "timed_out" and left out, so the answer may be partial; a case
+    whose search fails is listed in "failed" with its error.
+    """
+    query = (query or "").strip()
+    mode = _check_mode(mode)
+    normalize_filters(filters)  # invalid filters fail the whole call, not every case
+    budget_s = CROSS_CASE_BUDGET_S if budget_s is None else max(0.0, float(budget_s))
+
+    t0 = time.perf_counter()
+    case_ids = list(dict.fromkeys(c for c in case_ids if c))
+    out: Dict[str, Any] = {"results": [], "by_case": {}, "timed_out": [], "failed": {}, "partial": False}
+    if not query or not case_ids:
+        return out
+
+    # Encode once here; every case then finds the vector in the LRU
+    if mode != "lexical":
+        _query_vector(normalize_text(query))
+
+    pool = _get_cross_case_pool()
+    futures = {
+        pool.submit(semantic_search, cid, query, top_k, filters=filters, mode=mode): cid for cid in case_ids
+    }
+    done, pending = wait(futures, timeout=max(0.0, budget_s - (time.perf_counter() - t0)))
+
+    merged = []
+    for fut, cid in futures.items():
+        if fut in pending:
+            fut.cancel()  # no-op if already running; its result still lands in the cache
+            out["timed_out"].append(cid)
+            continue
+        try:
+            hits = fut.result()["results"]
+        except Exception as e:
+            out["failed"][cid] = str(e)
+            continue
+        out["by_case"][cid] = len(hits)
+        merged.extend({**h, "case_id": cid} for h in hits)
+
+    merged.sort(key=_MERGE_KEYS[mode])
+    out["results"] = merged
+    out["partial"] = bool(out["timed_out"] or out["failed"])
+    out["cases"] = len(case_ids)
+    out["elapsed_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+    if out["timed_out"]:
+        print(f"[SEARCH] cross-case budget {budget_s}s hit; {len(out['timed_out'])}/{len(case_ids)} cases pending")
+    return out
+
 
-    return {"results": hits}
+def shutdown_cross_case_pool() -> None:
+    global _cross_case_pool
+    with _cross_case_lock:
+        if _cross_case_pool is not None:
+            _cross_case_pool.shutdown(wait=False, cancel_futures=True)
+            _cross_case_pool = None
@@ -1,11 +1,21 @@
 # api/evtx_parser.py
 import os
+import re
 import json
+import itertools
+import multiprocessing
+from collections import deque
 import xml.etree.ElementTree as ET
-from typing import Dict, Any, Generator, List, Optional
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, Generator, List, Optional, Tuple
 
+import Evtx.Nodes as e_nodes
 from Evtx.Evtx import Evtx
 
+from api.columnar_store import ColumnarWriter
+from api.sorted_derivatives import SortedDerivativeWriter
+from api.timeline import TS_US_FIELD, parse_timestamps_us
+
 # -----------------------------
 # Event IDs worth indexing
 # -----------------------------
@@ -59,67 +69,518 @@ def _get_children(parent: ET.Element, tag: str, ns: Dict[str, str]) -> List[ET.E
     return parent.findall(tag)
 
 # -----------------------------
-# EVTX iteration
+# Binary XML decoder
 # -----------------------------
-def iter_evtx_events(evtx_path: str) -> Generator[Dict[str, Any], None, None]:
-    with Evtx(evtx_path) as log:
-        for record in log.records():
-            try:
-                root = ET.fromstring(record.xml())
-            except Exception:
-                continue
+# A record is a template instance plus a substitution array. Where each field
+# we keep lives in a template is compiled once per template (and chunk), and the
+# event dict is then built straight from the substitutions, without rendering
+# XML and parsing it back. Anything the layout can't reproduce exactly raises,
+# and the caller falls back to _record_to_event().
+
+class _Undecodable(Exception):
+    pass
+
+
+# Returned when the record's EventID rules it out before any other work.
+_SKIPPED = object()
+_MISSING = object()
+
+_SUB_NODES = (e_nodes.NormalSubstitutionNode, e_nodes.ConditionalSubstitutionNode)
+_SILENT_NODES = (
+    e_nodes.CloseStartElementNode,
+    e_nodes.CloseEmptyElementNode,
+    e_nodes.CloseElementNode,
+    e_nodes.EndOfStreamNode,
+    e_nodes.StreamStartNode,
+)
+
+# Characters that make the rendered document unparseable, and the ones
+# python-evtx silently strips while escaping.
+_XML_INVALID = re.compile("[\x00\ud800-\udfff\ufffe\uffff]")
+_XML_STRIPPED = re.compile("[\x01-\x08\x0b\x0c\x0e-\x1f\x7f]")
+_XML_NAME = re.compile(r"[A-Za-z_][A-Za-z0-9_.\-]*\Z")
+
+# Element path below the document element -> op kind
+_FIELD_PATHS = {
+    ("System",): "system",
+    ("System", "EventID"): "event_id",
+    ("System", "TimeCreated"): "timestamp",
+    ("System", "Computer"): "computer",
+    ("System", "Channel"): "channel",
+    ("EventData",): "eventdata",
+    ("EventData", "Data"): "data",
+}
 
-            ns = _get_nsmap(root)
-            system = _get_child(root, "System", ns)
-            if system is None:
-                continue
 
-            event_id_el = _get_child(system, "EventID", ns)
-            if event_id_el is None or not event_id_el.text:
+class _RootNode(e_nodes.RootNode):
+    """
+    RootNode that locates its substitution array from the template instance
+    header, instead of parsing the template's children on every record.
+    """
+
+    def _instance_offset(self) -> int:
+        # optional StreamStartNode, then the TemplateInstanceNode
+        ofs = 4 if self.unpack_byte(0x0) & 0x0F == 0x0F else 0
+        if self.unpack_byte(ofs) & 0x0F != 0x0C:
+            raise _Undecodable("root does not start with a template instance")
+        return ofs
+
+    def template_offset(self) -> int:
+        return self.unpack_dword(self._instance_offset() + 6)
+
+    def tag_and_children_length(self):
+        ofs = self._instance_offset()
+        template_offset = self.unpack_dword(ofs + 6)
+        resident = template_offset > self.offset() + ofs - self._chunk.offset()
+        ofs += 10
+        if resident:
+            # TemplateNode header (0x18) + data_length
+            ofs += 0x18 + self._chunk.unpack_dword(template_offset + 0x14)
+        return ofs
+
+
+def _xml_text(s: str, attr: bool = False) -> str:
+    """The string ElementTree would read back for a value rendered by python-evtx."""
+    if _XML_INVALID.search(s) or (attr and '"' in s):
+        raise _Undecodable("value does not survive XML rendering")
+    s = _XML_STRIPPED.sub("", s).replace("\r\n", "\n").replace("\r", "\n")
+    if attr:
+        s = s.replace("\n", " ").replace("\t", " ")
+    return s
+
+
+def _template_slot(node) -> Tuple[str, Any]:
+    """Where a template value comes from: a substitution index or a literal."""
+    if isinstance(node, _SUB_NODES):
+        return ("sub", node.index())
+    if isinstance(node, e_nodes.ValueNode):
+        return ("value", node.children()[0].string())
+    raise _Undecodable(f"unsupported node {type(node).__name__}")
+
+
+def _compile_layout(template, ctx: Optional[Tuple[Optional[str], Tuple]]) -> Dict[str, Any]:
+    """
+    Flatten one template into the ops _decode_fragment() replays, in document order.
+
+    ctx is None for a record's own template; for a BXml substitution it is
+    (document namespace, resolved element path the fragment is rendered under).
+    Paths are tuples of (tag, namespace) so namespace rules of _get_child hold.
+    """
+    root_ns, base = ctx if ctx is not None else (None, ())
+    ops: List[Tuple] = []
+    attr_subs: List[int] = []
+    text_subs: List[int] = []
+    tops = 0
+
+    def field_path(path):
+        full = base + path
+        if any(ns not in (root_ns, None) for _, ns in full[1:]):
+            return None
+        return tuple(tag for tag, _ in full[1:])
+
+    def walk(node, path, ns):
+        nonlocal root_ns, tops
+
+        tag = node.tag_name()
+        if not _XML_NAME.match(tag):
+            raise _Undecodable(f"tag {tag!r}")
+
+        attrs: Dict[str, Tuple[str, Any]] = {}
+        content = []
+        for child in node.children():
+            if isinstance(child, e_nodes.AttributeNode):
+                name = child.attribute_name().string()
+                if not _XML_NAME.match(name):
+                    raise _Undecodable(f"attribute {name!r}")
+                slot = _template_slot(child.attribute_value())
+                if slot[0] == "sub":
+                    attr_subs.append(slot[1])
+                else:
+                    _xml_text(slot[1], attr=True)
+                attrs[name] = slot
+            elif not isinstance(child, _SILENT_NODES):
+                content.append(child)
+
+        if "xmlns" in attrs:
+            kind, val = attrs["xmlns"]
+            if kind != "value":
+                raise _Undecodable("substituted xmlns")
+            ns = val or None
+
+        if not base and not path:
+            tops += 1
+            root_ns = ns
+        path = path + ((tag, ns),)
+
+        text = []
+        for child in content:
+            if isinstance(child, e_nodes.OpenStartElementNode):
+                break
+            text.append(_template_slot(child))
+
+        kind = _FIELD_PATHS.get(field_path(path))
+        if kind in ("system", "eventdata"):
+            ops.append((kind,))
+        elif kind == "timestamp":
+            ops.append((kind, attrs.get("SystemTime")))
+        elif kind == "data":
+            ops.append((kind, attrs.get("Name"), text))
+        elif kind is not None:
+            ops.append((kind, text))
+
+        for child in content:
+            if isinstance(child, e_nodes.OpenStartElementNode):
+                walk(child, path, ns)
                 continue
+            kind, val = _template_slot(child)
+            if kind == "sub":
+                # may be plain text or a nested BXml fragment; decided per record
+                text_subs.append(val)
+                ops.append(("frag", val, (root_ns, base + path)))
+            else:
+                _xml_text(val)
+
+    for child in template.children():
+        if isinstance(child, e_nodes.OpenStartElementNode):
+            walk(child, (), base[-1][1] if base else None)
+        elif not isinstance(child, _SILENT_NODES):
+            raise _Undecodable(f"unsupported node {type(child).__name__}")
+
+    if ctx is None and tops != 1:
+        raise _Undecodable("record must render exactly one document element")
+
+    # EventID can be checked before anything else is decoded when it is fixed
+    # by this template, i.e. no fragment can inject an earlier System/EventID.
+    early_event_id = None
+    for op in ops:
+        if op[0] == "frag":
+            break
+        if op[0] == "event_id":
+            early_event_id = op[1]
+            break
 
-            try:
-                event_id = int(event_id_el.text.strip())
-            except Exception:
-                continue
+    return {
+        "ops": ops,
+        "attr_subs": attr_subs,
+        "text_subs": text_subs,
+        "early_event_id": early_event_id,
+    }
 
-            if event_id not in INTERESTING_EVENT_IDS:
-                continue
 
-            time_el = _get_child(system, "TimeCreated", ns)
-            timestamp = time_el.get("SystemTime") if time_el is not None else None
-
-            computer_el = _get_child(system, "Computer", ns)
-            computer = computer_el.text.strip() if computer_el is not None and computer_el.text else None
-
-            channel_el = _get_child(system, "Channel", ns)
-            channel = channel_el.text.strip() if channel_el is not None and channel_el.text else None
-
-            data: Dict[str, Any] = {}
-            event_data_el = _get_child(root, "EventData", ns)
-            if event_data_el is not None:
-                for d in _get_children(event_data_el, "Data", ns):
-                    name = d.get("Name") or "data"
-                    value = (d.text or "").strip()
-                    data[name] = value
-
-            try:
-                rec_no = record.record_num()
-            except Exception:
-                rec_no = None
-
-            yield {
-                "record_number": rec_no,
-                "event_id": event_id,
-                "timestamp": timestamp,
-                "computer": computer,
-                "channel": channel,
-                "data": data,
-            }
+def _layout_for(root, layouts: Dict[Any, Any], ctx) -> Dict[str, Any]:
+    key = (root.template_offset(), ctx)
+    layout = layouts.get(key, _MISSING)
+    if layout is _MISSING:
+        try:
+            layout = _compile_layout(root.template(), ctx)
+        except _Undecodable:
+            layout = None
+        layouts[key] = layout
+    if layout is None:
+        raise _Undecodable("template not supported")
+    return layout
+
+
+def _slot_text(slots: List[Tuple[str, Any]], subs: List[Any]) -> Optional[str]:
+    """Element .text: the concatenated values up to the first child element."""
+    parts = []
+    for kind, val in slots:
+        if kind == "value":
+            parts.append(val)
+            continue
+        sub = subs[val]
+        if isinstance(sub, e_nodes.BXmlTypeNode):
+            break
+        parts.append(sub.string())
+    return _xml_text("".join(parts)) or None
+
+
+def _slot_attr(slot: Optional[Tuple[str, Any]], subs: List[Any]) -> Optional[str]:
+    if slot is None:
+        return None
+    kind, val = slot
+    if kind == "value":
+        return _xml_text(val, attr=True)
+    return _xml_text(subs[val].string(), attr=True)
+
+
+def _decode_fragment(root, layouts: Dict[Any, Any], ctx, state: Dict[str, Any]) -> None:
+    layout = _layout_for(root, layouts, ctx)
+    subs = root.substitutions()
+
+    # Everything the renderer would emit must survive it, or the XML path
+    # would have dropped the record.
+    for i in layout["attr_subs"]:
+        if isinstance(subs[i], e_nodes.BXmlTypeNode):
+            raise _Undecodable("BXml in attribute")
+        _xml_text(subs[i].string(), attr=True)
+    for i in layout["text_subs"]:
+        if not isinstance(subs[i], e_nodes.BXmlTypeNode):
+            _xml_text(subs[i].string())
+
+    for op in layout["ops"]:
+        kind = op[0]
+        if kind == "frag":
+            sub = subs[op[1]]
+            if isinstance(sub, e_nodes.BXmlTypeNode):
+                nested = _RootNode(sub._buf, sub.offset(), sub._chunk, sub)
+                _decode_fragment(nested, layouts, op[2], state)
+        elif kind == "system":
+            state["system"] += 1
+        elif kind == "eventdata":
+            state["eventdata"] += 1
+        elif kind == "data":
+            if state["eventdata"] == 1:
+                name = _slot_attr(op[1], subs) or "data"
+                state["data"][name] = (_slot_text(op[2], subs) or "").strip()
+        elif state["system"] == 1 and kind not in state:
+            if kind == "timestamp":
+                state[kind] = _slot_attr(op[1], subs)
+            else:
+                state[kind] = _slot_text(op[1], subs)
+
+
+def _decode_record(record, chunk, layouts: Dict[Any, Any]):
+    """
+    Build the _record_to_event() dict for a record straight from its
+    substitutions. Returns _SKIPPED when the EventID alone rules the record
+    out, None when the XML path would also yield nothing, and raises when the
+    record must go through the XML path instead.
+    """
+    root = _RootNode(record._buf, record.offset() + 0x18, chunk, record)
+
+    early = _layout_for(root, layouts, None)["early_event_id"]
+    if early is not None:
+        raw = _slot_text(early, root.substitutions())
+        try:
+            if int(raw.strip()) not in INTERESTING_EVENT_IDS:
+                return _SKIPPED
+        except Exception:
+            return _SKIPPED
+
+    state: Dict[str, Any] = {"system": 0, "eventdata": 0, "data": {}}
+    _decode_fragment(root, layouts, None, state)
+
+    if not state["system"] or not state.get("event_id"):
+        return None
+    try:
+        event_id = int(state["event_id"].strip())
+    except Exception:
+        return None
+    if event_id not in INTERESTING_EVENT_IDS:
+        return None
+
+    computer = state.get("computer")
+    channel = state.get("channel")
+
+    try:
+        rec_no = record.record_num()
+    except Exception:
+        rec_no = None
+
+    return {
+        "record_number": rec_no,
+        "event_id": event_id,
+        "timestamp": state.get("timestamp"),
+        "computer": computer.strip() if computer else None,
+        "channel": channel.strip() if channel else None,
+        "data": state["data"],
+    }
+
+# -----------------------------
+# EVTX iteration
+# -----------------------------
+# Worker processes used to parse one EVTX file; 1 keeps the serial path.
+EVTX_WORKERS = int(os.getenv("EVTX_WORKERS", "1"))
+# 64 KiB chunks handed to a worker per task
+EVTX_CHUNKS_PER_TASK = int(os.getenv("EVTX_CHUNKS_PER_TASK", "16"))
+# Tasks submitted ahead of the consumer per worker: bounds the parsed events
+# held in the parent when the consumer (e.g. the embed queue) is slower
+EVTX_TASKS_AHEAD = int(os.getenv("EVTX_TASKS_AHEAD", "2"))
+
+
+def _record_to_event(record) -> Optional[Dict[str, Any]]:
+    try:
+        root = ET.fromstring(record.xml())
+    except Exception:
+        return None
+
+    ns = _get_nsmap(root)
+    system = _get_child(root, "System", ns)
+    if system is None:
+        return None
+
+    event_id_el = _get_child(system, "EventID", ns)
+    if event_id_el is None or not event_id_el.text:
+        return None
+
+    try:
+        event_id = int(event_id_el.text.strip())
+    except Exception:
+        return None
+
+    if event_id not in INTERESTING_EVENT_IDS:
+        return None
+
+    time_el = _get_child(system, "TimeCreated", ns)
+    timestamp = time_el.get("SystemTime") if time_el is not None else None
+
+    computer_el = _get_child(system, "Computer", ns)
+    computer = computer_el.text.strip() if computer_el is not None and computer_el.text else None
+
+    channel_el = _get_child(system, "Channel", ns)
+    channel = channel_el.text.strip() if channel_el is not None and channel_el.text else None
+
+    data: Dict[str, Any] = {}
+    event_data_el = _get_child(root, "EventData", ns)
+    if event_data_el is not None:
+        for d in _get_children(event_data_el, "Data", ns):
+            name = d.get("Name") or "data"
+            value = (d.text or "").strip()
+            data[name] = value
+
+    try:
+        rec_no = record.record_num()
+    except Exception:
+        rec_no = None
+
+    return {
+        "record_number": rec_no,
+        "event_id": event_id,
+        "timestamp": timestamp,
+        "computer": computer,
+        "channel": channel,
+        "data": data,
+    }
+
+
+def _count_chunks(evtx_path: str) -> int:
+    with Evtx(evtx_path) as log:
+        return sum(1 for _ in log.chunks())
+
+
+def _new_stats() -> Dict[str, int]:
+    return {"records_seen": 0, "records_skipped": 0, "records_rendered": 0}
+
+
+def _iter_chunk_events(chunk, stats: Dict[str, int]) -> Generator[Dict[str, Any], None, None]:
+    """
+    Records are decoded from their substitutions; those the decoder can't
+    reproduce exactly are rendered to XML instead (stats["records_rendered"]).
+    Records ruled out by EventID alone are counted in stats["records_skipped"].
+    """
+    # template layouts are keyed by chunk-relative offset: one cache per chunk
+    layouts: Dict[Any, Any] = {}
+    for record in chunk.records():
+        stats["records_seen"] += 1
+
+        try:
+            event = _decode_record(record, chunk, layouts)
+        except Exception:
+            stats["records_rendered"] += 1
+            event = _record_to_event(record)
+
+        if event is _SKIPPED:
+            stats["records_skipped"] += 1
+            continue
+        if event is not None:
+            yield event
+
+
+def _parse_chunk_range(evtx_path: str, start: int, stop: int) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+    """
+    Worker entry point: parse chunks [start, stop) of one file.
+    Each process opens (mmaps) the file itself; only the event dicts travel back.
+    """
+    out: List[Dict[str, Any]] = []
+    stats = _new_stats()
+    with Evtx(evtx_path) as log:
+        for chunk in itertools.islice(log.chunks(), start, stop):
+            out.extend(_iter_chunk_events(chunk, stats))
+    return out, stats
+
+
+def _iter_evtx_events_parallel(
+    evtx_path: str, workers: int, n_chunks: int, stats: Dict[str, int]
+) -> Generator[Dict[str, Any], None, None]:
+    per_task = max(1, EVTX_CHUNKS_PER_TASK)
+    ranges = ((s, min(s + per_task, n_chunks)) for s in range(0, n_chunks, per_task))
+    window = max(1, workers * EVTX_TASKS_AHEAD)
+
+    # Results are taken in submission order, i.e. file chunk order, which is
+    # exactly the order the serial path produces; a new task is submitted
+    # only as one is consumed. Spawned, not forked: the API process has
+    # threads (and possibly a model) that a fork would copy mid-flight.
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        pending: "deque" = deque()
+        try:
+            for start, stop in itertools.islice(ranges, window):
+                pending.append(pool.submit(_parse_chunk_range, evtx_path, start, stop))
+            while pending:
+                events, part = pending.popleft().result()
+                for start, stop in itertools.islice(ranges, 1):
+                    pending.append(pool.submit(_parse_chunk_range, evtx_path, start, stop))
+                for k, v in part.items():
+                    stats[k] += v
+                yield from events
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def iter_evtx_events(
+    evtx_path: str,
+    workers: Optional[int] = None,
+    stats: Optional[Dict[str, int]] = None,
+) -> Generator[Dict[str, Any], None, None]:
+    """
+    Yield interesting events from an EVTX file in file (record) order.
+
+    workers > 1 splits the file by 64 KiB chunk across a process pool;
+    output is identical to the serial path. Defaults to EVTX_WORKERS.
+    If given, stats is filled with records_seen / records_skipped / records_rendered.
+    """
+    workers = EVTX_WORKERS if workers is None else int(workers)
+    if stats is None:
+        stats = {}
+    for k, v in _new_stats().items():
+        stats.setdefault(k, v)
+
+    if workers > 1:
+        n_chunks = _count_chunks(evtx_path)
+        if n_chunks > EVTX_CHUNKS_PER_TASK:
+            yield from _iter_evtx_events_parallel(evtx_path, workers, n_chunks, stats)
+            return
+
+    with Evtx(evtx_path) as log:
+        for chunk in log.chunks():
+            yield from _iter_chunk_events(chunk, stats)
 
 # -----------------------------
 # Text formatting for embeddings
 # -----------------------------
+# (channel substring, ChannelTag, Category)
+_CHANNEL_CATEGORIES = (
+    ("security", "security", "authentication"),
+    ("system", "system", "system"),
+    ("setup", "setup", "setup"),
+    ("powershell", "powershell", "scripting"),
+)
+_EVENT_CATEGORIES = {7040: "service", 7045: "service", 4625: "failed_logon", 4624: "successful_logon"}
+
+
+def event_category(event: Dict[str, Any]) -> Optional[str]:
+    """Most specific of the Category= tags format_event_for_text gives the event."""
+    category = _EVENT_CATEGORIES.get(event.get("event_id"))
+    if category:
+        return category
+    channel = (event.get("channel") or "").lower()
+    for needle, _, cat in _CHANNEL_CATEGORIES:
+        if needle in channel:
+            return cat
+    return None
+
+
 def format_event_for_text(event: Dict[str, Any]) -> str:
     ts = event.get("timestamp") or "UNKNOWN_TIME"
     eid = event.get("event_id")
@@ -130,21 +591,12 @@ def format_event_for_text(event: Dict[str, Any]) -> str:
 
     tags = []
 
-    if "security" in channel:
-        tags.append("ChannelTag=security Category=authentication")
-    if "system" in channel:
-        tags.append("ChannelTag=system Category=system")
-    if "setup" in channel:
-        tags.append("ChannelTag=setup Category=setup")
-    if "powershell" in channel:
-        tags.append("ChannelTag=powershell Category=scripting")
-
-    if eid in {7040, 7045}:
-        tags.append("Category=service")
-    if eid in {4625}:
-        tags.append("Category=failed_logon")
-    if eid in {4624}:
-        tags.append("Category=successful_logon")
+    for needle, tag, cat in _CHANNEL_CATEGORIES:
+        if needle in channel:
+            tags.append(f"ChannelTag={tag} Category={cat}")
+
+    if eid in _EVENT_CATEGORIES:
+        tags.append(f"Category={_EVENT_CATEGORIES[eid]}")
 
     clean = []
     for k, v in data.items():
@@ -160,7 +612,19 @@ def format_event_for_text(event: Dict[str, Any]) -> str:
 # -----------------------------
 # Derivative writer
 # -----------------------------
-def generate_evtx_derivatives(evtx_path: str, case_dir: str) -> Dict[str, Any]:
+# Events whose timestamps are converted in one go
+EVTX_TS_BATCH = 4096
+
+
+def iter_evtx_derivatives(
+    evtx_path: str, case_dir: str, stats: Dict[str, Any], workers: Optional[int] = None
+) -> Generator[Tuple[Dict[str, Any], str], None, None]:
+    """
+    Write the derivatives of an EVTX file while yielding (event, text line)
+    for each event as it is written, so callers indexing the events need not
+    read them back. stats is filled in (see generate_evtx_derivatives) once
+    the generator is exhausted; closing it early discards the derivatives.
+    """
     os.makedirs(case_dir, exist_ok=True)
 
     base = os.path.splitext(os.path.basename(evtx_path))[0]
@@ -171,15 +635,46 @@ def generate_evtx_derivatives(evtx_path: str, case_dir: str) -> Dict[str, Any]:
     txt_path = os.path.join(evtx_out_dir, f"{base}.txt")
 
     events_count = 0
-
-    with open(jsonl_path, "w", encoding="utf-8") as jf, open(txt_path, "w", encoding="utf-8") as tf:
-        for event in iter_evtx_events(evtx_path):
-            events_count += 1
-            jf.write(json.dumps(event, ensure_ascii=False) + "\n")
-            tf.write(format_event_for_text(event) + "\n")
-
-    return {
+    parse_stats: Dict[str, int] = {}
+
+    # Both files come out in time order, with a <base>.range.json sidecar and
+    # the same events as typed columns in <base>.parquet
+    writer = SortedDerivativeWriter(
+        jsonl_path, txt_path, key=lambda e: e[TS_US_FIELD], columnar=ColumnarWriter("evtx", jsonl_path)
+    )
+    events = iter_evtx_events(evtx_path, workers=workers, stats=parse_stats)
+    try:
+        while True:
+            batch = list(itertools.islice(events, EVTX_TS_BATCH))
+            if not batch:
+                break
+            # ts_us next to the ISO timestamp, so readers never parse it again
+            for event, ts_us in zip(batch, parse_timestamps_us([e.get("timestamp") for e in batch])):
+                event[TS_US_FIELD] = ts_us
+                events_count += 1
+                text = format_event_for_text(event)
+                writer.write(event, json.dumps(event, ensure_ascii=False), text)
+                yield event, text
+    except BaseException:
+        writer.abort()
+        raise
+    time_range = writer.finish()
+
+    stats.update({
         "events_count": events_count,
+        "reordered": time_range["reordered"],
+        "records_seen": parse_stats.get("records_seen", 0),
+        "records_skipped": parse_stats.get("records_skipped", 0),
+        "records_rendered": parse_stats.get("records_rendered", 0),
         "jsonl_path": jsonl_path,
         "txt_path": txt_path,
-    }
+        "parquet_path": writer.columnar.path,
+        "txt_bytes": time_range["txt_bytes"],
+    })
+
+
+def generate_evtx_derivatives(evtx_path: str, case_dir: str, workers: Optional[int] = None) -> Dict[str, Any]:
+    stats: Dict[str, Any] = {}
+    for _ in iter_evtx_derivatives(evtx_path, case_dir, stats, workers=workers):
+        pass
+    return stats
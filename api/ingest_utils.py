@@ -1,10 +1,22 @@
 # api/ingest_utils.py
 import os
-from typing import List, Dict, Any
+import json
+import uuid
+import queue
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
-from api.evtx_parser import generate_evtx_derivatives
-from api.registry_parser import generate_registry_derivatives
-from api.embedder import embed_texts
+from api.evtx_parser import iter_evtx_derivatives, event_category
+from api.registry_parser import iter_registry_derivatives
+from api.embedder import chunk_id, embed_texts, prune_stale_chunks
+from api.lexical_index import LEXICAL_INDEX_DIR, LexicalIndexBuilder, lexical_index_path
+from api.local_vector_store import VECTOR_INDEX_DIR
+from api.sorted_derivatives import RANGE_SUFFIX
+from api.derivative_io import DerivativeWriter, logical_path
+from api.timeline_store import build_timeline_store
+from api.search_cache import invalidate_case_results
+from api.timeline import timeline_sort_us
 
 TEXT_EXTENSIONS = {".txt", ".log", ".json", ".csv", ".md"}
 REGISTRY_EXTENSIONS = {".dat", ".hiv", ".hive", ".reg"}
@@ -13,6 +25,14 @@ MAX_FILE_CHARS = int(os.getenv("MAX_FILE_CHARS", "20000"))       # safety for hu
 CHUNK_CHARS = int(os.getenv("CHUNK_CHARS", "1200"))
 CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "150"))
 
+# Streaming ingest: chunks per embed_texts() call, and batches buffered between
+# the parse and embed stages. Peak memory scales with these, not case size.
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "2000"))
+EMBED_QUEUE_BATCHES = int(os.getenv("EMBED_QUEUE_BATCHES", "2"))
+
+# Chunk sources produced by a corpus build; a reindex owns (and prunes) these
+CORPUS_SOURCES = ("evtx", "registry", "file")
+
 
 def _chunk_text(text: str, max_chars: int = CHUNK_CHARS, overlap: int = CHUNK_OVERLAP) -> List[str]:
     text = (text or "").strip()
@@ -38,107 +58,270 @@ def _read_text_file(path: str) -> str:
         return ""
 
 
-def build_and_index_case_corpus(case_dir: str, case_id: str) -> int:
+def _evtx_chunk_metadata(event: Dict[str, Any]) -> Dict[str, Any]:
+    """Filterable fields for an EVTX chunk (Chroma metadata can't hold None)."""
+    meta: Dict[str, Any] = {}
+    if isinstance(event.get("event_id"), int):
+        meta["event_id"] = event["event_id"]
+    if event.get("channel"):
+        meta["channel"] = str(event["channel"])
+    category = event_category(event)
+    if category:
+        meta["category"] = category
+    ts_us = timeline_sort_us("evtx", event)
+    if ts_us is not None:
+        meta["ts_epoch"] = ts_us / 1_000_000
+    return meta
+
+
+def _registry_chunk_metadata(event: Dict[str, Any]) -> Dict[str, Any]:
+    meta: Dict[str, Any] = {}
+    if event.get("category"):
+        meta["category"] = str(event["category"])
+    if event.get("hive"):
+        meta["hive"] = str(event["hive"])
+    ts_us = timeline_sort_us("registry", event)
+    if ts_us is not None:
+        meta["ts_epoch"] = ts_us / 1_000_000
+    return meta
+
+
+def _iter_case_chunks(
+    case_dir: str, case_id: str, run_id: str, evtx_summary_f, reg_summary_f, io_stats: Dict[str, int]
+) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Parse + format stage: walk the case, generate derivatives and yield
+    (text, metadata) one chunk at a time. Summary lines are written as they go.
+    Metadata carries the line/chunk index (part of the chunk ID), run_id and,
+    for EVTX/registry, the event fields search can filter on. io_stats counts
+    the EVTX/registry events handled in one pass and the derivative bytes
+    that were not read back for it.
+    """
+    # Prefer scanning extracted evidence in /files only (prevents feedback loops)
+    scan_root = os.path.join(case_dir, "files")
+    if not os.path.isdir(scan_root):
+        scan_root = case_dir
+
+    for root, dirs, files in os.walk(scan_root):
+        if root == case_dir:
+            # our own indexes (and their .tmp/.old while rebuilding)
+            dirs[:] = [d for d in dirs if not d.startswith((LEXICAL_INDEX_DIR, VECTOR_INDEX_DIR))]
+        for filename in files:
+            path = os.path.join(root, filename)
+            ext = os.path.splitext(filename)[1].lower()
+            rel_path = os.path.relpath(path, case_dir)
+
+            # Skip our own outputs if scanning case_dir directly
+            if logical_path(filename) in ("evtx_summaries.jsonl", "registry_summaries.jsonl", "metadata.jsonl", "index_stats.json"):
+                continue
+            # time-range sidecars of the sorted derivatives (api/sorted_derivatives.py)
+            if filename.endswith(RANGE_SUFFIX):
+                continue
+
+            # EVTX and registry events are formatted once, as the derivatives
+            # are written, and fanned out from there to the summary file and
+            # the chunk stream; nothing is read back from the derivatives
+
+            # 1) EVTX
+            if ext == ".evtx":
+                stats: Dict[str, Any] = {}
+                for line_no, (event, text) in enumerate(iter_evtx_derivatives(path, case_dir, stats)):
+                    line = text.strip()
+                    if not line:
+                        continue
+                    evtx_summary_f.write(line + "\n")
+                    yield line, {
+                        "source": "evtx",
+                        "case_id": case_id,
+                        "file": rel_path,
+                        "line": line_no,
+                        "index_run": run_id,
+                        **_evtx_chunk_metadata(event),
+                    }
+                print(
+                    f"[EVTX] {filename}: {stats['events_count']} events parsed "
+                    f"({stats.get('records_skipped', 0)} of {stats.get('records_seen', 0)} "
+                    f"records skipped before render)"
+                )
+                io_stats["single_pass_events"] += stats["events_count"]
+                io_stats["reread_bytes_saved"] += stats["txt_bytes"]
+
+            # 2) Registry
+            elif ext in REGISTRY_EXTENSIONS:
+                print(f"[REGISTRY] candidate: {filename}")
+                stats = {}
+                for line_no, (event, text) in enumerate(iter_registry_derivatives(path, case_dir, stats)):
+                    line = text.strip()
+                    if not line:
+                        continue
+                    reg_summary_f.write(line + "\n")
+                    yield line, {
+                        "source": "registry",
+                        "case_id": case_id,
+                        "file": rel_path,
+                        "line": line_no,
+                        "index_run": run_id,
+                        **_registry_chunk_metadata(event),
+                    }
+                print(f"[REGISTRY] {filename}: {stats['events_count']} entries parsed")
+                io_stats["single_pass_events"] += stats["events_count"]
+                io_stats["reread_bytes_saved"] += stats["txt_bytes"]
+
+            # 3) Normal text-like files
+            elif ext in TEXT_EXTENSIONS:
+                content = _read_text_file(path)
+                if not content.strip():
+                    continue
+
+                # Chunk so embeddings don’t become garbage
+                for idx, ch in enumerate(_chunk_text(content)):
+                    yield ch, {
+                        "source": "file",
+                        "case_id": case_id,
+                        "file": rel_path,
+                        "chunk": idx,
+                        "index_run": run_id,
+                    }
+
+
+def _tee_lexical(
+    chunks: Iterator[Tuple[str, Dict[str, Any]]], builder: LexicalIndexBuilder, case_id: str
+) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Feed every chunk to the BM25 index under its Chroma ID on the way through."""
+    for text, meta in chunks:
+        builder.add(chunk_id(case_id, text, meta), text, meta)
+        yield text, meta
+
+
+def _iter_batches(
+    chunks: Iterator[Tuple[str, Dict[str, Any]]], batch_size: int
+) -> Iterator[Tuple[List[str], List[Dict[str, Any]]]]:
+    texts: List[str] = []
+    metas: List[Dict[str, Any]] = []
+    for text, meta in chunks:
+        texts.append(text)
+        metas.append(meta)
+        if len(texts) >= batch_size:
+            yield texts, metas
+            texts, metas = [], []
+    if texts:
+        yield texts, metas
+
+
+def _embed_consumer(
+    case_id: str, q: "queue.Queue", counts: Dict[str, int], errors: List[Exception]
+) -> None:
+    """Embed stage: drain batches until the sentinel, keep draining after a failure."""
+    done = 0
+    while True:
+        item = q.get()
+        if item is None:
+            return
+        if errors:
+            continue
+        texts, metas = item
+        try:
+            print(f"[EMBED] case={case_id} batch={done}-{done + len(texts) - 1}")
+            for k, v in embed_texts(case_id, texts, metas).items():
+                counts[k] = counts.get(k, 0) + v
+            done += len(texts)
+        except Exception as e:
+            errors.append(e)
+
+
+def build_and_index_case_corpus(case_dir: str, case_id: str, batch_size: Optional[int] = None) -> int:
     """
     Walk the case directory (prefer case_dir/files), convert EVTX + Registry → text,
     write summaries (evtx_summaries.jsonl / registry_summaries.jsonl),
     and push chunks into Chroma via embed_texts().
 
+    Streams parse → format → batch → embed: batches go through a bounded queue
+    to an embedding thread, so parsing overlaps with embedding/Chroma writes and
+    at most (EMBED_QUEUE_BATCHES + 2) batches of batch_size chunks are held.
+
+    Chunk IDs are content-addressed, so a reindex only embeds new chunks and
+    then prunes the ones this run no longer produced. Counts of added,
+    unchanged and removed chunks are written to index_stats.json.
+
     Returns number of text chunks indexed.
     """
-    text_chunks: List[str] = []
-    metadata_list: List[Dict[str, Any]] = []
-
-    # Prefer scanning extracted evidence in /files only (prevents feedback loops)
-    scan_root = os.path.join(case_dir, "files")
-    if not os.path.isdir(scan_root):
-        scan_root = case_dir
+    batch_size = max(1, int(batch_size or EMBED_BATCH_SIZE))
+    run_id = uuid.uuid4().hex
 
     evtx_summary_path = os.path.join(case_dir, "evtx_summaries.jsonl")
     reg_summary_path = os.path.join(case_dir, "registry_summaries.jsonl")
 
-    with open(evtx_summary_path, "w", encoding="utf-8") as evtx_summary_f, \
-         open(reg_summary_path, "w", encoding="utf-8") as reg_summary_f:
+    q: "queue.Queue" = queue.Queue(maxsize=max(1, EMBED_QUEUE_BATCHES))
+    counts: Dict[str, int] = {"added": 0, "unchanged": 0}
+    io_stats: Dict[str, int] = {"single_pass_events": 0, "reread_bytes_saved": 0}
+    errors: List[Exception] = []
+    consumer = threading.Thread(
+        target=_embed_consumer, args=(case_id, q, counts, errors), name=f"embed-{case_id}", daemon=True
+    )
+    consumer.start()
 
-        for root, _, files in os.walk(scan_root):
-            for filename in files:
-                path = os.path.join(root, filename)
-                ext = os.path.splitext(filename)[1].lower()
-                rel_path = os.path.relpath(path, case_dir)
+    # BM25 index over the same chunks, built in the parse stage; replaces the
+    # previous one only once the whole run succeeded
+    lexical = LexicalIndexBuilder(lexical_index_path(case_dir))
 
-                # Skip our own outputs if scanning case_dir directly
-                if filename in ("evtx_summaries.jsonl", "registry_summaries.jsonl", "metadata.jsonl"):
-                    continue
+    total = 0
+    try:
+        with DerivativeWriter(evtx_summary_path) as evtx_summary_f, \
+             DerivativeWriter(reg_summary_path) as reg_summary_f:
+            chunks = _iter_case_chunks(case_dir, case_id, run_id, evtx_summary_f, reg_summary_f, io_stats)
+            try:
+                for texts, metas in _iter_batches(_tee_lexical(chunks, lexical, case_id), batch_size):
+                    if errors:
+                        break
+                    q.put((texts, metas))
+                    total += len(texts)
+            finally:
+                # discards the derivatives of a file left half-parsed by the break
+                chunks.close()
+                q.put(None)
+                consumer.join()
+            # raised inside the with, so the summaries are discarded too
+            if errors:
+                raise errors[0]
+    except Exception:
+        lexical.abort()
+        raise
 
-                # 1) EVTX
-                if ext == ".evtx":
-                    stats = generate_evtx_derivatives(path, case_dir)
-                    print(f"[EVTX] {filename}: {stats['events_count']} events parsed")
-
-                    # Index the one-line summaries generated by evtx_parser
-                    try:
-                        with open(stats["txt_path"], "r", encoding="utf-8", errors="ignore") as f:
-                            for line in f:
-                                line = line.strip()
-                                if not line:
-                                    continue
-                                text_chunks.append(line)
-                                metadata_list.append({
-                                    "source": "evtx",
-                                    "case_id": case_id,
-                                    "file": rel_path,
-                                })
-                                evtx_summary_f.write(line + "\n")
-                    except Exception as e:
-                        print(f"[EVTX] failed reading derivative txt for {filename}: {e}")
-
-                # 2) Registry
-                elif ext in REGISTRY_EXTENSIONS:
-                    print(f"[REGISTRY] candidate: {filename}")
-                    stats = generate_registry_derivatives(path, case_dir)
-                    print(f"[REGISTRY] {filename}: {stats['events_count']} entries parsed")
-
-                    if stats.get("events_count", 0) > 0:
-                        try:
-                            with open(stats["txt_path"], "r", encoding="utf-8", errors="ignore") as f:
-                                for line in f:
-                                    line = line.strip()
-                                    if not line:
-                                        continue
-                                    text_chunks.append(line)
-                                    metadata_list.append({
-                                        "source": "registry",
-                                        "case_id": case_id,
-                                        "file": rel_path,
-                                    })
-                                    reg_summary_f.write(line + "\n")
-                        except Exception as e:
-                            print(f"[REGISTRY] failed reading derivative txt for {filename}: {e}")
-
-                # 3) Normal text-like files
-                elif ext in TEXT_EXTENSIONS:
-                    content = _read_text_file(path)
-                    if not content.strip():
-                        continue
+    lexical_stats = lexical.finish()
+    invalidate_case_results(case_id)
+    removed = prune_stale_chunks(case_id, run_id, CORPUS_SOURCES)
+
+    # The derivatives are final now; the timeline is served from this store
+    timeline_stats = {"events": None}
+    try:
+        timeline_stats = build_timeline_store(case_dir)
+    except Exception as e:
+        print(f"[TIMELINE] failed building timeline store: {e}")
+
+    index_stats = {
+        "case_id": case_id,
+        "run_id": run_id,
+        "chunks": total,
+        "added": counts.get("added", 0),
+        "unchanged": counts.get("unchanged", 0),
+        "removed": removed,
+        "lexical_terms": lexical_stats["terms"],
+        "lexical_postings": lexical_stats["postings"],
+        "timeline_events": timeline_stats["events"],
+        # EVTX/registry events formatted once for derivatives, summaries and
+        # chunks, and the summary .txt derivative bytes no longer read back for it
+        **io_stats,
+        "finished_utc": datetime.now(timezone.utc).isoformat(timespec="seconds").replace("+00:00", "Z"),
+    }
+    print(
+        f"[INDEX] case={case_id} chunks={total} added={index_stats['added']} "
+        f"unchanged={index_stats['unchanged']} removed={removed} "
+        f"reread_bytes_saved={io_stats['reread_bytes_saved']}"
+    )
+    try:
+        with open(os.path.join(case_dir, "index_stats.json"), "w", encoding="utf-8") as f:
+            json.dump(index_stats, f, indent=2)
+    except Exception as e:
+        print(f"[INDEX] failed writing index_stats.json: {e}")
 
-                    # Chunk so embeddings don’t become garbage
-                    chunks = _chunk_text(content)
-                    for idx, ch in enumerate(chunks):
-                        text_chunks.append(ch)
-                        metadata_list.append({
-                            "source": "file",
-                            "case_id": case_id,
-                            "file": rel_path,
-                            "chunk": idx,
-                        })
-
-    # Embed in safe batches
-    if text_chunks:
-        max_batch = 2000
-        total = len(text_chunks)
-        for start in range(0, total, max_batch):
-            end = min(start + max_batch, total)
-            print(f"[EMBED] case={case_id} batch={start}-{end-1} of {total}")
-            embed_texts(case_id, text_chunks[start:end], metadata_list[start:end])
-
-    return len(text_chunks)
+    return total
@@ -0,0 +1,401 @@
+# api/lexical_index.py
+import os
+import re
+import json
+import mmap
+import heapq
+import itertools
+import shutil
+import threading
+from array import array
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+ARTIFACT_DIR = os.environ.get("ARTIFACT_DIR", "/data/artifacts")
+
+# Per-case index directory, next to the derivatives
+LEXICAL_INDEX_DIR = "lexical_index"
+
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+
+# Postings buffered per sorted run before it is spilled to disk (see LexicalIndexBuilder)
+LEXICAL_RUN_POSTINGS = int(os.getenv("LEXICAL_RUN_POSTINGS", "2000000"))
+
+_MANIFEST = "manifest.json"
+
+# Whole tokens are kept (EventID=4625, 10.0.0.5, cmd.exe, Key=Software\...\Run);
+# their parts around these separators are indexed too, so "4625" or "run" match
+_SPLIT = re.compile(r"[=\\/:,;|()\[\]{}<>\"'`]+")
+_EDGE_PUNCT = ".,;:()[]{}<>\"'`"
+
+
+def tokenize(text: str) -> List[str]:
+    out: List[str] = []
+    for raw in (text or "").lower().split():
+        tok = raw.strip(_EDGE_PUNCT)
+        if not tok:
+            continue
+        out.append(tok)
+        if "=" in tok:
+            value = tok.partition("=")[2].strip(_EDGE_PUNCT)
+            if value:
+                out.append(value)
+        for part in _SPLIT.split(tok):
+            part = part.strip(_EDGE_PUNCT + "-_")
+            if part and part != tok:
+                out.append(part)
+    return out
+
+
+def lexical_index_path(case_dir: str) -> str:
+    return os.path.join(case_dir, LEXICAL_INDEX_DIR)
+
+
+def _write_npy(path: str, raw_path: str, dtype: np.dtype, count: int) -> None:
+    """Wrap a raw file of count dtype values as .npy, copying it in blocks."""
+    with open(path, "wb") as out, open(raw_path, "rb") as src:
+        np.lib.format.write_array_header_1_0(
+            out, {"descr": np.lib.format.dtype_to_descr(np.dtype(dtype)), "fortran_order": False, "shape": (count,)}
+        )
+        shutil.copyfileobj(src, out, 1 << 20)
+    os.remove(raw_path)
+
+
+class _Run:
+    """
+    One spilled run: its terms in byte order, each with its (doc, tf)
+    postings. The merge consumes a run front to back, so everything is read
+    as sequential streams.
+    """
+
+    def __init__(self, path: str, number: int):
+        self.path = path
+        self.number = number
+        self._docs_f = open(os.path.join(path, "docs.bin"), "rb")
+        self._tfs_f = open(os.path.join(path, "tfs.bin"), "rb")
+
+    def __iter__(self):
+        term_offsets = np.load(os.path.join(self.path, "term_offsets.npy"), mmap_mode="r")
+        counts = np.load(os.path.join(self.path, "counts.npy"), mmap_mode="r")
+        with open(os.path.join(self.path, "terms.bin"), "rb") as f:
+            for block in range(0, len(counts), 65536):
+                lengths = np.diff(term_offsets[block : block + 65537]).tolist()
+                for length, count in zip(lengths, counts[block : block + 65536].tolist()):
+                    yield f.read(length), self.number, count
+
+    def read(self, count: int) -> Tuple[bytes, bytes]:
+        """The next count postings: (uint32 docs, uint16 tfs) as raw bytes."""
+        return self._docs_f.read(4 * count), self._tfs_f.read(2 * count)
+
+    def close(self) -> None:
+        self._docs_f.close()
+        self._tfs_f.close()
+
+
+class LexicalIndexBuilder:
+    """
+    Streams documents into a BM25 index for one case. Postings are buffered
+    up to LEXICAL_RUN_POSTINGS and spilled as sorted runs; finish() merges
+    the runs into a sorted term dictionary plus CSR postings (.npy), swapped
+    in atomically. Memory holds one run plus a few bytes per document.
+    """
+
+    def __init__(self, out_dir: str):
+        self.out_dir = out_dir
+        self.tmp_dir = out_dir + ".tmp"
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+        os.makedirs(self.tmp_dir)
+
+        self._docs_f = open(os.path.join(self.tmp_dir, "docs.jsonl"), "wb")
+        self._doc_offsets = array("Q")
+        self._doc_lens = array("I")
+        # hash(doc_id) per document: duplicate IDs are found and dropped in finish()
+        self._id_hashes = array("q")
+
+        self._runs = 0
+        self._term_ids: Dict[str, int] = {}
+        self._post_terms = array("I")
+        self._post_docs = array("I")
+        self._post_tfs = array("H")
+
+    def add(self, doc_id: str, text: str, metadata: Dict[str, Any]) -> None:
+        doc = len(self._doc_lens)
+        self._doc_offsets.append(self._docs_f.tell())
+        self._docs_f.write(json.dumps([doc_id, text, metadata], ensure_ascii=False).encode("utf-8", "surrogatepass") + b"\n")
+        self._id_hashes.append(hash(doc_id))
+
+        tokens = tokenize(text)
+        self._doc_lens.append(len(tokens))
+        term_ids = self._term_ids
+        for term, tf in Counter(tokens).items():
+            tid = term_ids.get(term)
+            if tid is None:
+                tid = term_ids[term] = len(term_ids)
+            self._post_terms.append(tid)
+            self._post_docs.append(doc)
+            self._post_tfs.append(min(tf, 0xFFFF))
+        if len(self._post_docs) >= LEXICAL_RUN_POSTINGS:
+            self._spill()
+
+    def _spill(self) -> None:
+        """Write the buffered postings as the next run, sorted by term bytes then doc."""
+        if not len(self._post_docs):
+            return
+        path = os.path.join(self.tmp_dir, f"run{self._runs}")
+        os.makedirs(path)
+        self._runs += 1
+
+        encoded = sorted((t.encode("utf-8", "surrogatepass"), tid) for t, tid in self._term_ids.items())
+        rank_of = np.empty(len(encoded), dtype=np.uint32)
+        for rank, (_, tid) in enumerate(encoded):
+            rank_of[tid] = rank
+        with open(os.path.join(path, "terms.bin"), "wb") as f:
+            f.write(b"".join(b for b, _ in encoded))
+        term_offsets = np.zeros(len(encoded) + 1, dtype=np.uint64)
+        np.cumsum([len(b) for b, _ in encoded], out=term_offsets[1:])
+        np.save(os.path.join(path, "term_offsets.npy"), term_offsets)
+
+        ranks = rank_of[np.frombuffer(self._post_terms, dtype=np.uint32)]
+        order = np.argsort(ranks, kind="stable")  # docs stay ascending within a term
+        np.frombuffer(self._post_docs, dtype=np.uint32)[order].tofile(os.path.join(path, "docs.bin"))
+        np.frombuffer(self._post_tfs, dtype=np.uint16)[order].tofile(os.path.join(path, "tfs.bin"))
+        np.save(os.path.join(path, "counts.npy"), np.bincount(ranks, minlength=len(encoded)).astype(np.uint32))
+
+        self._term_ids = {}
+        self._post_terms = array("I")
+        self._post_docs = array("I")
+        self._post_tfs = array("H")
+
+    def _first_ids(self) -> np.ndarray:
+        """Mask of the documents to keep: the first one of each doc_id."""
+        hashes = np.frombuffer(self._id_hashes, dtype=np.int64)
+        keep = np.ones(len(hashes), dtype=bool)
+        order = np.argsort(hashes, kind="stable")
+        same = np.flatnonzero(hashes[order][1:] == hashes[order][:-1])
+        if not len(same):
+            return keep
+        # equal hashes: compare the IDs themselves (rare, and hash collisions rarer)
+        candidates = np.unique(np.concatenate((order[same], order[same + 1])))
+        seen = set()
+        with open(os.path.join(self.tmp_dir, "docs.jsonl"), "rb") as f:
+            for doc in candidates:
+                f.seek(self._doc_offsets[doc])
+                doc_id = json.loads(f.readline().decode("utf-8", "surrogatepass"))[0]
+                if doc_id in seen:
+                    keep[doc] = False
+                seen.add(doc_id)
+        return keep
+
+    def finish(self) -> Dict[str, Any]:
+        self._docs_f.close()
+        self._spill()
+        tmp = self.tmp_dir
+
+        keep = self._first_ids()
+        # duplicates are left out, the documents after them renumbered
+        new_doc = (np.cumsum(keep) - 1).astype(np.uint32)
+        all_kept = bool(keep.all())
+
+        # k-way merge of the runs, term by term; equal terms come in run
+        # order, so docs stay ascending within a term
+        runs = [_Run(os.path.join(tmp, f"run{n}"), n) for n in range(self._runs)]
+        raw = {name: os.path.join(tmp, name + ".raw") for name in ("term_offsets", "post_offsets", "post_docs", "post_tfs")}
+        files = {name: open(path, "wb") for name, path in raw.items()}
+        files["terms"] = open(os.path.join(tmp, "terms.bin"), "wb")
+        term_offsets, post_offsets = array("Q", [0]), array("Q", [0])
+        term_bytes = postings = terms = 0
+        try:
+            current, group = None, []
+            # a last (None, ...) entry flushes the last term
+            for term, number, count in itertools.chain(heapq.merge(*runs), [(None, -1, 0)]):
+                if term == current:
+                    group.append((number, count))
+                    continue
+                # current's postings are complete: append them
+                n = 0
+                for run_no, run_count in group:
+                    docs, tfs = runs[run_no].read(run_count)
+                    if not all_kept:
+                        docs = np.frombuffer(docs, dtype=np.uint32)
+                        kept = keep[docs]
+                        docs = new_doc[docs[kept]].tobytes()
+                        tfs = np.frombuffer(tfs, dtype=np.uint16)[kept].tobytes()
+                    files["post_docs"].write(docs)
+                    files["post_tfs"].write(tfs)
+                    n += len(docs) // 4
+                if n:  # else only in duplicates
+                    files["terms"].write(current)
+                    terms += 1
+                    term_bytes += len(current)
+                    postings += n
+                    term_offsets.append(term_bytes)
+                    post_offsets.append(postings)
+                    if len(term_offsets) >= 65536:
+                        files["term_offsets"].write(term_offsets.tobytes())
+                        files["post_offsets"].write(post_offsets.tobytes())
+                        term_offsets, post_offsets = array("Q"), array("Q")
+                current, group = term, [(number, count)]
+            files["term_offsets"].write(term_offsets.tobytes())
+            files["post_offsets"].write(post_offsets.tobytes())
+        finally:
+            for f in files.values():
+                f.close()
+            for run in runs:
+                run.close()
+        for n in range(self._runs):
+            shutil.rmtree(os.path.join(tmp, f"run{n}"))
+
+        _write_npy(os.path.join(tmp, "term_offsets.npy"), raw["term_offsets"], np.uint64, terms + 1)
+        _write_npy(os.path.join(tmp, "post_offsets.npy"), raw["post_offsets"], np.uint64, terms + 1)
+        _write_npy(os.path.join(tmp, "post_docs.npy"), raw["post_docs"], np.uint32, postings)
+        _write_npy(os.path.join(tmp, "post_tfs.npy"), raw["post_tfs"], np.uint16, postings)
+
+        doc_lens = np.frombuffer(self._doc_lens, dtype=np.uint32)[keep]
+        np.save(os.path.join(tmp, "doc_lens.npy"), doc_lens)
+        np.save(os.path.join(tmp, "doc_offsets.npy"), np.frombuffer(self._doc_offsets, dtype=np.uint64)[keep])
+
+        manifest = {
+            "docs": int(len(doc_lens)),
+            "terms": terms,
+            "postings": postings,
+            "avg_doc_len": float(doc_lens.mean()) if len(doc_lens) else 0.0,
+            "built_utc": datetime.now(timezone.utc).isoformat(timespec="seconds").replace("+00:00", "Z"),
+        }
+        with open(os.path.join(tmp, _MANIFEST), "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+
+        old = self.out_dir + ".old"
+        shutil.rmtree(old, ignore_errors=True)
+        if os.path.isdir(self.out_dir):
+            os.replace(self.out_dir, old)
+        os.replace(tmp, self.out_dir)
+        shutil.rmtree(old, ignore_errors=True)
+        return manifest
+
+    def abort(self) -> None:
+        try:
+            self._docs_f.close()
+        except Exception:
+            pass
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+
+class LexicalIndex:
+    """Read side: every array is memory-mapped, so opening costs no parsing."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, _MANIFEST), "r", encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        self.docs = int(self.manifest["docs"])
+        self.avg_doc_len = float(self.manifest["avg_doc_len"]) or 1.0
+
+        def load(name: str) -> np.ndarray:
+            return np.load(os.path.join(path, name), mmap_mode="r")
+
+        self._term_offsets = load("term_offsets.npy")
+        self._post_offsets = load("post_offsets.npy")
+        self._post_docs = load("post_docs.npy")
+        self._post_tfs = load("post_tfs.npy")
+        self._doc_lens = load("doc_lens.npy")
+        self._doc_offsets = load("doc_offsets.npy")
+
+        self._terms_f = open(os.path.join(path, "terms.bin"), "rb")
+        size = os.fstat(self._terms_f.fileno()).st_size
+        self._terms = mmap.mmap(self._terms_f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        self._docs_f = open(os.path.join(path, "docs.jsonl"), "rb")
+        self._docs_lock = threading.Lock()
+
+    def _term_rank(self, term: bytes) -> int:
+        offsets = self._term_offsets
+        lo, hi = 0, len(offsets) - 1
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._terms[int(offsets[mid]) : int(offsets[mid + 1])] < term:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(offsets) - 1 and self._terms[int(offsets[lo]) : int(offsets[lo + 1])] == term:
+            return lo
+        return -1
+
+    def scores(self, query: str) -> Tuple[np.ndarray, np.ndarray]:
+        """(doc indexes, BM25 scores) of every document matching a query token."""
+        docs_parts: List[np.ndarray] = []
+        score_parts: List[np.ndarray] = []
+        for term in set(tokenize(query)):
+            rank = self._term_rank(term.encode("utf-8", "surrogatepass"))
+            if rank < 0:
+                continue
+            start, stop = int(self._post_offsets[rank]), int(self._post_offsets[rank + 1])
+            docs = self._post_docs[start:stop]
+            tfs = self._post_tfs[start:stop].astype(np.float32)
+            df = stop - start
+            idf = np.log(1.0 + (self.docs - df + 0.5) / (df + 0.5))
+            norm = BM25_K1 * (1.0 - BM25_B + BM25_B * self._doc_lens[docs] / self.avg_doc_len)
+            docs_parts.append(np.asarray(docs))
+            score_parts.append(idf * tfs * (BM25_K1 + 1.0) / (tfs + norm))
+
+        if not docs_parts:
+            return np.zeros(0, dtype=np.uint32), np.zeros(0, dtype=np.float32)
+        if len(docs_parts) == 1:
+            return docs_parts[0], score_parts[0]
+        uniq, inverse = np.unique(np.concatenate(docs_parts), return_inverse=True)
+        return uniq, np.bincount(inverse, weights=np.concatenate(score_parts)).astype(np.float32)
+
+    def doc(self, idx: int) -> Tuple[str, str, Dict[str, Any]]:
+        with self._docs_lock:
+            self._docs_f.seek(int(self._doc_offsets[idx]))
+            line = self._docs_f.readline()
+        doc_id, text, metadata = json.loads(line.decode("utf-8", "surrogatepass"))
+        return doc_id, text, metadata or {}
+
+    def search(
+        self, query: str, top_k: int, accept: Optional[Callable[[str, Dict[str, Any]], bool]] = None
+    ) -> List[Dict[str, Any]]:
+        """Top-k documents by BM25; accept(text, metadata) filters candidates in score order."""
+        docs, scores = self.scores(query)
+        if not len(docs):
+            return []
+
+        if accept is None and len(docs) > top_k:
+            top = np.argpartition(-scores, top_k - 1)[:top_k]
+            order = top[np.argsort(-scores[top], kind="stable")]
+        else:
+            order = np.argsort(-scores, kind="stable")
+
+        hits = []
+        for i in order:
+            doc_id, text, metadata = self.doc(int(docs[i]))
+            if accept is not None and not accept(text, metadata):
+                continue
+            hits.append({"id": doc_id, "text": text, "metadata": metadata, "bm25": float(scores[i])})
+            if len(hits) >= top_k:
+                break
+        return hits
+
+
+_open: Dict[str, Tuple[int, LexicalIndex]] = {}
+_open_lock = threading.Lock()
+
+
+def open_lexical_index(case_id: str) -> Optional[LexicalIndex]:
+    """The case's index, reopened when a rebuild replaced it; None if not built yet."""
+    path = lexical_index_path(os.path.join(ARTIFACT_DIR, case_id))
+    try:
+        mtime = os.stat(os.path.join(path, _MANIFEST)).st_mtime_ns
+    except OSError:
+        return None
+
+    with _open_lock:
+        cached = _open.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        # A replaced index is left to the GC: searches may still hold it
+        index = LexicalIndex(path)
+        _open[path] = (mtime, index)
+    return index
@@ -0,0 +1,640 @@
+# api/local_vector_store.py
+import os
+import json
+import shutil
+import threading
+from array import array
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from api.search_filters import where_matcher
+from api.vector_store import VectorStore
+
+ARTIFACT_DIR = os.environ.get("ARTIFACT_DIR", "/data/artifacts")
+
+# Per-case store directory, next to the derivatives
+VECTOR_INDEX_DIR = "vector_index"
+
+# float16 halves disk and page cache; scores are computed in float32 either way
+LOCAL_VECTOR_DTYPE = os.getenv("LOCAL_VECTOR_DTYPE", "float32").strip().lower()
+# Below this many live chunks queries are exact brute force over the matrix;
+# from here on unfiltered queries go through an HNSW graph (hnswlib)
+LOCAL_HNSW_MIN_ROWS = int(os.getenv("LOCAL_HNSW_MIN_ROWS", "50000"))
+LOCAL_HNSW_M = int(os.getenv("LOCAL_HNSW_M", "16"))
+LOCAL_HNSW_EF_CONSTRUCTION = int(os.getenv("LOCAL_HNSW_EF_CONSTRUCTION", "200"))
+LOCAL_HNSW_EF = int(os.getenv("LOCAL_HNSW_EF", "100"))
+
+_CONFIG = "config.json"
+_LOG = "log.jsonl"
+_VECTORS = "vectors.bin"
+_HNSW = "hnsw.bin"
+_HNSW_STATE = "hnsw.json"
+
+# Rows scored per matrix block in brute-force search
+_BLOCK_ROWS = 65536
+
+
+def vector_index_path(case_dir: str) -> str:
+    return os.path.join(case_dir, VECTOR_INDEX_DIR)
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.clip(norms, 1e-12, None)
+
+
+def _read_document(f, offset: int) -> str:
+    f.seek(offset)
+    rec = json.loads(f.readline().decode("utf-8", "surrogatepass"))
+    return rec.get("doc") or ""
+
+
+def _value_key(value: Any) -> Any:
+    """Dictionary key of a metadata value; equal values (4624, 4624.0) share one."""
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        return ("unhashable", repr(value))
+
+
+class _MetaColumn:
+    """
+    One metadata field over every row: dictionary codes for $eq/$in, and
+    the value as float64 (NaN when not a number) for $gte/$lte.
+    """
+
+    def __init__(self, field: str, metas: List[Dict[str, Any]]):
+        self.field = field
+        self.code_of: Dict[Any, int] = {}
+        self.codes = array("i")
+        self.numbers = array("d")
+        for meta in metas:
+            self.append(meta)
+
+    def _code(self, value: Any) -> int:
+        return self.code_of.setdefault(_value_key(value), len(self.code_of))
+
+    @staticmethod
+    def _number(value: Any) -> float:
+        return float(value) if isinstance(value, (int, float)) else np.nan
+
+    def append(self, meta: Dict[str, Any]) -> None:
+        value = meta.get(self.field)
+        self.codes.append(self._code(value))
+        self.numbers.append(self._number(value))
+
+    def set(self, row: int, meta: Dict[str, Any]) -> None:
+        value = meta.get(self.field)
+        self.codes[row] = self._code(value)
+        self.numbers[row] = self._number(value)
+
+    def snapshot(self) -> Tuple[np.ndarray, Dict[Any, int], np.ndarray]:
+        return (
+            np.frombuffer(self.codes, dtype=np.int32).copy(),
+            dict(self.code_of),
+            np.frombuffer(self.numbers, dtype=np.float64).copy(),
+        )
+
+
+def _clause_mask(
+    clause: Dict[str, Any], columns: Dict[str, Tuple[np.ndarray, Dict[Any, int], np.ndarray]], rows: int
+) -> np.ndarray:
+    """Rows matching a where clause (as api/search_filters.py:_match_clause would), from column snapshots."""
+    mask = np.ones(rows, dtype=bool)
+    for field, cond in clause.items():
+        if field == "$and":
+            parts = [_clause_mask(c, columns, rows) for c in cond]
+        else:
+            codes, code_of, numbers = columns[field]
+            if not isinstance(cond, dict):
+                cond = {"$eq": cond}
+            parts = []
+            for op, arg in cond.items():
+                if op in ("$eq", "$in"):
+                    wanted = [code_of[k] for k in map(_value_key, [arg] if op == "$eq" else arg) if k in code_of]
+                    parts.append(np.isin(codes, np.asarray(wanted, dtype=np.int32)))
+                elif op == "$gte":
+                    parts.append(numbers >= arg)
+                else:
+                    parts.append(numbers <= arg)
+        for part in parts:
+            mask &= part
+    return mask
+
+
+class CaseVectors:
+    """
+    One case's chunks. Vectors are rows of vectors.bin (raw, memory-mapped);
+    ids, documents and metadata live in an append-only log.jsonl:
+
+        {"op": "add", "id", "doc", "meta"}   -> next row of vectors.bin
+        {"op": "meta", "id", "meta"}
+        {"op": "del", "id"}
+
+    The log is replayed on open, keeping only ids, metadata and the byte
+    offset of each document in memory. Dead rows are dropped by compact().
+
+    Metadata fields that where filters have used are also kept as columns
+    (see _MetaColumn), so a filter is a vectorized mask. Queries hold the
+    lock only to snapshot what they read; writes that change the HNSW graph
+    wait for the queries searching it to finish.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.lock = threading.RLock()
+        self._hnsw_idle = threading.Condition(self.lock)
+        self._hnsw_readers = 0
+
+        self.dim: Optional[int] = None
+        self.dtype = np.dtype(LOCAL_VECTOR_DTYPE)
+        config_path = os.path.join(path, _CONFIG)
+        if os.path.exists(config_path):
+            with open(config_path, "r", encoding="utf-8") as f:
+                config = json.load(f)
+            self.dim = config.get("dim")
+            self.dtype = np.dtype(config.get("dtype", LOCAL_VECTOR_DTYPE))
+
+        self._matrix: Optional[np.ndarray] = None
+        self._hnsw = None
+        self._hnsw_rows = 0
+        self._hnsw_dirty = False
+        self._replay()
+
+    # -------------------------
+    # Storage
+    # -------------------------
+    def _replay(self) -> None:
+        self.ids: List[str] = []
+        self.metas: List[Dict[str, Any]] = []
+        self.doc_offsets: List[int] = []
+        self.alive = bytearray()
+        self.row_of: Dict[str, int] = {}
+        self._columns: Dict[str, _MetaColumn] = {}
+
+        log_path = os.path.join(self.path, _LOG)
+        if os.path.exists(log_path):
+            with open(log_path, "rb") as f:
+                offset = 0
+                for line in f:
+                    line_offset, offset = offset, offset + len(line)
+                    try:
+                        rec = json.loads(line.decode("utf-8", "surrogatepass"))
+                    except Exception:
+                        continue  # torn last line after a crash
+                    self._apply(rec, line_offset)
+
+        # vectors.bin is appended before the log, so it may hold rows the
+        # log never recorded (crash in between); those are cut off here
+        vectors_path = os.path.join(self.path, _VECTORS)
+        if self.dim:
+            rows_on_disk = os.path.getsize(vectors_path) // self._row_bytes() if os.path.exists(vectors_path) else 0
+            if rows_on_disk > len(self.ids):
+                with open(vectors_path, "r+b") as f:
+                    f.truncate(len(self.ids) * self._row_bytes())
+            for row in range(rows_on_disk, len(self.ids)):
+                self._kill(row)
+
+        self._log = open(log_path, "ab")
+        self._log_offset = self._log.tell()
+
+    def _apply(self, rec: Dict[str, Any], line_offset: int) -> None:
+        op, cid = rec.get("op"), rec.get("id")
+        row = self.row_of.get(cid)
+        if op == "add":
+            if row is not None:
+                self._kill(row)
+            self.row_of[cid] = len(self.ids)
+            self.ids.append(cid)
+            self.metas.append(rec.get("meta") or {})
+            self.doc_offsets.append(line_offset)
+            self.alive.append(1)
+            for column in self._columns.values():
+                column.append(self.metas[-1])
+        elif op == "meta" and row is not None:
+            self._set_meta(row, rec.get("meta") or {})
+        elif op == "del" and row is not None:
+            self._kill(row)
+
+    def _set_meta(self, row: int, meta: Dict[str, Any]) -> None:
+        self.metas[row] = meta
+        for column in self._columns.values():
+            column.set(row, meta)
+
+    def _kill(self, row: int) -> None:
+        if not self.alive[row]:
+            return
+        self.alive[row] = 0
+        self._set_meta(row, {})
+        if self.row_of.get(self.ids[row]) == row:
+            del self.row_of[self.ids[row]]
+        if self._hnsw is not None and row < self._hnsw_rows:
+            try:
+                self._hnsw.mark_deleted(row)
+            except RuntimeError:
+                pass  # already marked
+            self._hnsw_dirty = True
+
+    def _row_bytes(self) -> int:
+        return int(self.dim) * self.dtype.itemsize
+
+    def _write_log(self, records: List[Dict[str, Any]]) -> None:
+        for rec in records:
+            line = json.dumps(rec, ensure_ascii=False).encode("utf-8", "surrogatepass") + b"\n"
+            self._apply(rec, self._log_offset)
+            self._log.write(line)
+            self._log_offset += len(line)
+        self._log.flush()
+
+    def matrix(self) -> np.ndarray:
+        if self._matrix is None:
+            rows = len(self.ids)
+            if not rows or not self.dim:
+                return np.zeros((0, self.dim or 0), dtype=self.dtype)
+            self._matrix = np.memmap(
+                os.path.join(self.path, _VECTORS), dtype=self.dtype, mode="r", shape=(rows, int(self.dim))
+            )
+        return self._matrix
+
+    def live_count(self) -> int:
+        return len(self.row_of)
+
+    def document(self, row: int, f=None) -> str:
+        if f is None:
+            with open(os.path.join(self.path, _LOG), "rb") as f:
+                return self.document(row, f)
+        return _read_document(f, self.doc_offsets[row])
+
+    def _wait_hnsw_readers(self) -> None:
+        """Called with the lock held, before changing the HNSW graph."""
+        while self._hnsw_readers:
+            self._hnsw_idle.wait()
+
+    # -------------------------
+    # Writes
+    # -------------------------
+    def upsert(self, ids, documents, metadatas, embeddings) -> None:
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if vectors.ndim != 2 or len(vectors) != len(ids):
+            raise ValueError("embeddings must be one vector per id")
+
+        with self.lock:
+            self._wait_hnsw_readers()
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+                with open(os.path.join(self.path, _CONFIG), "w", encoding="utf-8") as f:
+                    json.dump({"dim": self.dim, "dtype": self.dtype.name}, f)
+            if vectors.shape[1] != self.dim:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match the case's {self.dim}")
+
+            first_row = len(self.ids)
+            with open(os.path.join(self.path, _VECTORS), "ab") as f:
+                f.write(_normalize(vectors).astype(self.dtype).tobytes())
+            self._write_log(
+                [{"op": "add", "id": cid, "doc": doc, "meta": meta} for cid, doc, meta in zip(ids, documents, metadatas)]
+            )
+            self._matrix = None
+            if self._hnsw is not None:
+                self._hnsw_add(first_row, len(self.ids))
+
+    def update_metadata(self, ids, metadatas) -> None:
+        with self.lock:
+            self._write_log(
+                [{"op": "meta", "id": cid, "meta": meta} for cid, meta in zip(ids, metadatas) if cid in self.row_of]
+            )
+
+    def delete(self, ids) -> None:
+        with self.lock:
+            self._wait_hnsw_readers()
+            self._write_log([{"op": "del", "id": cid} for cid in ids if cid in self.row_of])
+
+    def compact(self) -> bool:
+        """Rewrite log and vectors with live rows only, once most rows are dead."""
+        with self.lock:
+            dead = len(self.ids) - self.live_count()
+            if dead < 1024 or dead < self.live_count():
+                return False
+
+            tmp = self.path + ".tmp"
+            shutil.rmtree(tmp, ignore_errors=True)
+            os.makedirs(tmp)
+            shutil.copy2(os.path.join(self.path, _CONFIG), os.path.join(tmp, _CONFIG))
+
+            matrix = self.matrix()
+            live = np.flatnonzero(np.frombuffer(self.alive, dtype=np.uint8))
+            with open(os.path.join(tmp, _VECTORS), "wb") as vf, open(os.path.join(tmp, _LOG), "wb") as lf, open(
+                os.path.join(self.path, _LOG), "rb"
+            ) as old_log:
+                for start in range(0, len(live), _BLOCK_ROWS):
+                    rows = live[start : start + _BLOCK_ROWS]
+                    vf.write(np.asarray(matrix[rows]).tobytes())
+                    for row in rows:
+                        rec = {"op": "add", "id": self.ids[row], "doc": self.document(row, old_log), "meta": self.metas[row]}
+                        lf.write(json.dumps(rec, ensure_ascii=False).encode("utf-8", "surrogatepass") + b"\n")
+
+            self._log.close()
+            self._matrix = None
+            self._hnsw = None
+            old = self.path + ".old"
+            shutil.rmtree(old, ignore_errors=True)
+            os.replace(self.path, old)
+            os.replace(tmp, self.path)
+            shutil.rmtree(old, ignore_errors=True)
+            self._replay()
+            return True
+
+    # -------------------------
+    # HNSW
+    # -------------------------
+    def _hnsw_add(self, start: int, stop: int) -> None:
+        index = self._hnsw
+        if stop > index.get_max_elements():
+            index.resize_index(max(stop, index.get_max_elements() * 2))
+        matrix = self.matrix()
+        for block in range(start, stop, _BLOCK_ROWS):
+            rows = np.arange(block, min(stop, block + _BLOCK_ROWS))
+            rows = rows[np.frombuffer(self.alive, dtype=np.uint8)[rows] == 1]
+            if len(rows):
+                index.add_items(np.asarray(matrix[rows], dtype=np.float32), rows)
+        self._hnsw_rows = stop
+        self._hnsw_dirty = True
+
+    def hnsw(self):
+        """The case's HNSW graph: loaded from disk and caught up, or built now."""
+        if self._hnsw is not None:
+            return self._hnsw
+        import hnswlib
+
+        index = hnswlib.Index(space="cosine", dim=int(self.dim))
+        saved_rows = 0
+        state_path = os.path.join(self.path, _HNSW_STATE)
+        if os.path.exists(state_path):
+            with open(state_path, "r", encoding="utf-8") as f:
+                saved_rows = int(json.load(f).get("rows", 0))
+        if 0 < saved_rows <= len(self.ids):
+            index.load_index(os.path.join(self.path, _HNSW), max_elements=max(len(self.ids), 1))
+        else:
+            saved_rows = 0
+            index.init_index(
+                max_elements=max(len(self.ids), 1), ef_construction=LOCAL_HNSW_EF_CONSTRUCTION, M=LOCAL_HNSW_M
+            )
+
+        self._hnsw = index
+        self._hnsw_rows = saved_rows
+        # rows deleted since the graph was saved
+        for row in np.flatnonzero(np.frombuffer(self.alive, dtype=np.uint8)[:saved_rows] == 0):
+            try:
+                index.mark_deleted(int(row))
+            except RuntimeError:
+                pass
+        if saved_rows < len(self.ids):
+            self._hnsw_add(saved_rows, len(self.ids))
+            self.flush()
+        return index
+
+    def flush(self) -> None:
+        """Persist the HNSW graph if it changed, so the next open only catches up."""
+        with self.lock:
+            if self._hnsw is None or not self._hnsw_dirty:
+                return
+            self._hnsw.save_index(os.path.join(self.path, _HNSW))
+            with open(os.path.join(self.path, _HNSW_STATE), "w", encoding="utf-8") as f:
+                json.dump({"rows": self._hnsw_rows}, f)
+            self._hnsw_dirty = False
+
+    # -------------------------
+    # Search
+    # -------------------------
+    def _where_columns(self, clause: Dict[str, Any], out: Dict[str, Tuple[np.ndarray, Dict[Any, int], np.ndarray]]) -> bool:
+        """
+        Snapshot (lock held) the columns a where clause reads into out;
+        False if the clause has an operator the columns can't evaluate.
+        """
+        for field, cond in clause.items():
+            if field == "$and":
+                if not all(self._where_columns(c, out) for c in cond):
+                    return False
+                continue
+            if isinstance(cond, dict) and not set(cond) <= {"$eq", "$in", "$gte", "$lte"}:
+                return False
+            column = self._columns.get(field)
+            if column is None:
+                column = self._columns[field] = _MetaColumn(field, self.metas)
+            out[field] = column.snapshot()
+        return True
+
+    def _snapshot(self, where, hnsw: bool) -> Dict[str, Any]:
+        """What a query reads, taken under the lock; see query()."""
+        snap: Dict[str, Any] = {
+            "matrix": self.matrix(),
+            "alive": np.frombuffer(self.alive, dtype=np.uint8).copy() == 1,
+            "ids": self.ids,
+            "metas": self.metas,
+            "doc_offsets": self.doc_offsets,
+            # an open handle keeps reading the log this snapshot belongs to, even across compact()
+            "log": open(os.path.join(self.path, _LOG), "rb"),
+            "hnsw": None,
+        }
+        if where:
+            columns: Dict[str, Any] = {}
+            if self._where_columns(where, columns):
+                snap["columns"] = columns
+            else:
+                accept = where_matcher(where, None)
+                snap["mask"] = np.fromiter((accept("", m) for m in self.metas), dtype=bool, count=len(self.metas))
+        if hnsw:
+            snap["hnsw"] = self.hnsw()
+            self._hnsw_readers += 1
+        return snap
+
+    def _release(self, snap: Dict[str, Any]) -> None:
+        snap["log"].close()
+        if snap["hnsw"] is not None:
+            with self.lock:
+                self._hnsw_readers -= 1
+                self._hnsw_idle.notify_all()
+
+    @staticmethod
+    def _brute_force(matrix: np.ndarray, live: np.ndarray, queries: np.ndarray, k: int):
+        """Exact top-k (rows, distances) per query over the rows set in live."""
+        best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+        best_dist = np.zeros((len(queries), 0), dtype=np.float32)
+        for start in range(0, len(matrix), _BLOCK_ROWS):
+            rows = np.flatnonzero(live[start : start + _BLOCK_ROWS]) + start
+            if not len(rows):
+                continue
+            dist = 1.0 - queries @ np.asarray(matrix[rows], dtype=np.float32).T
+            best_rows = np.concatenate([best_rows, np.broadcast_to(rows, dist.shape)], axis=1)
+            best_dist = np.concatenate([best_dist, dist], axis=1)
+            if best_dist.shape[1] > k:
+                part = np.argpartition(best_dist, k - 1, axis=1)[:, :k]
+                best_rows = np.take_along_axis(best_rows, part, axis=1)
+                best_dist = np.take_along_axis(best_dist, part, axis=1)
+
+        order = np.argsort(best_dist, axis=1, kind="stable")
+        return np.take_along_axis(best_rows, order, axis=1), np.take_along_axis(best_dist, order, axis=1)
+
+    def query(self, embeddings, n_results, where=None, where_document=None) -> Dict[str, Any]:
+        out: Dict[str, Any] = {"ids": [], "distances": [], "documents": [], "metadatas": []}
+        queries = np.asarray(embeddings, dtype=np.float32)
+        if not len(queries):
+            return out
+        needle = (where_document or {}).get("$contains")
+
+        with self.lock:
+            if not self.live_count() or not self.dim:
+                for key in out:
+                    out[key] = [[] for _ in range(len(queries))]
+                return out
+            if queries.shape[1] != self.dim:
+                raise ValueError(f"Query dimension {queries.shape[1]} does not match the case's {self.dim}")
+            use_hnsw = not where and not needle and self.live_count() >= LOCAL_HNSW_MIN_ROWS
+            snap = self._snapshot(where, use_hnsw)
+
+        try:
+            queries = _normalize(queries)
+            live = snap["alive"]
+            if "columns" in snap:
+                live &= _clause_mask(where, snap["columns"], len(live))
+            elif "mask" in snap:
+                live &= snap["mask"]
+            candidates = int(live.sum())
+            n = min(int(n_results), candidates)
+            log_f, doc_offsets = snap["log"], snap["doc_offsets"]
+
+            if n < 1:
+                rows = np.zeros((len(queries), 0), dtype=np.int64)
+                dists = np.zeros((len(queries), 0), dtype=np.float32)
+            elif use_hnsw:
+                index = snap["hnsw"]
+                try:
+                    index.set_ef(max(LOCAL_HNSW_EF, n))
+                    rows, dists = index.knn_query(queries, k=n)
+                except RuntimeError:
+                    # the graph found fewer than n live neighbours
+                    rows, dists = self._brute_force(snap["matrix"], live, queries, n)
+            else:
+                # With a document filter, widen the candidates until n pass it
+                k = n if not needle else min(candidates, n * 4)
+                while True:
+                    rows, dists = self._brute_force(snap["matrix"], live, queries, k)
+                    if not needle or k >= candidates:
+                        break
+                    docs_ok = [sum(needle in _read_document(log_f, doc_offsets[int(r)]) for r in row) for row in rows]
+                    if min(docs_ok) >= n:
+                        break
+                    k = min(candidates, k * 4)
+
+            for q_rows, q_dists in zip(rows, dists):
+                ids, distances, documents, metadatas = [], [], [], []
+                for row, dist in zip(q_rows, q_dists):
+                    row = int(row)
+                    doc = _read_document(log_f, doc_offsets[row])
+                    if needle and needle not in doc:
+                        continue
+                    ids.append(snap["ids"][row])
+                    distances.append(max(0.0, float(dist)))
+                    documents.append(doc)
+                    metadatas.append(snap["metas"][row])
+                    if len(ids) >= n:
+                        break
+                out["ids"].append(ids)
+                out["distances"].append(distances)
+                out["documents"].append(documents)
+                out["metadatas"].append(metadatas)
+        finally:
+            self._release(snap)
+        return out
+
+    def close(self) -> None:
+        with self.lock:
+            self._log.close()
+            self._matrix = None
+            self._hnsw = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rows": len(self.ids),
+            "live": self.live_count(),
+            "dim": self.dim,
+            "dtype": self.dtype.name,
+            "hnsw": self._hnsw is not None,
+        }
+
+
+class LocalVectorStore(VectorStore):
+    """
+    In-process store: no service, no HTTP hop. Each case keeps its vectors in
+    <ARTIFACT_DIR>/<case>/vector_index (see CaseVectors); search is exact
+    brute force below LOCAL_HNSW_MIN_ROWS live chunks and HNSW above it.
+    """
+
+    name = "local"
+
+    def __init__(self):
+        self._cases: Dict[str, CaseVectors] = {}
+        self._lock = threading.Lock()
+
+    def _case(self, case_id: str) -> CaseVectors:
+        case = self._cases.get(case_id)
+        if case is None:
+            with self._lock:
+                case = self._cases.get(case_id)
+                if case is None:
+                    case = self._cases[case_id] = CaseVectors(vector_index_path(os.path.join(ARTIFACT_DIR, case_id)))
+        return case
+
+    def existing_ids(self, case_id: str, ids: List[str]) -> Set[str]:
+        case = self._case(case_id)
+        return {cid for cid in ids if cid in case.row_of}
+
+    def update_metadata(self, case_id, ids, metadatas) -> None:
+        self._case(case_id).update_metadata(ids, metadatas)
+
+    def upsert(self, case_id, ids, documents, metadatas, embeddings) -> None:
+        self._case(case_id).upsert(ids, documents, metadatas, embeddings)
+
+    def prune(self, case_id, where, keep, page_size=5000) -> int:
+        case = self._case(case_id)
+        accept = where_matcher(where, None)
+        with case.lock:
+            stale = [
+                case.ids[row]
+                for row in range(len(case.ids))
+                if case.alive[row] and (accept is None or accept("", case.metas[row])) and not keep(case.metas[row])
+            ]
+            case.delete(stale)
+            # pruning ends every reindex, so this is where the case gets tidied up
+            if not case.compact():
+                case.flush()
+        return len(stale)
+
+    def query(self, case_id, embeddings, n_results, where=None, where_document=None) -> Dict[str, Any]:
+        return self._case(case_id).query(embeddings, n_results, where=where, where_document=where_document)
+
+    def delete_case(self, case_id: str) -> None:
+        with self._lock:
+            case = self._cases.pop(case_id, None)
+        if case is not None:
+            case.close()
+        shutil.rmtree(vector_index_path(os.path.join(ARTIFACT_DIR, case_id)), ignore_errors=True)
+
+    def forget_case(self, case_id: str) -> None:
+        with self._lock:
+            case = self._cases.pop(case_id, None)
+        if case is not None:
+            case.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            cases = dict(self._cases)
+        return {
+            "backend": self.name,
+            "dtype": LOCAL_VECTOR_DTYPE,
+            "hnsw_min_rows": LOCAL_HNSW_MIN_ROWS,
+            "open_cases": len(cases),
+            "cases": {cid: case.stats() for cid, case in cases.items()},
+        }
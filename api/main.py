@@ -1,15 +1,21 @@
+import time
+
+# Taken before the heavy imports below, so /metrics can report startup time
+_PROCESS_T0 = time.perf_counter()
+
 import os
 import sys
 import json
 import uuid
 import shutil
 import hashlib
+import threading
 import subprocess
 from pathlib import Path
 from typing import Any, Dict, Optional, List
 
 from fastapi import FastAPI, UploadFile, BackgroundTasks, Body, Query
-from fastapi.responses import JSONResponse, HTMLResponse, FileResponse
+from fastapi.responses import JSONResponse, HTMLResponse, FileResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
@@ -18,9 +24,23 @@ from dotenv import load_dotenv
 from datetime import datetime
 from openai import OpenAI
 
-from api.timeline import build_timeline
-from api.embedder import semantic_search, embed_texts
+from api.timeline import build_histogram, build_timeline
+from api.derivative_io import ZSTD_SUFFIX, derivative_exists, derivative_length, open_derivative
+from api.timeline_store import TIMELINE_RETRY_AFTER_S, TimelineStoreBuilding, page_timeline
+from api.embedder import (
+    semantic_search,
+    semantic_search_batch,
+    semantic_search_cases,
+    shutdown_cross_case_pool,
+    embed_texts,
+    embedding_cache_stats,
+    embedder_load_stats,
+    vector_store_stats,
+    warm_up,
+)
 from api.ingest_utils import build_and_index_case_corpus
+from api.embed_pool import embed_pool_stats, shutdown_embed_pool
+from api.search_cache import search_cache_stats
 
 load_dotenv()
 
@@ -31,6 +51,10 @@ load_dotenv()
 ARTIFACT_DIR = os.environ.get("ARTIFACT_DIR", "/data/artifacts")
 os.makedirs(ARTIFACT_DIR, exist_ok=True)
 
+# Set EMBED_WARMUP=1 to load the embedding model and vector store at startup
+# (in the background) instead of on the first search/index request.
+EMBED_WARMUP = os.getenv("EMBED_WARMUP", "0") not in ("0", "false", "False", "")
+
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 client = OpenAI(api_key=OPENAI_API_KEY) if OPENAI_API_KEY else None
 
@@ -49,6 +73,30 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+_STARTUP_TIMES: Dict[str, float] = {"import_s": round(time.perf_counter() - _PROCESS_T0, 3)}
+
+
+def _run_warm_up():
+    try:
+        warm_up()
+    except Exception as e:
+        print(f"[STARTUP] embedder warm-up failed: {e}")
+
+
+@app.on_event("startup")
+def on_startup():
+    _STARTUP_TIMES["ready_s"] = round(time.perf_counter() - _PROCESS_T0, 3)
+    print(f"[STARTUP] api ready in {_STARTUP_TIMES['ready_s']}s (imports {_STARTUP_TIMES['import_s']}s)")
+    if EMBED_WARMUP:
+        threading.Thread(target=_run_warm_up, name="embed-warmup", daemon=True).start()
+
+
+@app.on_event("shutdown")
+def on_shutdown():
+    shutdown_embed_pool()
+    shutdown_cross_case_pool()
+
+
 # ------------------------------------------------------------------------------------
 # HELPERS
 # ------------------------------------------------------------------------------------
@@ -57,11 +105,11 @@ DEFAULT_MAX_CHARS = int(os.getenv("EXPLAIN_MAX_CHARS", "12000"))
 DETAIL_LINES_LIMIT = int(os.getenv("CASE_DETAILS_LINES_LIMIT", "200"))
 
 def read_limited_text(path: Path, max_chars: int = DEFAULT_MAX_CHARS) -> str:
-    """Read up to max_chars from a text file safely."""
-    if not path.exists():
+    """Read up to max_chars from a text file (or zstd derivative) safely."""
+    if not derivative_exists(str(path)):
         return ""
     try:
-        with path.open("r", encoding="utf-8", errors="ignore") as f:
+        with open_derivative(str(path), "r") as f:
             return f.read(max_chars)
     except Exception:
         return ""
@@ -200,13 +248,36 @@ def search_get(
     q: str,
     top_k: int = 5,
     include_metadata: bool = Query(True),
+    source: Optional[str] = None,
+    file: Optional[str] = None,
+    event_id: Optional[str] = None,
+    category: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    contains: Optional[str] = None,
+    mode: str = "vector",
 ):
+    """
+    Filters take comma-separated values; start/end are ISO timestamps or epoch seconds.
+    mode: vector | lexical (BM25, exact tokens) | hybrid.
+    """
+    filters = {
+        "source": source,
+        "file": file,
+        "event_id": event_id,
+        "category": category,
+        "start": start,
+        "end": end,
+        "contains": contains,
+    }
     try:
-        out = semantic_search(case_id, q, top_k)
+        out = semantic_search(case_id, q, top_k, filters=filters, mode=mode)
         if not include_metadata:
             for r in out.get("results", []):
                 r.pop("metadata", None)
         return out
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": str(e)})
 
@@ -216,16 +287,102 @@ class SearchRequest(BaseModel):
     query: str
     top_k: int = 5
     include_metadata: bool = True
+    # source, file (glob), event_id, category, start, end, contains
+    filters: Optional[Dict[str, Any]] = None
+    # vector | lexical | hybrid
+    mode: str = "vector"
 
 
 @app.post("/search")
 def search_post(req: SearchRequest):
     try:
-        out = semantic_search(req.case_id, req.query, req.top_k)
+        out = semantic_search(req.case_id, req.query, req.top_k, filters=req.filters, mode=req.mode)
         if not req.include_metadata:
             for r in out.get("results", []):
                 r.pop("metadata", None)
         return out
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
+
+SEARCH_BATCH_MAX_QUERIES = int(os.getenv("SEARCH_BATCH_MAX_QUERIES", "500"))
+SEARCH_BATCH_MAX_CASES = int(os.getenv("SEARCH_BATCH_MAX_CASES", "50"))
+
+
+class BatchSearchRequest(BaseModel):
+    case_ids: List[str]
+    queries: List[str]
+    top_k: int = 5
+    include_metadata: bool = True
+    filters: Optional[Dict[str, Any]] = None
+    mode: str = "vector"
+
+
+@app.post("/search/batch")
+def search_batch(req: BatchSearchRequest):
+    """Sweep many queries (e.g. a list of IOC phrases) over one or more cases in one call."""
+    if not req.case_ids or not req.queries:
+        return JSONResponse(status_code=400, content={"error": "case_ids and queries are required"})
+    if len(req.queries) > SEARCH_BATCH_MAX_QUERIES:
+        return JSONResponse(status_code=400, content={"error": f"At most {SEARCH_BATCH_MAX_QUERIES} queries per batch"})
+    if len(req.case_ids) > SEARCH_BATCH_MAX_CASES:
+        return JSONResponse(status_code=400, content={"error": f"At most {SEARCH_BATCH_MAX_CASES} case_ids per batch"})
+
+    try:
+        out = semantic_search_batch(req.case_ids, req.queries, req.top_k, filters=req.filters, mode=req.mode)
+        if not req.include_metadata:
+            for group in out.get("results", []):
+                for r in group.get("results", []):
+                    r.pop("metadata", None)
+        return out
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
+
+SEARCH_CASES_MAX = int(os.getenv("SEARCH_CASES_MAX", "500"))
+
+
+class CrossCaseSearchRequest(BaseModel):
+    query: str
+    # None = every case under ARTIFACT_DIR
+    case_ids: Optional[List[str]] = None
+    top_k: int = 5
+    include_metadata: bool = True
+    filters: Optional[Dict[str, Any]] = None
+    mode: str = "vector"
+    # Time budget; cases not done by then are listed in "timed_out"
+    budget_ms: Optional[int] = None
+
+
+def _all_case_ids() -> List[str]:
+    base = Path(ARTIFACT_DIR)
+    if not base.exists():
+        return []
+    return sorted(cid for cid in os.listdir(base) if (base / cid).is_dir())
+
+
+@app.post("/search/cases")
+def search_cases(req: CrossCaseSearchRequest):
+    """One query across cases, searched in parallel and merged; partial if the budget runs out."""
+    case_ids = req.case_ids if req.case_ids else _all_case_ids()
+    if len(case_ids) > SEARCH_CASES_MAX:
+        return JSONResponse(status_code=400, content={"error": f"At most {SEARCH_CASES_MAX} cases per search"})
+
+    try:
+        budget_s = req.budget_ms / 1000 if req.budget_ms is not None else None
+        out = semantic_search_cases(
+            case_ids, req.query, req.top_k, filters=req.filters, mode=req.mode, budget_s=budget_s
+        )
+        if not req.include_metadata:
+            for r in out.get("results", []):
+                r.pop("metadata", None)
+        return out
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": str(e)})
 
@@ -281,11 +438,12 @@ def get_case(case_id: str):
         "ingest": load_json(case_dir / "ingest.json"),
         "triage_findings": load_json(case_dir / "triage_findings.json"),
         "triage_topn": load_json(case_dir / "triage_topn.json"),
+        "index_stats": load_json(case_dir / "index_stats.json"),
         # UI-safe: return limited lines, plus quick sizes
         "registry_summaries": read_limited_lines(reg_path),
         "evtx_summaries": read_limited_lines(evtx_path),
-        "registry_summaries_bytes": reg_path.stat().st_size if reg_path.exists() else 0,
-        "evtx_summaries_bytes": evtx_path.stat().st_size if evtx_path.exists() else 0,
+        "registry_summaries_bytes": derivative_length(str(reg_path)) if derivative_exists(str(reg_path)) else 0,
+        "evtx_summaries_bytes": derivative_length(str(evtx_path)) if derivative_exists(str(evtx_path)) else 0,
         "playbook": read_text_file(case_dir, "playbook.md"),
     }
 
@@ -308,10 +466,23 @@ def download_artifact(case_id: str, filename: str):
     if not str(candidate).startswith(str(case_dir)):
         return JSONResponse(status_code=400, content={"error": "Invalid filename"})
 
-    if not candidate.exists():
-        return JSONResponse(status_code=404, content={"error": "File not found"})
+    if candidate.exists():
+        return FileResponse(str(candidate), filename=safe_name)
 
-    return FileResponse(str(candidate), filename=safe_name)
+    # derivatives stored compressed are served decompressed under their plain name
+    if Path(str(candidate) + ZSTD_SUFFIX).exists():
+        def chunks():
+            with open_derivative(str(candidate), "rb") as f:
+                while True:
+                    block = f.read(1 << 20)
+                    if not block:
+                        return
+                    yield block
+
+        headers = {"Content-Disposition": f'attachment; filename="{safe_name}"'}
+        return StreamingResponse(chunks(), media_type="application/octet-stream", headers=headers)
+
+    return JSONResponse(status_code=404, content={"error": "File not found"})
 
 
 # ------------------------------------------------------------------------------------
@@ -334,14 +505,28 @@ def reindex_case(case_id: str, background_tasks: BackgroundTasks):
 # ------------------------------------------------------------------------------------
 
 @app.get("/cases/{case_id}/timeline")
-def get_case_timeline(case_id: str, limit: int = 200, descending: bool = True):
+def get_case_timeline(
+    case_id: str,
+    limit: int = 200,
+    descending: bool = True,
+    source: Optional[str] = None,
+    event_id: Optional[int] = None,
+    computer: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+):
     case_dir = Path(ARTIFACT_DIR) / case_id
     if not case_dir.is_dir():
         return JSONResponse(status_code=404, content={"error": "Case not found"})
 
     try:
-        events = build_timeline(str(case_dir), limit=limit, descending=descending)  # requires updated timeline.py signature
+        events = build_timeline(
+            str(case_dir), limit=limit, descending=descending, source=source, event_id=event_id, computer=computer,
+            start=start, end=end,
+        )  # requires updated timeline.py signature
         return {"case_id": case_id, "events": events}
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
     except TypeError:
         # Backward compatibility if build_timeline(case_dir) signature is old
         events = build_timeline(str(case_dir))
@@ -350,6 +535,82 @@ def get_case_timeline(case_id: str, limit: int = 200, descending: bool = True):
         return JSONResponse(status_code=500, content={"error": str(e)})
 
 
+@app.get("/cases/{case_id}/timeline/histogram")
+def get_case_timeline_histogram(
+    case_id: str,
+    bucket: str = "hour",
+    group_by: Optional[str] = None,
+    source: Optional[str] = None,
+    event_id: Optional[int] = None,
+    computer: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+):
+    """
+    Event counts per minute/hour/day over the whole case, optionally split
+    by source, event_id, channel or computer. Served from rollups built at
+    ingest, so it stays interactive on cases with millions of events; 503
+    (with Retry-After) while a missing or stale store is rebuilt.
+    """
+    case_dir = Path(ARTIFACT_DIR) / case_id
+    if not case_dir.is_dir():
+        return JSONResponse(status_code=404, content={"error": "Case not found"})
+
+    try:
+        histogram = build_histogram(
+            str(case_dir), bucket=bucket, group_by=group_by, source=source, event_id=event_id, computer=computer,
+            start=start, end=end,
+        )
+        return {"case_id": case_id, **histogram}
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    except TimelineStoreBuilding as e:
+        return JSONResponse(
+            status_code=503, content={"error": str(e)}, headers={"Retry-After": str(TIMELINE_RETRY_AFTER_S)}
+        )
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
+
+# NDJSON lines sent per chunk of a streamed page
+TIMELINE_STREAM_CHUNK = 500
+
+
+@app.get("/cases/{case_id}/timeline/stream")
+def stream_case_timeline(case_id: str, cursor: Optional[str] = None, limit: int = 1000, descending: bool = True):
+    """
+    The whole timeline, one page at a time, as NDJSON (one event per line).
+    Pass the X-Next-Cursor response header back as cursor for the next page;
+    it is absent on the last page. Pages are keyset range scans of the
+    case's timeline store, so memory and time per page stay flat however
+    deep the client pages; 503 (with Retry-After) while a missing or stale
+    store is rebuilt.
+    """
+    case_dir = Path(ARTIFACT_DIR) / case_id
+    if not case_dir.is_dir():
+        return JSONResponse(status_code=404, content={"error": "Case not found"})
+
+    try:
+        events, next_cursor, total = page_timeline(str(case_dir), cursor, limit, descending)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    except TimelineStoreBuilding as e:
+        return JSONResponse(
+            status_code=503, content={"error": str(e)}, headers={"Retry-After": str(TIMELINE_RETRY_AFTER_S)}
+        )
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
+    def lines():
+        for i in range(0, len(events), TIMELINE_STREAM_CHUNK):
+            yield "".join(json.dumps(e, ensure_ascii=False) + "\n" for e in events[i:i + TIMELINE_STREAM_CHUNK])
+
+    headers = {"X-Timeline-Events": str(total)}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    return StreamingResponse(lines(), media_type="application/x-ndjson", headers=headers)
+
+
 # ------------------------------------------------------------------------------------
 # EXPLAIN CASE
 # ------------------------------------------------------------------------------------
@@ -370,10 +631,11 @@ def explain_case_openai(body: Dict[str, Any] = Body(...)):
     def read_text(name: str, limit_chars: Optional[int] = None) -> str:
         candidates = [case_path / name, case_path / "files" / name]
         for p in candidates:
-            if p.exists():
+            if derivative_exists(str(p)):
                 if limit_chars is None:
                     try:
-                        return p.read_text(encoding="utf-8", errors="ignore")
+                        with open_derivative(str(p), "r") as f:
+                            return f.read()
                     except Exception:
                         continue
                 return read_limited_text(p, max_chars=limit_chars)
@@ -527,6 +789,22 @@ INCIDENT SUMMARY:
     return {"case_id": case_id, "tags": tags}
 
 
+# ------------------------------------------------------------------------------------
+# METRICS
+# ------------------------------------------------------------------------------------
+
+@app.get("/metrics")
+def get_metrics():
+    return {
+        "startup": _STARTUP_TIMES,
+        "embedder": embedder_load_stats(),
+        "embedding_cache": embedding_cache_stats(),
+        "embed_pool": embed_pool_stats(),
+        "vector_store": vector_store_stats(),
+        "search_cache": search_cache_stats(),
+    }
+
+
 # ------------------------------------------------------------------------------------
 # OPENAI TEST
 # ------------------------------------------------------------------------------------
@@ -0,0 +1,191 @@
+# api/onnx_embedder.py
+import os
+import json
+import fcntl
+import shutil
+import tempfile
+from typing import Any, Dict, List
+
+import numpy as np
+
+# Where exported models live: <EMBED_ONNX_DIR>/<model name>/. Kept outside
+# ARTIFACT_DIR, whose top-level directories are listed as cases.
+EMBED_ONNX_DIR = os.getenv("EMBED_ONNX_DIR", "/data/models/onnx")
+# onnxruntime intra-op threads; 0 = onnxruntime default (all physical cores)
+EMBED_ONNX_THREADS = int(os.getenv("EMBED_ONNX_THREADS", "0"))
+EMBED_ONNX_BATCH_SIZE = int(os.getenv("EMBED_ONNX_BATCH_SIZE", "32"))
+
+ONNX_FP32_FILE = "model.onnx"
+ONNX_INT8_FILE = "model_int8.onnx"
+TOKENIZER_FILE = "tokenizer.json"
+CONFIG_FILE = "embed_config.json"
+
+# sentence-transformers' max_seq_length for all-MiniLM-L6-v2, if the export has no config
+DEFAULT_MAX_SEQ_LENGTH = 256
+
+
+def onnx_model_dir(model_name: str) -> str:
+    return os.path.join(EMBED_ONNX_DIR, model_name.replace("/", "__"))
+
+
+def export_onnx(model_name: str, out_dir: str) -> str:
+    """
+    One-off export of the sentence-transformers model to ONNX (fp32) plus its
+    tokenizer. Needs torch + sentence-transformers, which the api image has.
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    st = SentenceTransformer(model_name, device="cpu")
+    transformer = st[0].auto_model.eval()
+
+    os.makedirs(out_dir, exist_ok=True)
+    st.tokenizer.save_pretrained(out_dir)
+
+    sample = st.tokenizer(["warm up"], return_tensors="pt")
+    input_names = ["input_ids", "attention_mask", "token_type_ids"]
+    dynamic_axes = {name: {0: "batch", 1: "seq"} for name in input_names + ["last_hidden_state"]}
+
+    path = os.path.join(out_dir, ONNX_FP32_FILE)
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer,
+            tuple(sample[name] for name in input_names),
+            path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=14,
+        )
+
+    with open(os.path.join(out_dir, CONFIG_FILE), "w", encoding="utf-8") as f:
+        json.dump({"model": model_name, "max_seq_length": st.max_seq_length}, f)
+    return path
+
+
+def quantize_onnx(fp32_path: str, int8_path: str) -> str:
+    """int8 dynamic quantization of the weights; activations stay fp32."""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+    return int8_path
+
+
+class OnnxEmbedder:
+    """
+    SentenceTransformer-compatible encode() on ONNX Runtime (CPU): the same
+    tokenization, mean pooling over the attention mask and L2 normalization
+    as all-MiniLM-L6-v2's sentence-transformers pipeline.
+    """
+
+    def __init__(self, model_dir: str, quantized: bool = False, threads: int = EMBED_ONNX_THREADS):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        self.model_dir = model_dir
+        self.quantized = quantized
+
+        config: Dict[str, Any] = {}
+        config_path = os.path.join(model_dir, CONFIG_FILE)
+        if os.path.exists(config_path):
+            with open(config_path, "r", encoding="utf-8") as f:
+                config = json.load(f)
+        self.max_seq_length = int(config.get("max_seq_length") or DEFAULT_MAX_SEQ_LENGTH)
+
+        self._tokenizer = Tokenizer.from_file(os.path.join(model_dir, TOKENIZER_FILE))
+        self._tokenizer.enable_truncation(max_length=self.max_seq_length)
+        self._tokenizer.no_padding()
+
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads > 0:
+            opts.intra_op_num_threads = threads
+        path = os.path.join(model_dir, ONNX_INT8_FILE if quantized else ONNX_FP32_FILE)
+        self._session = ort.InferenceSession(path, opts, providers=["CPUExecutionProvider"])
+        self._input_names = {i.name for i in self._session.get_inputs()}
+        self._output_name = self._session.get_outputs()[0].name
+
+    def encode(
+        self, texts: List[str], batch_size: int = EMBED_ONNX_BATCH_SIZE, normalize_embeddings: bool = False, **_
+    ) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        # Longest first, like sentence-transformers, so batches pad little
+        order = sorted(range(len(texts)), key=lambda i: -len(texts[i]))
+        pooled: List[np.ndarray] = [None] * len(texts)
+
+        for start in range(0, len(order), batch_size):
+            idx = order[start : start + batch_size]
+            encs = self._tokenizer.encode_batch([str(texts[i]).strip() for i in idx])
+
+            width = max(len(e.ids) for e in encs)
+            ids = np.zeros((len(encs), width), dtype=np.int64)
+            mask = np.zeros((len(encs), width), dtype=np.int64)
+            types = np.zeros((len(encs), width), dtype=np.int64)
+            for row, enc in enumerate(encs):
+                n = len(enc.ids)
+                ids[row, :n] = enc.ids
+                mask[row, :n] = enc.attention_mask
+                types[row, :n] = enc.type_ids
+
+            feed = {"input_ids": ids, "attention_mask": mask, "token_type_ids": types}
+            feed = {k: v for k, v in feed.items() if k in self._input_names}
+            hidden = self._session.run([self._output_name], feed)[0]
+
+            weights = mask[:, :, None].astype(np.float32)
+            means = (hidden * weights).sum(axis=1) / np.clip(weights.sum(axis=1), 1e-9, None)
+            for row, i in enumerate(idx):
+                pooled[i] = means[row]
+
+        out = np.stack(pooled).astype(np.float32)
+        if normalize_embeddings:
+            norms = np.linalg.norm(out, axis=1, keepdims=True)
+            out = out / np.clip(norms, 1e-12, None)
+        return out
+
+
+def _prepare_model_dir(model_name: str, model_dir: str, quantized: bool) -> None:
+    """
+    Export (and quantize) the model if it isn't on disk yet. Every pool
+    worker calls this at once, so it runs under a lock file, and each file
+    is written in a temp dir next to model_dir and renamed into place
+    (model.onnx last: its presence means the export is complete).
+    """
+    fp32_path = os.path.join(model_dir, ONNX_FP32_FILE)
+    int8_path = os.path.join(model_dir, ONNX_INT8_FILE)
+    if os.path.exists(fp32_path) and (not quantized or os.path.exists(int8_path)):
+        return
+
+    parent = os.path.dirname(model_dir)
+    os.makedirs(parent, exist_ok=True)
+    with open(model_dir + ".lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            if not os.path.exists(fp32_path):
+                print(f"[EMBED] exporting {model_name} to ONNX in {model_dir}")
+                tmp = tempfile.mkdtemp(dir=parent, prefix=".export.")
+                try:
+                    export_onnx(model_name, tmp)
+                    os.makedirs(model_dir, exist_ok=True)
+                    names = sorted(os.listdir(tmp), key=lambda name: name == ONNX_FP32_FILE)
+                    for name in names:
+                        os.replace(os.path.join(tmp, name), os.path.join(model_dir, name))
+                finally:
+                    shutil.rmtree(tmp, ignore_errors=True)
+            if quantized and not os.path.exists(int8_path):
+                print(f"[EMBED] quantizing {fp32_path} to int8")
+                tmp = tempfile.mkdtemp(dir=parent, prefix=".quantize.")
+                try:
+                    os.replace(quantize_onnx(fp32_path, os.path.join(tmp, ONNX_INT8_FILE)), int8_path)
+                finally:
+                    shutil.rmtree(tmp, ignore_errors=True)
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def load_onnx_embedder(model_name: str, quantized: bool = False, threads: int = EMBED_ONNX_THREADS) -> OnnxEmbedder:
+    """Load the exported model, exporting/quantizing it first if it isn't on disk yet."""
+    model_dir = onnx_model_dir(model_name)
+    _prepare_model_dir(model_name, model_dir, quantized)
+    return OnnxEmbedder(model_dir, quantized=quantized, threads=threads)
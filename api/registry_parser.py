@@ -2,11 +2,16 @@
 
 import os
 import json
-from typing import Dict, Any, List, Optional
+from datetime import datetime
+from typing import Dict, Any, Iterator, List, Optional, Tuple
 
 from regipy.registry import RegistryHive
 from regipy.exceptions import RegistryKeyNotFoundException
 
+from api.columnar_store import ColumnarWriter
+from api.sorted_derivatives import SortedDerivativeWriter
+from api.timeline import TS_US_FIELD, datetime_to_us, timeline_sort_us
+
 
 # ---------------------------
 # CONFIG: high-value DFIR areas
@@ -97,6 +102,14 @@ def _extract_key_values(
         except Exception:
             continue
 
+    # Straight from regipy's datetime; a string only for display
+    last_write, ts_us = None, None
+    if isinstance(ts, datetime):
+        last_write, ts_us = ts.isoformat(), datetime_to_us(ts)
+    elif ts is not None:
+        last_write = str(ts)
+        ts_us = timeline_sort_us("registry", {"last_write": last_write})
+
     result: List[Dict[str, Any]] = []
     for val in getattr(key, "values", []):
         try:
@@ -114,7 +127,8 @@ def _extract_key_values(
                 "value_name": name,
                 "value": value,
                 "value_type": value_type,
-                "last_write": str(ts) if ts is not None else None,
+                "last_write": last_write,
+                TS_US_FIELD: ts_us,
             }
         )
     return result
@@ -332,13 +346,19 @@ def format_registry_event(evt: Dict[str, Any]) -> str:
     return f"[{ts}] HIVE={hive} Category={cat} Key={key} ValueName={name} Value={value}"
 
 
-def generate_registry_derivatives(hive_path: str, case_dir: str) -> Dict[str, Any]:
+def iter_registry_derivatives(
+    hive_path: str, case_dir: str, stats: Dict[str, Any]
+) -> Iterator[Tuple[Dict[str, Any], str]]:
     """
     Parse a registry hive or REG export and write:
       - artifacts/registry/<basename>.jsonl : structured events
       - artifacts/registry/<basename>.txt  : text summaries
+      - artifacts/registry/<basename>.range.json : time range of the sorted files
+      - artifacts/registry/<basename>.parquet : the events as typed columns
 
-    Returns basic stats.
+    yielding (event, text line) for each entry as it is written. stats is
+    filled in once the generator is exhausted; closing it early discards
+    the derivatives.
     """
     os.makedirs(case_dir, exist_ok=True)
 
@@ -356,16 +376,36 @@ def generate_registry_derivatives(hive_path: str, case_dir: str) -> Dict[str, An
         events = iter_registry_events(hive_path)
 
     count = 0
-    with open(jsonl_path, "w", encoding="utf-8") as jf, open(
-        txt_path, "w", encoding="utf-8"
-    ) as tf:
+    # All come out in last_write order (unknown last), with a <base>.range.json sidecar
+    writer = SortedDerivativeWriter(
+        jsonl_path, txt_path, key=lambda e: e[TS_US_FIELD], columnar=ColumnarWriter("registry", jsonl_path)
+    )
+    try:
         for evt in events:
             count += 1
-            jf.write(json.dumps(evt, ensure_ascii=False) + "\n")
-            tf.write(format_registry_event(evt) + "\n")
-
-    return {
+            # hive entries carry it already; REG exports have no last_write
+            evt.setdefault(TS_US_FIELD, timeline_sort_us("registry", evt))
+            text = format_registry_event(evt)
+            writer.write(evt, json.dumps(evt, ensure_ascii=False), text)
+            yield evt, text
+    except BaseException:
+        writer.abort()
+        raise
+    time_range = writer.finish()
+
+    stats.update({
         "events_count": count,
+        "reordered": time_range["reordered"],
         "jsonl_path": jsonl_path,
         "txt_path": txt_path,
-    }
+        "parquet_path": writer.columnar.path,
+        "txt_bytes": time_range["txt_bytes"],
+    })
+
+
+def generate_registry_derivatives(hive_path: str, case_dir: str) -> Dict[str, Any]:
+    """Write the derivatives of a hive (see iter_registry_derivatives). Returns basic stats."""
+    stats: Dict[str, Any] = {}
+    for _ in iter_registry_derivatives(hive_path, case_dir, stats):
+        pass
+    return stats
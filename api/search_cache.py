@@ -0,0 +1,87 @@
+# api/search_cache.py
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+# In-process LRU of query text -> normalized query vector
+SEARCH_QUERY_CACHE_SIZE = int(os.getenv("SEARCH_QUERY_CACHE_SIZE", "1024"))
+# In-process LRU of search results per (case, query, top_k, filters); 0 disables
+SEARCH_RESULT_CACHE_SIZE = int(os.getenv("SEARCH_RESULT_CACHE_SIZE", "512"))
+# Result entries also expire, in case the collection changes outside this process
+SEARCH_RESULT_CACHE_TTL = float(os.getenv("SEARCH_RESULT_CACHE_TTL", "300"))
+
+
+class LRUCache:
+    """Thread-safe LRU with optional per-entry TTL (seconds, 0 = none) and hit counters."""
+
+    def __init__(self, max_entries: int, ttl: float = 0.0):
+        self.max_entries = max(0, int(max_entries))
+        self.ttl = float(ttl or 0.0)
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and self.ttl and time.monotonic() - entry[1] > self.ttl:
+                del self._data[key]
+                entry = None
+            if entry is None:
+                self._misses += 1
+                return None
+            self._data.move_to_end(key)
+            self._hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if self.max_entries == 0:
+            return
+        with self._lock:
+            self._data[key] = (value, time.monotonic())
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._data),
+                "max_entries": self.max_entries,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": (self._hits / lookups) if lookups else 0.0,
+            }
+
+
+query_embedding_cache = LRUCache(SEARCH_QUERY_CACHE_SIZE)
+search_result_cache = LRUCache(SEARCH_RESULT_CACHE_SIZE, ttl=SEARCH_RESULT_CACHE_TTL)
+
+# Bumped whenever a case's collection changes; part of every result key, so
+# stale results are never served again and simply age out of the LRU
+_case_generations: Dict[str, int] = {}
+_generations_lock = threading.Lock()
+
+
+def case_generation(case_id: str) -> int:
+    return _case_generations.get(case_id, 0)
+
+
+def invalidate_case_results(case_id: str) -> None:
+    with _generations_lock:
+        _case_generations[case_id] = _case_generations.get(case_id, 0) + 1
+
+
+def search_cache_stats() -> Dict[str, Any]:
+    return {
+        "query_embeddings": query_embedding_cache.stats(),
+        "results": {**search_result_cache.stats(), "ttl_s": SEARCH_RESULT_CACHE_TTL},
+    }
@@ -0,0 +1,194 @@
+# api/search_filters.py
+import os
+import json
+import fnmatch
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from api.search_cache import LRUCache, case_generation
+from api.timeline import timestamp_to_epoch
+
+ARTIFACT_DIR = os.environ.get("ARTIFACT_DIR", "/data/artifacts")
+
+SOURCES = ("evtx", "registry", "file")
+FILTER_KEYS = ("source", "file", "event_id", "category", "start", "end", "contains")
+# Most files a file filter may expand to (each one a value of the `file $in` clause)
+FILE_FILTER_MAX_FILES = int(os.getenv("FILE_FILTER_MAX_FILES", "1000"))
+
+# Case file lists per (case, collection generation): the files chunks can
+# name only change with a reindex, which bumps the generation. The TTL covers
+# changes made by other processes.
+_case_files_cache = LRUCache(int(os.getenv("CASE_FILES_CACHE_SIZE", "64")), ttl=300)
+
+
+def _as_list(value: Any) -> List[Any]:
+    if value is None or value == "" or value == []:
+        return []
+    if isinstance(value, (list, tuple, set)):
+        return [v for v in value if v is not None and v != ""]
+    if isinstance(value, str) and "," in value:
+        return [v.strip() for v in value.split(",") if v.strip()]
+    return [value]
+
+
+def _in(field: str, values: List[Any]) -> Dict[str, Any]:
+    return {field: values[0]} if len(values) == 1 else {field: {"$in": values}}
+
+
+def _to_epoch(value: Any, name: str) -> float:
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    epoch = timestamp_to_epoch(str(value))
+    if epoch is None:
+        raise ValueError(f"filters.{name} must be an ISO timestamp or epoch seconds, got {value!r}")
+    return epoch
+
+
+def _case_files(case_id: str) -> List[str]:
+    """Paths as chunk metadata stores them: relative to the case dir, under files/ when present."""
+    key = (case_id, case_generation(case_id))
+    cached = _case_files_cache.get(key)
+    if cached is not None:
+        return cached
+    out = _walk_case_files(case_id)
+    _case_files_cache.put(key, out)
+    return out
+
+
+def _walk_case_files(case_id: str) -> List[str]:
+    case_dir = os.path.join(ARTIFACT_DIR, case_id)
+    scan_root = os.path.join(case_dir, "files")
+    if not os.path.isdir(scan_root):
+        scan_root = case_dir
+
+    out = []
+    for root, _, files in os.walk(scan_root):
+        for filename in files:
+            out.append(os.path.relpath(os.path.join(root, filename), case_dir))
+    return out
+
+
+def normalize_filters(filters: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Validated filters with empty values dropped; raises ValueError on bad input."""
+    out: Dict[str, Any] = {}
+    for key, value in (filters or {}).items():
+        if key not in FILTER_KEYS:
+            raise ValueError(f"Unknown filter {key!r}; expected one of {', '.join(FILTER_KEYS)}")
+        if value is None or value == "":
+            continue
+        if key in ("start", "end"):
+            out[key] = _to_epoch(value, key)
+            continue
+        if key == "contains":
+            out[key] = str(value)
+            continue
+        values = _as_list(value)
+        if not values:
+            continue
+        if key == "source":
+            bad = [v for v in values if v not in SOURCES]
+            if bad:
+                raise ValueError(f"filters.source must be in {', '.join(SOURCES)}, got {bad}")
+        if key == "event_id":
+            try:
+                values = [int(v) for v in values]
+            except (TypeError, ValueError):
+                raise ValueError(f"filters.event_id must be integers, got {values}")
+        out[key] = sorted(set(values), key=str)
+    return out
+
+
+def filters_cache_key(filters: Dict[str, Any]) -> str:
+    return json.dumps(filters, sort_keys=True, default=str)
+
+
+def build_where(
+    case_id: str, filters: Dict[str, Any]
+) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]], bool]:
+    """
+    Chroma where / where_document clauses for normalized filters.
+
+    Returns (where, where_document, matchable). Chroma has no glob operator,
+    so file globs are expanded against the case's files into a `file $in`
+    clause; matchable is False when a glob matches no file at all. Raises
+    ValueError when the globs match more than FILE_FILTER_MAX_FILES files.
+    """
+    clauses: List[Dict[str, Any]] = []
+
+    if filters.get("source"):
+        clauses.append(_in("source", filters["source"]))
+
+    if filters.get("file"):
+        patterns = filters["file"]
+        files = sorted(
+            f for f in _case_files(case_id)
+            if any(fnmatch.fnmatch(f, p) or fnmatch.fnmatch(os.path.basename(f), p) for p in patterns)
+        )
+        if not files:
+            return None, None, False
+        if len(files) > FILE_FILTER_MAX_FILES:
+            raise ValueError(
+                f"filters.file matches {len(files)} files (at most {FILE_FILTER_MAX_FILES}); use a narrower pattern"
+            )
+        clauses.append(_in("file", files))
+
+    if filters.get("event_id"):
+        clauses.append(_in("event_id", filters["event_id"]))
+
+    if filters.get("category"):
+        clauses.append(_in("category", filters["category"]))
+
+    if "start" in filters:
+        clauses.append({"ts_epoch": {"$gte": filters["start"]}})
+    if "end" in filters:
+        clauses.append({"ts_epoch": {"$lte": filters["end"]}})
+
+    where: Optional[Dict[str, Any]] = None
+    if len(clauses) == 1:
+        where = clauses[0]
+    elif clauses:
+        where = {"$and": clauses}
+
+    where_document = {"$contains": filters["contains"]} if filters.get("contains") else None
+    return where, where_document, True
+
+
+def _match_clause(meta: Dict[str, Any], clause: Dict[str, Any]) -> bool:
+    for field, cond in clause.items():
+        if field == "$and":
+            if not all(_match_clause(meta, c) for c in cond):
+                return False
+            continue
+        value = meta.get(field)
+        if not isinstance(cond, dict):
+            cond = {"$eq": cond}
+        for op, arg in cond.items():
+            if op == "$eq" and value != arg:
+                return False
+            if op == "$in" and value not in arg:
+                return False
+            if op in ("$gte", "$lte") and not isinstance(value, (int, float)):
+                return False
+            if op == "$gte" and value < arg:
+                return False
+            if op == "$lte" and value > arg:
+                return False
+    return True
+
+
+def where_matcher(
+    where: Optional[Dict[str, Any]], where_document: Optional[Dict[str, Any]]
+) -> Optional[Callable[[str, Dict[str, Any]], bool]]:
+    """
+    The clauses build_where produces, evaluated in Python for results that
+    don't come from Chroma (the lexical index). None if there is nothing to check.
+    """
+    if not where and not where_document:
+        return None
+    needle = (where_document or {}).get("$contains")
+
+    def accept(text: str, meta: Dict[str, Any]) -> bool:
+        if needle and needle not in (text or ""):
+            return False
+        return _match_clause(meta or {}, where) if where else True
+
+    return accept
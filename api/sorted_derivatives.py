@@ -0,0 +1,183 @@
+# api/sorted_derivatives.py
+import os
+import json
+import mmap
+import struct
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+
+from api.derivative_io import DerivativeWriter, logical_path, stored_path
+
+# <base>.range.json next to <base>.jsonl: the file's time range, see SortedDerivativeWriter
+RANGE_SUFFIX = ".range.json"
+
+_UNDATED = np.iinfo(np.int64).max
+
+# Per line, spilled to <base>.jsonl.keys.tmp: sort key and the line's offsets in both temp files
+_KEY_RECORD = struct.Struct("<qQQ")
+_KEY_DTYPE = np.dtype([("ts_us", "<i8"), ("jsonl", "<u8"), ("txt", "<u8")])
+
+
+def range_path(jsonl_path: str) -> str:
+    return os.path.splitext(logical_path(jsonl_path))[0] + RANGE_SUFFIX
+
+
+def read_range(jsonl_path: str) -> Optional[Dict[str, Any]]:
+    """The sidecar of a sorted derivative, or None if missing or written for another version of the file."""
+    try:
+        with open(range_path(jsonl_path), "r", encoding="utf-8") as f:
+            info = json.load(f)
+        st = os.stat(stored_path(jsonl_path))
+    except (OSError, ValueError):
+        return None
+    if info.get("size") != st.st_size or info.get("mtime_ns") != st.st_mtime_ns:
+        return None
+    return info
+
+
+class SortedDerivativeWriter:
+    """
+    Writes a derivative pair (<base>.jsonl + <base>.txt) with lines in time
+    order: dated events ascending (ties in arrival order), then undated ones
+    in arrival order. Lines go to temp files as they come; on finish() they
+    are reordered only if they didn't arrive in order (EVTX nearly always
+    does), and the sidecar records the time range. Only the time range is
+    kept in memory; the per-line sort keys are spilled to a temp file, read
+    back (memory-mapped) only to reorder, which then costs an argsort of the
+    keys (8 bytes per event). The sidecar:
+
+        {"events", "dated", "dated_end" (byte offset where undated lines
+         start), "min_ts_us", "max_ts_us", "jsonl_bytes"/"txt_bytes"
+         (uncompressed), "size", "mtime_ns" (of the file as stored),
+         "columnar" (size/mtime_ns of the .parquet, or None)}
+
+    The pair is stored zstd-compressed unless compress is False (see
+    api/derivative_io.py); offsets are always those of the plain lines.
+
+    With a ColumnarWriter (api/columnar_store.py) the events also go to
+    <base>.parquet, in the same order.
+    """
+
+    def __init__(
+        self,
+        jsonl_path: str,
+        txt_path: str,
+        key: Callable[[Dict[str, Any]], Optional[int]],
+        columnar: Optional[Any] = None,
+        compress: Optional[bool] = None,
+    ):
+        self.jsonl_path = jsonl_path
+        self.txt_path = txt_path
+        self.compress = compress
+        self.key = key
+        self.columnar = columnar
+        self._jf = open(jsonl_path + ".tmp", "wb")
+        self._tf = open(txt_path + ".tmp", "wb")
+        self._keys_path = jsonl_path + ".keys.tmp"
+        self._kf = open(self._keys_path, "wb")
+        self._j_pos = 0
+        self._t_pos = 0
+        self._in_order = True
+        self._last = -_UNDATED
+        # the time range does not depend on the order, so it is counted as lines come
+        self._events = 0
+        self._dated = 0
+        self._dated_bytes = 0
+        self._min = _UNDATED
+        self._max = -_UNDATED
+
+    def write(self, event: Dict[str, Any], jsonl_line: str, txt_line: str) -> None:
+        ts_us = self.key(event)
+        ts_us = _UNDATED if ts_us is None else ts_us
+        if ts_us < self._last:
+            self._in_order = False
+        self._last = ts_us
+        self._kf.write(_KEY_RECORD.pack(ts_us, self._j_pos, self._t_pos))
+
+        if self.columnar is not None:
+            self.columnar.write(event, self._j_pos)
+        data = (jsonl_line + "\n").encode("utf-8", "surrogatepass")
+        self._jf.write(data)
+        jsonl_bytes = len(data)
+        self._j_pos += jsonl_bytes
+        data = (txt_line + "\n").encode("utf-8", "surrogatepass")
+        self._tf.write(data)
+        self._t_pos += len(data)
+
+        self._events += 1
+        if ts_us != _UNDATED:
+            self._dated += 1
+            self._dated_bytes += jsonl_bytes
+            self._min = min(self._min, ts_us)
+            self._max = max(self._max, ts_us)
+
+    def _reorder(self, tmp: str, starts: np.ndarray, end: int, order: np.ndarray, out: DerivativeWriter) -> None:
+        n = len(starts)
+        with open(tmp, "rb") as src:
+            if end:
+                mm = mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ)
+                try:
+                    for i in order:
+                        out.write(mm[starts[i] : (starts[i + 1] if i + 1 < n else end)])
+                finally:
+                    mm.close()
+        out.close()
+        os.remove(tmp)
+
+    def finish(self) -> Dict[str, Any]:
+        self._jf.close()
+        self._tf.close()
+        self._kf.close()
+
+        try:
+            if self._in_order:
+                for path in (self.jsonl_path, self.txt_path):
+                    DerivativeWriter(path, self.compress).take(path + ".tmp")
+                if self.columnar is not None:
+                    self.columnar.finish()
+            else:
+                records = np.memmap(self._keys_path, dtype=_KEY_DTYPE, mode="r")
+                order = np.argsort(records["ts_us"], kind="stable")
+                for path, field, end in ((self.jsonl_path, "jsonl", self._j_pos), (self.txt_path, "txt", self._t_pos)):
+                    self._reorder(path + ".tmp", records[field], end, order, DerivativeWriter(path, self.compress))
+                if self.columnar is not None:
+                    # line offsets in the reordered .jsonl
+                    lengths = np.diff(records["jsonl"], append=np.uint64(self._j_pos))[order]
+                    self.columnar.finish(order, np.cumsum(lengths) - lengths)
+                del records
+        finally:
+            os.remove(self._keys_path)
+
+        columnar = None
+        if self.columnar is not None:
+            cst = os.stat(self.columnar.path)
+            columnar = {"size": cst.st_size, "mtime_ns": cst.st_mtime_ns}
+
+        st = os.stat(stored_path(self.jsonl_path))
+        info = {
+            "events": self._events,
+            "dated": self._dated,
+            "dated_end": self._dated_bytes,
+            "min_ts_us": self._min if self._dated else None,
+            "max_ts_us": self._max if self._dated else None,
+            "reordered": not self._in_order,
+            "jsonl_bytes": self._j_pos,
+            "txt_bytes": self._t_pos,
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "columnar": columnar,
+        }
+        with open(range_path(self.jsonl_path), "w", encoding="utf-8") as f:
+            json.dump(info, f)
+        return info
+
+    def abort(self) -> None:
+        if self.columnar is not None:
+            self.columnar.abort()
+        for f, path in ((self._jf, self.jsonl_path + ".tmp"), (self._tf, self.txt_path + ".tmp"), (self._kf, self._keys_path)):
+            try:
+                f.close()
+                os.remove(path)
+            except OSError:
+                pass
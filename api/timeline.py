@@ -1,8 +1,17 @@
 # api/timeline.py
 import os
+import re
 import json
-from datetime import datetime, MAXYEAR
-from typing import Any, Dict, List, Optional
+import heapq
+import itertools
+from datetime import datetime, timedelta, MAXYEAR
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from api.derivative_io import logical_path, open_derivative, stored_path
+from api.columnar_store import TIMELINE_COLUMNS, iter_columnar_records, open_columnar
+from api.sorted_derivatives import read_range
 
 
 def _parse_timestamp(ts: Optional[str]) -> Optional[datetime]:
@@ -24,159 +33,572 @@ def _parse_timestamp(ts: Optional[str]) -> Optional[datetime]:
         return None
 
 
-def _load_evtx_events(case_dir: str) -> List[Dict[str, Any]]:
-    evtx_dir = os.path.join(case_dir, "artifacts", "evtx")
-    if not os.path.isdir(evtx_dir):
-        return []
+_EPOCH = datetime(1970, 1, 1)
+_ONE_US = timedelta(microseconds=1)
+
+# Epoch microseconds of a record's timeline time, written next to its ISO
+# string in every derivative line (null when it has none)
+TS_US_FIELD = "ts_us"
+
+# Where UNKNOWN_TIME entries sort
+_UNKNOWN_US = (datetime(MAXYEAR, 12, 31) - _EPOCH) // _ONE_US
+
+# ISO timestamps NumPy parses like _parse_timestamp (a trailing offset is dropped, not applied)
+_ISO_BODY = re.compile(r"(\d{4}-\d\d-\d\d(?:[T ]\d\d:\d\d(?::\d\d(?:\.\d+)?)?)?)(?:Z|[+-]\d\d:?\d\d)?")
+
+
+def datetime_to_us(dt: datetime) -> int:
+    """Epoch microseconds of dt; an aware dt keeps its wall-clock time, like _parse_timestamp."""
+    return (dt.replace(tzinfo=None) - _EPOCH) // _ONE_US
+
+
+def _timestamp_to_us(ts: Optional[str]) -> Optional[int]:
+    dt = _parse_timestamp(ts)
+    return None if dt is None else datetime_to_us(dt)
+
+
+def parse_timestamps_us(values: List[Any]) -> List[Optional[int]]:
+    """
+    Epoch microseconds for a batch of ISO timestamps (None where missing or
+    invalid), as _parse_timestamp would give them, but converted with one
+    NumPy datetime64 call instead of one datetime per value.
+    """
+    out: List[Optional[int]] = [None] * len(values)
+    rows, bodies = [], []
+    for i, value in enumerate(values):
+        if not isinstance(value, str):
+            continue
+        m = _ISO_BODY.fullmatch(value.strip())
+        if m is None:
+            out[i] = _timestamp_to_us(value)  # a form NumPy doesn't take
+            continue
+        rows.append(i)
+        bodies.append(m.group(1))
+    if bodies:
+        try:
+            parsed = np.array(bodies, dtype="datetime64[us]").astype(np.int64).tolist()
+        except ValueError:
+            # an out-of-range field somewhere in the batch
+            parsed = [_timestamp_to_us(b) for b in bodies]
+        for i, us in zip(rows, parsed):
+            out[i] = us
+    return out
+
+
+def timestamp_to_epoch(ts: Optional[str]) -> Optional[float]:
+    """
+    Seconds since the Unix epoch for an ISO timestamp, or None. Naive values
+    are taken as UTC (EVTX SystemTime is), like the timeline's ordering.
+    """
+    dt = _parse_timestamp(ts) if isinstance(ts, str) else None
+    if dt is None:
+        return None
+    try:
+        return (dt - _EPOCH).total_seconds()
+    except Exception:
+        return None
+
+
+# Derivative JSONL files the timeline is built from, per source
+TIMELINE_SOURCES = (("evtx", os.path.join("artifacts", "evtx")), ("registry", os.path.join("artifacts", "registry")))
 
-    out: List[Dict[str, Any]] = []
 
-    for filename in os.listdir(evtx_dir):
-        if not filename.lower().endswith(".jsonl"):
+def timeline_files(case_dir: str) -> List[Tuple[str, str]]:
+    """
+    (source, path) of every derivative .jsonl feeding the timeline, as
+    stored (plain or .jsonl.zst), in name order: equal times are listed in
+    this order by every timeline path.
+    """
+    out: List[Tuple[str, str]] = []
+    for source, rel_dir in TIMELINE_SOURCES:
+        src_dir = os.path.join(case_dir, rel_dir)
+        if not os.path.isdir(src_dir):
             continue
+        names = {logical_path(f) for f in os.listdir(src_dir)}
+        for filename in sorted(names):
+            if filename.lower().endswith(".jsonl"):
+                out.append((source, stored_path(os.path.join(src_dir, filename))))
+    return out
 
-        path = os.path.join(evtx_dir, filename)
+
+def derivative_stamps(case_dir: str) -> List[List[Any]]:
+    """
+    [source, relpath, size, mtime_ns] per timeline derivative (as stored),
+    in timeline_files order; indexes built from the derivatives store it to
+    detect staleness.
+    """
+    out = []
+    for source, path in timeline_files(case_dir):
         try:
-            with open(path, "r", encoding="utf-8", errors="ignore") as f:
-                for line in f:
-                    line = line.strip()
-                    if not line:
-                        continue
-                    try:
-                        evt = json.loads(line)
-                    except Exception:
-                        continue
-
-                    ts_obj = _parse_timestamp(evt.get("timestamp"))
-                    if ts_obj is None:
-                        continue
-
-                    eid = evt.get("event_id")
-                    channel = evt.get("channel") or ""
-                    computer = evt.get("computer") or ""
-                    data = evt.get("data") or {}
-
-                    pieces = []
-                    for key in (
-                        "SubjectUserName",
-                        "SubjectDomainName",
-                        "TargetUserName",
-                        "IpAddress",
-                        "ProcessName",
-                        "CommandLine",
-                        "ServiceName",
-                        "LogonType",
-                    ):
-                        v = data.get(key)
-                        if v:
-                            pieces.append(f"{key}={v}")
-
-                    if not pieces:
-                        for k, v in list(data.items())[:6]:
-                            if v:
-                                pieces.append(f"{k}={v}")
-
-                    desc = " ".join(pieces)[:400]
-
-                    out.append(
-                        {
-                            "timestamp": ts_obj.isoformat(),
-                            "sort_ts": ts_obj,
-                            "unknown_time": False,
-                            "source": "evtx",
-                            "channel": channel,
-                            "computer": computer,
-                            "event_id": eid,
-                            "description": desc,
-                        }
-                    )
-        except Exception:
+            st = os.stat(path)
+        except OSError:
             continue
+        out.append([source, os.path.relpath(path, case_dir), st.st_size, st.st_mtime_ns])
+    return sorted(out, key=lambda f: logical_path(f[1]))
 
-    return out
 
+def _evtx_timeline_event(evt: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    ts_us = timeline_sort_us("evtx", evt)
+    if ts_us is None:
+        return None
 
-def _load_registry_events(case_dir: str) -> List[Dict[str, Any]]:
-    reg_dir = os.path.join(case_dir, "artifacts", "registry")
-    if not os.path.isdir(reg_dir):
-        return []
+    eid = evt.get("event_id")
+    channel = evt.get("channel") or ""
+    computer = evt.get("computer") or ""
+    data = evt.get("data") or {}
+
+    pieces = []
+    for key in (
+        "SubjectUserName",
+        "SubjectDomainName",
+        "TargetUserName",
+        "IpAddress",
+        "ProcessName",
+        "CommandLine",
+        "ServiceName",
+        "LogonType",
+    ):
+        v = data.get(key)
+        if v:
+            pieces.append(f"{key}={v}")
+
+    if not pieces:
+        for k, v in list(data.items())[:6]:
+            if v:
+                pieces.append(f"{k}={v}")
+
+    desc = " ".join(pieces)[:400]
+
+    return {
+        "timestamp": (_EPOCH + timedelta(microseconds=ts_us)).isoformat(),
+        "sort_ts": ts_us,
+        "unknown_time": False,
+        "source": "evtx",
+        "channel": channel,
+        "computer": computer,
+        "event_id": eid,
+        "description": desc,
+    }
+
+
+def _registry_timeline_event(evt: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    hive = evt.get("hive") or "UNKNOWN_HIVE"
+    category = evt.get("category") or "registry"
+    key_path = evt.get("key_path") or ""
+    value_name = evt.get("value_name") or ""
+    value = evt.get("value", "")
+
+    ts_us = timeline_sort_us("registry", evt)
+    unknown = False
+    if ts_us is None:
+        unknown = True
+        ts_us = _UNKNOWN_US
+        ts_str = "UNKNOWN_TIME"
+    else:
+        ts_str = (_EPOCH + timedelta(microseconds=ts_us)).isoformat()
+
+    desc = (
+        f"category={category} HIVE={hive} Key={key_path} "
+        f"Name={value_name} Value={value}"
+    )[:400]
+
+    return {
+        "timestamp": ts_str,
+        "sort_ts": ts_us,
+        "unknown_time": unknown,
+        "source": "registry",
+        "channel": "",
+        "computer": "",
+        "event_id": None,
+        "description": desc,
+    }
+
+
+def timeline_event(source: str, evt: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Timeline entry for one derivative record, with the internal sort_ts /
+    unknown_time fields; None if the record has no place on the timeline.
+    """
+    if source == "evtx":
+        return _evtx_timeline_event(evt)
+    return _registry_timeline_event(evt)
 
-    out: List[Dict[str, Any]] = []
 
-    for filename in os.listdir(reg_dir):
-        if not filename.lower().endswith(".jsonl"):
-            continue
+def _time_string(source: str, evt: Dict[str, Any]) -> Optional[str]:
+    ts = evt.get("timestamp") if source == "evtx" else evt.get("last_write")
+    return ts if isinstance(ts, str) else None
+
 
-        path = os.path.join(reg_dir, filename)
+def timeline_sort_us(source: str, evt: Dict[str, Any]) -> Optional[int]:
+    """
+    Epoch microseconds a record sorts at on the timeline; None if it has no
+    time (dropped for EVTX, UNKNOWN_TIME for registry). Read from the
+    record's ts_us when it has one, parsed from its ISO string otherwise.
+    """
+    if TS_US_FIELD in evt:
+        ts_us = evt[TS_US_FIELD]
+        return ts_us if isinstance(ts_us, int) else None
+    return _timestamp_to_us(_time_string(source, evt))
+
+
+# Lines per parse_timestamps_us batch when reading derivatives without ts_us
+_PARSE_BATCH = 4096
+
+
+def _with_ts_us(source: str, batch: List[Tuple[int, Dict[str, Any]]]) -> List[Tuple[int, Dict[str, Any]]]:
+    missing = [evt for _, evt in batch if TS_US_FIELD not in evt]
+    if missing:
+        for evt, ts_us in zip(missing, parse_timestamps_us([_time_string(source, e) for e in missing])):
+            evt[TS_US_FIELD] = ts_us
+    return batch
+
+
+def iter_derivative(source: str, path: str) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """
+    (byte offset, record) for every line of one derivative, each record with
+    its ts_us set. Read from the derivative's columnar copy when it has a
+    current one (records then hold only the fields the timeline uses);
+    otherwise from the .jsonl, where derivatives written before lines
+    carried ts_us get their times parsed a batch at a time.
+    """
+    pf = open_columnar(path)
+    if pf is not None:
+        for evt in iter_columnar_records(pf, TIMELINE_COLUMNS[source]):
+            yield evt.pop("offset"), evt
+        return
+
+    batch: List[Tuple[int, Dict[str, Any]]] = []
+    with open_derivative(path, "rb") as f:
+        offset = 0
+        for raw in f:
+            line_offset, offset = offset, offset + len(raw)
+            line = raw.decode("utf-8", "ignore").strip()
+            if not line:
+                continue
+            try:
+                evt = json.loads(line)
+            except Exception:
+                continue
+            if not isinstance(evt, dict):
+                continue
+            batch.append((line_offset, evt))
+            if len(batch) >= _PARSE_BATCH:
+                yield from _with_ts_us(source, batch)
+                batch = []
+    yield from _with_ts_us(source, batch)
+
+
+def _iter_records(case_dir: str) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """(source, record) for every derivative line, EVTX files first, in file order."""
+    for source, path in timeline_files(case_dir):
         try:
-            with open(path, "r", encoding="utf-8", errors="ignore") as f:
-                for line in f:
-                    line = line.strip()
-                    if not line:
-                        continue
-                    try:
-                        evt = json.loads(line)
-                    except Exception:
-                        continue
-
-                    hive = evt.get("hive") or "UNKNOWN_HIVE"
-                    category = evt.get("category") or "registry"
-                    key_path = evt.get("key_path") or ""
-                    value_name = evt.get("value_name") or ""
-                    value = evt.get("value", "")
-
-                    ts_obj = _parse_timestamp(evt.get("last_write")) if isinstance(evt.get("last_write"), str) else None
-                    unknown = False
-                    if ts_obj is None:
-                        unknown = True
-                        ts_obj = datetime(MAXYEAR, 12, 31)
-                        ts_str = "UNKNOWN_TIME"
-                    else:
-                        ts_str = ts_obj.isoformat()
-
-                    desc = (
-                        f"category={category} HIVE={hive} Key={key_path} "
-                        f"Name={value_name} Value={value}"
-                    )[:400]
-
-                    out.append(
-                        {
-                            "timestamp": ts_str,
-                            "sort_ts": ts_obj,
-                            "unknown_time": unknown,
-                            "source": "registry",
-                            "channel": "",
-                            "computer": "",
-                            "event_id": None,
-                            "description": desc,
-                        }
-                    )
+            for _, evt in iter_derivative(source, path):
+                yield source, evt
         except Exception:
             continue
 
-    return out
+
+def _record_filter(
+    source: Optional[str], event_id: Optional[int], computer: Optional[str]
+) -> Callable[[str, Dict[str, Any]], bool]:
+    def accept(src: str, evt: Dict[str, Any]) -> bool:
+        if source and src != source:
+            return False
+        if event_id is not None and (src != "evtx" or evt.get("event_id") != event_id):
+            return False
+        if computer and (src != "evtx" or (evt.get("computer") or "") != computer):
+            return False
+        return True
+
+    return accept
+
+
+def _window_us(value: Any, name: str) -> Optional[int]:
+    """start/end as epoch microseconds: ISO timestamps or epoch seconds."""
+    if value is None or value == "":
+        return None
+    try:
+        return int(round(float(value) * 1_000_000))
+    except (TypeError, ValueError):
+        pass
+    epoch = timestamp_to_epoch(str(value))
+    if epoch is None:
+        raise ValueError(f"{name} must be an ISO timestamp or epoch seconds, got {value!r}")
+    return int(round(epoch * 1_000_000))
+
+
+def _finish(selected: Iterable[Tuple[str, Dict[str, Any]]], limit: int) -> List[Dict[str, Any]]:
+    merged = []
+    for src, evt in selected:
+        e = timeline_event(src, evt)
+        if e is None:
+            continue
+        e.pop("sort_ts", None)
+        e.pop("unknown_time", None)
+        merged.append(e)
+        if len(merged) >= limit:
+            break
+    return merged
 
 
-def build_timeline(case_dir: str, limit: int = 200, descending: bool = True) -> List[Dict[str, Any]]:
-    events: List[Dict[str, Any]] = []
-    events.extend(_load_evtx_events(case_dir))
-    events.extend(_load_registry_events(case_dir))
+def _scan_timeline(
+    case_dir: str,
+    limit: int,
+    descending: bool,
+    accept: Callable[[str, Dict[str, Any]], bool],
+    start_us: Optional[int] = None,
+    end_us: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    The timeline straight from the derivatives, in one pass: dated records
+    go through a bounded heap (O(n log limit)), the first UNKNOWN_TIME ones
+    are kept aside, and only the selected records are formatted.
+    """
+    windowed = start_us is not None or end_us is not None
+    unknown: List[Tuple[str, Dict[str, Any]]] = []
+
+    def dated() -> Iterator[Tuple[int, str, Dict[str, Any]]]:
+        for src, evt in _iter_records(case_dir):
+            if not accept(src, evt):
+                continue
+            ts_us = timeline_sort_us(src, evt)
+            if ts_us is None:
+                # UNKNOWN_TIME: always at the bottom (even when descending), in file
+                # order; it has no place in a time window. Undated EVTX is dropped.
+                if src != "evtx" and len(unknown) < limit and not windowed:
+                    unknown.append((src, evt))
+                continue
+            if (start_us is not None and ts_us < start_us) or (end_us is not None and ts_us > end_us):
+                continue
+            yield ts_us, src, evt
+
+    # Both are stable, i.e. equal to sorted(..., reverse=descending)[:limit]
+    select = heapq.nlargest if descending else heapq.nsmallest
+    top = select(limit, dated(), key=lambda item: item[0])
+    return _finish([(src, evt) for _, src, evt in top] + unknown, limit)
+
+
+# -------------------------
+# Sorted derivatives (api/sorted_derivatives.py)
+# -------------------------
+def _sorted_runs(case_dir: str) -> Optional[List[Tuple[str, str, Dict[str, Any]]]]:
+    """(source, path, range) per derivative if every one is sorted with a current sidecar, else None."""
+    runs = []
+    for source, path in timeline_files(case_dir):
+        info = read_range(path)
+        if info is None:
+            return None
+        runs.append((source, path, info))
+    return runs
+
+
+def _line_us(source: str, line: bytes) -> Optional[int]:
+    try:
+        return timeline_sort_us(source, json.loads(line))
+    except Exception:
+        return None
 
-    # Keep UNKNOWN_TIME entries always at the bottom (even when descending)
-    known = [e for e in events if not e.get("unknown_time")]
-    unknown = [e for e in events if e.get("unknown_time")]
 
-    known.sort(key=lambda e: e["sort_ts"], reverse=descending)
-    # unknown already has MAXYEAR sort_ts; keep it last
-    unknown.sort(key=lambda e: e["sort_ts"])
+def _first_line_at(f, source: str, lo: int, hi: int, pred: Callable[[int], bool]) -> int:
+    """
+    Byte offset of the first line in [lo, hi) whose time satisfies pred (hi
+    if none). Lines in that span are sorted, so pred flips at most once.
+    """
+    found = hi
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if mid > 0:
+            f.seek(mid - 1)
+            f.readline()  # first line starting at or after mid
+        else:
+            f.seek(0)
+        pos = f.tell()
+        if pos >= hi:
+            hi = mid
+            continue
+        line = f.readline()
+        ts_us = _line_us(source, line)
+        if ts_us is not None and pred(ts_us):
+            found, hi = pos, mid
+        else:
+            lo = pos + len(line)
+    return found
+
+
+def _lines_forward(f, start: int, stop: Optional[int] = None) -> Iterator[bytes]:
+    """Lines from byte start up to byte stop (a line start), or to the end of the file."""
+    f.seek(start)
+    pos = start
+    while stop is None or pos < stop:
+        line = f.readline()
+        if not line:
+            return
+        pos += len(line)
+        yield line
+
+
+def _lines_backward(f, stop: int, block: int = 1 << 16) -> Iterator[bytes]:
+    """Lines ending at or before byte stop (a line start), last first."""
+    pos, tail = stop, b""
+    while pos > 0:
+        size = min(block, pos)
+        pos -= size
+        f.seek(pos)
+        parts = (f.read(size) + tail).split(b"\n")
+        tail = parts[0]
+        for line in reversed(parts[1:]):
+            if line:
+                yield line
+    if tail:
+        yield tail
+
+
+def _dated_run(
+    source: str,
+    path: str,
+    info: Dict[str, Any],
+    descending: bool,
+    accept: Callable[[str, Dict[str, Any]], bool],
+    start_us: Optional[int],
+    end_us: Optional[int],
+) -> Iterator[Tuple[int, str, Dict[str, Any]]]:
+    """One file's dated records in timeline order, read lazily from the window edge."""
+    with open_derivative(path, "rb") as f:
+        dated_end = info["dated_end"]
+        if not descending:
+            lo = 0 if start_us is None else _first_line_at(f, source, 0, dated_end, lambda t: t >= start_us)
+            for line in _lines_forward(f, lo, dated_end):
+                evt = json.loads(line)
+                ts_us = timeline_sort_us(source, evt)
+                if end_us is not None and ts_us > end_us:
+                    return
+                if accept(source, evt):
+                    yield ts_us, source, evt
+            return
+
+        hi = dated_end if end_us is None else _first_line_at(f, source, 0, dated_end, lambda t: t > end_us)
+        # Equal times are yielded in file order, as a stable sort would
+        group: List[Tuple[int, str, Dict[str, Any]]] = []
+        for line in _lines_backward(f, hi):
+            evt = json.loads(line)
+            ts_us = timeline_sort_us(source, evt)
+            if group and ts_us != group[0][0]:
+                yield from reversed(group)
+                group = []
+            if start_us is not None and ts_us < start_us:
+                return
+            if accept(source, evt):
+                group.append((ts_us, source, evt))
+        yield from reversed(group)
+
+
+def _undated_run(source: str, path: str, info: Dict[str, Any], accept) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    with open_derivative(path, "rb") as f:
+        for line in _lines_forward(f, info["dated_end"]):
+            try:
+                evt = json.loads(line)
+            except Exception:
+                continue
+            if accept(source, evt):
+                yield source, evt
+
+
+def _merge_timeline(
+    runs: List[Tuple[str, str, Dict[str, Any]]],
+    limit: int,
+    descending: bool,
+    accept: Callable[[str, Dict[str, Any]], bool],
+    start_us: Optional[int] = None,
+    end_us: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Lazy k-way merge of the sorted files: only as many lines are read as the
+    page needs, and files whose range misses the window are never opened.
+    """
+    dated = [
+        _dated_run(source, path, info, descending, accept, start_us, end_us)
+        for source, path, info in runs
+        if info["dated"]
+        and (start_us is None or info["max_ts_us"] >= start_us)
+        and (end_us is None or info["min_ts_us"] <= end_us)
+    ]
+    # heapq.merge breaks ties by file order, like the stable sort it replaces
+    merged = heapq.merge(*dated, key=lambda item: item[0], reverse=descending)
+    selected = itertools.chain(
+        ((src, evt) for _, src, evt in merged),
+        # UNKNOWN_TIME entries (registry) after the dated ones; none in a window
+        () if start_us is not None or end_us is not None else itertools.chain.from_iterable(
+            _undated_run(source, path, info, accept) for source, path, info in runs if info["events"] > info["dated"]
+        ),
+    )
+    return _finish(selected, limit)
+
+
+def build_timeline(
+    case_dir: str,
+    limit: int = 200,
+    descending: bool = True,
+    source: Optional[str] = None,
+    event_id: Optional[int] = None,
+    computer: Optional[str] = None,
+    start: Optional[Any] = None,
+    end: Optional[Any] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Up to limit (max 2000) timeline events, UNKNOWN_TIME entries last,
+    optionally within [start, end] (ISO or epoch seconds; undated entries
+    are then left out). Served, in order of preference, from:
 
-    merged = known + unknown
+      1. the case's timeline store, if current (api/timeline_store.py);
+      2. a lazy merge of the sorted derivatives, if they all are;
+      3. a heap scan of the derivatives, while the store is (re)built in
+         the background (cases ingested before either existed).
 
+    Raises ValueError for an invalid start/end.
+    """
     # Trim for demo
-    merged = merged[: max(1, min(int(limit), 2000))]
+    limit = max(1, min(int(limit), 2000))
+    start_us, end_us = _window_us(start, "start"), _window_us(end, "end")
+    accept = _record_filter(source, event_id, computer)
 
-    for e in merged:
-        e.pop("sort_ts", None)
-        e.pop("unknown_time", None)
+    from api.timeline_store import query_timeline, refresh_timeline_store
 
-    return merged
+    query = dict(source=source, event_id=event_id, computer=computer, start_us=start_us, end_us=end_us)
+    try:
+        rows = query_timeline(case_dir, limit, descending, rebuild=False, **query)
+        if rows is not None:
+            return rows
+    except Exception as e:
+        print(f"[TIMELINE] store unavailable: {e}")
+
+    runs = _sorted_runs(case_dir)
+    if runs is not None:
+        return _merge_timeline(runs, limit, descending, accept, start_us, end_us)
+
+    # never built inside the request: the next ones get the store
+    refresh_timeline_store(case_dir)
+    return _scan_timeline(case_dir, limit, descending, accept, start_us, end_us)
+
+
+def build_histogram(
+    case_dir: str,
+    bucket: str = "hour",
+    group_by: Optional[str] = None,
+    source: Optional[str] = None,
+    event_id: Optional[int] = None,
+    computer: Optional[str] = None,
+    start: Optional[Any] = None,
+    end: Optional[Any] = None,
+) -> Dict[str, Any]:
+    """
+    Event counts per time bucket over the whole case (not just the events
+    build_timeline returns), from the rollups in the timeline store; see
+    api/timeline_store.py:timeline_histogram. Raises ValueError for invalid
+    arguments.
+    """
+    from api.timeline_store import timeline_histogram
+
+    return timeline_histogram(
+        case_dir, bucket, group_by or None, source, event_id, computer,
+        _window_us(start, "start"), _window_us(end, "end"),
+    )
@@ -0,0 +1,503 @@
+# api/timeline_store.py
+import os
+import json
+import base64
+import bisect
+import sqlite3
+import tempfile
+import threading
+from datetime import timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from api.derivative_io import logical_path
+from api.timeline import _EPOCH, derivative_stamps, iter_derivative, timeline_event
+
+# Per-case timeline database, next to the derivatives
+TIMELINE_DB = "timeline.sqlite"
+
+_INSERT_BATCH = 10000
+_SCHEMA = """
+CREATE TABLE events (
+    unknown INTEGER NOT NULL,   -- 1 = UNKNOWN_TIME, listed after every dated event
+    ts_us INTEGER NOT NULL,     -- microseconds since the epoch, 0 when unknown
+    file INTEGER NOT NULL,      -- derivative (meta.files) and line offset: tie-breaker
+    offset INTEGER NOT NULL,
+    timestamp TEXT NOT NULL,
+    source TEXT NOT NULL,
+    channel TEXT,
+    computer TEXT,
+    event_id INTEGER,
+    description TEXT
+);
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+"""
+
+# Created after the bulk insert, which is much faster than maintaining them row by row
+_INDEXES = """
+CREATE INDEX events_ts ON events (unknown, ts_us, file, offset);
+CREATE INDEX events_source ON events (source, unknown, ts_us);
+CREATE INDEX events_event_id ON events (event_id, unknown, ts_us);
+CREATE INDEX events_computer ON events (computer, unknown, ts_us);
+"""
+
+# Dated event counts per minute, hour and day (the histogram buckets), each
+# summed from the one before; see timeline_histogram
+_ROLLUPS = {"minute": 60, "hour": 3600, "day": 86400}
+HISTOGRAM_GROUPS = ("source", "event_id", "channel", "computer")
+# Most buckets one histogram may span
+HISTOGRAM_MAX_BUCKETS = int(os.getenv("HISTOGRAM_MAX_BUCKETS", "20000"))
+
+_ROLLUP_SCHEMA = """
+CREATE TABLE rollup_{grain} (
+    bucket INTEGER NOT NULL,    -- bucket start, seconds since the epoch
+    source TEXT NOT NULL,
+    channel TEXT,
+    computer TEXT,
+    event_id INTEGER,
+    n INTEGER NOT NULL
+);
+"""
+
+# Bumped when the layout changes, so older stores are rebuilt on first use
+_STORE_VERSION = "2"
+
+_COLUMNS = ("timestamp", "source", "channel", "computer", "event_id", "description")
+
+# One build lock per case (ingest and the lazy rebuild in _connect share it)
+_build_locks: Dict[str, threading.RLock] = {}
+_build_locks_guard = threading.Lock()
+# Cases with a background rebuild running; see refresh_timeline_store
+_refreshing: set = set()
+
+# Most events one page_timeline page may ask for
+TIMELINE_PAGE_MAX = int(os.getenv("TIMELINE_PAGE_MAX", "100000"))
+
+# Seconds a client is told to wait (Retry-After) while the store is rebuilt
+TIMELINE_RETRY_AFTER_S = int(os.getenv("TIMELINE_RETRY_AFTER_S", "5"))
+
+
+class TimelineStoreBuilding(RuntimeError):
+    """The case's timeline store is missing or stale and being rebuilt in the background."""
+
+
+def timeline_db_path(case_dir: str) -> str:
+    return os.path.join(case_dir, TIMELINE_DB)
+
+
+def _build_lock(case_dir: str) -> threading.RLock:
+    key = os.path.realpath(case_dir)
+    with _build_locks_guard:
+        lock = _build_locks.get(key)
+        if lock is None:
+            lock = _build_locks[key] = threading.RLock()
+        return lock
+
+
+def _rows(case_dir: str, file_no: int, source: str, rel_path: str):
+    for line_offset, evt in iter_derivative(source, os.path.join(case_dir, rel_path)):
+        try:
+            e = timeline_event(source, evt)
+        except Exception:
+            continue
+        if e is None:
+            continue
+        unknown = 1 if e["unknown_time"] else 0
+        ts_us = 0 if unknown else e["sort_ts"]
+        yield (
+            unknown, ts_us, file_no, line_offset,
+            e["timestamp"], e["source"], e["channel"], e["computer"], e["event_id"], e["description"],
+        )
+
+
+def build_timeline_store(case_dir: str) -> Dict[str, Any]:
+    """
+    Load every timeline event of the case into timeline.sqlite (written
+    aside and swapped in, so readers never see a half-built database).
+    Builds of one case are serialized by its build lock.
+    """
+    with _build_lock(case_dir):
+        return _build_store(case_dir)
+
+
+def _build_store(case_dir: str) -> Dict[str, Any]:
+    files = derivative_stamps(case_dir)
+    path = timeline_db_path(case_dir)
+    # unique per build, so a crashed or concurrent build never shares it
+    fd, tmp = tempfile.mkstemp(dir=case_dir, prefix=TIMELINE_DB + ".", suffix=".tmp")
+    os.close(fd)
+
+    try:
+        conn = sqlite3.connect(tmp)
+        try:
+            conn.execute("PRAGMA journal_mode=OFF")
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.executescript(_SCHEMA)
+
+            events = 0
+            batch: List[tuple] = []
+            for file_no, (source, rel_path, _, _) in enumerate(files):
+                try:
+                    for row in _rows(case_dir, file_no, source, rel_path):
+                        batch.append(row)
+                        if len(batch) >= _INSERT_BATCH:
+                            conn.executemany("INSERT INTO events VALUES (?,?,?,?,?,?,?,?,?,?)", batch)
+                            events += len(batch)
+                            batch = []
+                except OSError as e:
+                    print(f"[TIMELINE] skipped {rel_path}: {e}")
+            if batch:
+                conn.executemany("INSERT INTO events VALUES (?,?,?,?,?,?,?,?,?,?)", batch)
+                events += len(batch)
+
+            conn.executescript(_INDEXES)
+            _build_rollups(conn)
+            conn.execute("INSERT INTO meta VALUES ('files', ?)", (json.dumps(files),))
+            conn.execute("INSERT INTO meta VALUES ('version', ?)", (_STORE_VERSION,))
+            conn.execute("INSERT INTO meta VALUES ('events', ?)", (str(events),))
+            conn.commit()
+        finally:
+            conn.close()
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+    return {"events": events, "files": len(files)}
+
+
+def _build_rollups(conn: sqlite3.Connection) -> None:
+    """Aggregate the dated events into the rollup tables, finest grain first."""
+    source_table = "events WHERE unknown = 0"
+    bucket = "ts_us / 1000000"
+    for grain, seconds in sorted(_ROLLUPS.items(), key=lambda item: item[1]):
+        conn.executescript(_ROLLUP_SCHEMA.format(grain=grain))
+        # floor division, also for (unlikely) times before 1970
+        start = f"(({bucket}) - ((({bucket}) % {seconds}) + {seconds}) % {seconds})"
+        n = "COUNT(*)" if source_table.startswith("events") else "SUM(n)"
+        conn.execute(
+            f"INSERT INTO rollup_{grain} "
+            f"SELECT {start} AS b, source, channel, computer, event_id, {n} FROM {source_table} "
+            f"GROUP BY b, source, channel, computer, event_id"
+        )
+        conn.execute(f"CREATE INDEX rollup_{grain}_bucket ON rollup_{grain} (bucket)")
+        source_table, bucket = f"rollup_{grain}", "bucket"
+
+
+def _is_fresh(conn: sqlite3.Connection, case_dir: str) -> bool:
+    meta = dict(conn.execute("SELECT key, value FROM meta").fetchall())
+    return (
+        meta.get("version") == _STORE_VERSION
+        and "files" in meta
+        and json.loads(meta["files"]) == derivative_stamps(case_dir)
+    )
+
+
+def _store_is_fresh(case_dir: str) -> bool:
+    """Whether timeline.sqlite exists and matches the case's derivatives."""
+    path = timeline_db_path(case_dir)
+    if not os.path.exists(path):
+        return False
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        return _is_fresh(conn, case_dir)
+    except sqlite3.DatabaseError:
+        return False
+    finally:
+        conn.close()
+
+
+def _connect(case_dir: str, rebuild: bool = True) -> Optional[sqlite3.Connection]:
+    """
+    Read-only connection to an up-to-date store, (re)building it first if
+    needed; with rebuild=False, None instead of building.
+    """
+    path = timeline_db_path(case_dir)
+    for attempt in range(2):
+        if os.path.exists(path):
+            conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+            try:
+                if _is_fresh(conn, case_dir):
+                    return conn
+            except sqlite3.DatabaseError:
+                pass
+            conn.close()
+        if not rebuild:
+            return None
+        if attempt == 0:
+            with _build_lock(case_dir):
+                if not _store_is_fresh(case_dir):
+                    print(f"[TIMELINE] (re)building {path}")
+                    _build_store(case_dir)
+    raise RuntimeError(f"Timeline store {path} is not readable")
+
+
+def refresh_timeline_store(case_dir: str) -> None:
+    """
+    Rebuild a missing or stale store on a daemon thread, at most one per
+    case, for request handlers that must not build inline.
+    """
+    key = os.path.realpath(case_dir)
+    with _build_locks_guard:
+        if key in _refreshing:
+            return
+        _refreshing.add(key)
+
+    def run():
+        try:
+            with _build_lock(case_dir):
+                if not _store_is_fresh(case_dir):
+                    print(f"[TIMELINE] (re)building {timeline_db_path(case_dir)} in the background")
+                    _build_store(case_dir)
+        except Exception as e:
+            print(f"[TIMELINE] background rebuild of {case_dir} failed: {e}")
+        finally:
+            with _build_locks_guard:
+                _refreshing.discard(key)
+
+    threading.Thread(target=run, name="timeline-rebuild", daemon=True).start()
+
+
+def _connect_or_refresh(case_dir: str) -> sqlite3.Connection:
+    """
+    Read-only connection to an up-to-date store for request handlers that
+    must not build inline: if it is missing or stale, start a background
+    rebuild and raise TimelineStoreBuilding.
+    """
+    conn = _connect(case_dir, rebuild=False)
+    if conn is None:
+        refresh_timeline_store(case_dir)
+        raise TimelineStoreBuilding("Timeline store is being built for this case; retry shortly")
+    return conn
+
+
+def query_timeline(
+    case_dir: str,
+    limit: int = 200,
+    descending: bool = True,
+    source: Optional[str] = None,
+    event_id: Optional[int] = None,
+    computer: Optional[str] = None,
+    start_us: Optional[int] = None,
+    end_us: Optional[int] = None,
+    rebuild: bool = True,
+) -> Optional[List[Dict[str, Any]]]:
+    """
+    build_timeline's answer from the store: dated events newest (or oldest)
+    first, then UNKNOWN_TIME ones, optionally filtered and limited to
+    [start_us, end_us] (which leaves the UNKNOWN_TIME ones out); each part
+    is one indexed range scan that stops after limit rows. None if the store
+    is missing or stale and rebuild is False.
+    """
+    where, params = [], []
+    for column, value in (("source", source), ("event_id", event_id), ("computer", computer)):
+        if value is not None and value != "":
+            where.append(f"{column} = ?")
+            params.append(value)
+    cond = "".join(f" AND {w}" for w in where)
+    window = ""
+    if start_us is not None:
+        window += " AND ts_us >= ?"
+    if end_us is not None:
+        window += " AND ts_us <= ?"
+    bounds = [b for b in (start_us, end_us) if b is not None]
+    order = "DESC" if descending else "ASC"
+    cols = ", ".join(_COLUMNS)
+
+    conn = _connect(case_dir, rebuild)
+    if conn is None:
+        return None
+    try:
+        rows = conn.execute(
+            f"SELECT {cols} FROM events WHERE unknown = 0{cond}{window} "
+            f"ORDER BY ts_us {order}, file, offset LIMIT ?",
+            (*params, *bounds, limit),
+        ).fetchall()
+        if len(rows) < limit and not bounds:
+            rows += conn.execute(
+                f"SELECT {cols} FROM events WHERE unknown = 1{cond} ORDER BY file, offset LIMIT ?",
+                (*params, limit - len(rows)),
+            ).fetchall()
+    finally:
+        conn.close()
+
+    return [dict(zip(_COLUMNS, row)) for row in rows]
+
+
+def encode_cursor(unknown: int, ts_us: int, rel_path: str, offset: int, descending: bool) -> str:
+    raw = json.dumps([int(unknown), int(ts_us), rel_path, int(offset), int(descending)])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[int, int, str, int, bool]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        unknown, ts_us, rel_path, offset, descending = json.loads(raw)
+        return int(unknown), int(ts_us), str(rel_path), int(offset), bool(descending)
+    except Exception:
+        raise ValueError("Invalid timeline cursor")
+
+
+def page_timeline(
+    case_dir: str, cursor: Optional[str] = None, limit: int = 1000, descending: bool = True
+) -> Tuple[List[Dict[str, Any]], Optional[str], int]:
+    """
+    One page of the whole timeline, in query_timeline's order (dated events
+    by time, ties by (file, offset) ascending in both directions, then
+    UNKNOWN_TIME ones), after cursor or from the start. Keyset pagination on
+    the events_ts index: each part is a range scan from the cursor's key, so
+    a page costs the same however deep the client is.
+
+    Returns (events, next cursor or None on the last page, events in the
+    case). Cursors name files by logical path, so they stay valid across a
+    rebuild; if the cursor's file is gone, paging resumes with the entries
+    that sort after it. Raises ValueError for a malformed cursor or one
+    issued for the other sort order, TimelineStoreBuilding while a missing
+    or stale store is rebuilt in the background.
+    """
+    limit = max(1, min(int(limit), TIMELINE_PAGE_MAX))
+    order = "DESC" if descending else "ASC"
+    after = "<" if descending else ">"
+    cols = ", ".join(("unknown", "ts_us", "file", "offset") + _COLUMNS)
+
+    conn = _connect_or_refresh(case_dir)
+    try:
+        meta = dict(conn.execute("SELECT key, value FROM meta").fetchall())
+        names = [logical_path(rel) for _, rel, _, _ in json.loads(meta["files"])]
+        total = int(meta["events"]) if "events" in meta else conn.execute("SELECT COUNT(*) FROM events").fetchone()[0]
+
+        # (sql, params) per part, in page order
+        parts: List[Tuple[str, list]] = []
+        if cursor:
+            unknown, ts_us, rel_path, offset, cursor_desc = decode_cursor(cursor)
+            if cursor_desc != descending:
+                raise ValueError("Timeline cursor was issued for the other sort order")
+            rel_path = logical_path(rel_path)
+            file_no = bisect.bisect_left(names, rel_path)
+            if file_no >= len(names) or names[file_no] != rel_path:
+                # a file gone since: resume with everything that sorts after its name
+                offset = -1
+            if unknown:
+                parts.append((
+                    f"SELECT {cols} FROM events WHERE unknown = 1 AND (file, offset) > (?, ?) "
+                    f"ORDER BY file, offset LIMIT ?",
+                    [file_no, offset],
+                ))
+            else:
+                parts.append((
+                    f"SELECT {cols} FROM events WHERE unknown = 0 AND ts_us = ? AND (file, offset) > (?, ?) "
+                    f"ORDER BY file, offset LIMIT ?",
+                    [ts_us, file_no, offset],
+                ))
+                parts.append((
+                    f"SELECT {cols} FROM events WHERE unknown = 0 AND ts_us {after} ? "
+                    f"ORDER BY ts_us {order}, file, offset LIMIT ?",
+                    [ts_us],
+                ))
+        else:
+            parts.append((f"SELECT {cols} FROM events WHERE unknown = 0 ORDER BY ts_us {order}, file, offset LIMIT ?", []))
+        if not cursor or not unknown:
+            parts.append((f"SELECT {cols} FROM events WHERE unknown = 1 ORDER BY file, offset LIMIT ?", []))
+
+        # one row past the page tells whether there is a next one
+        rows: List[tuple] = []
+        for sql, params in parts:
+            if len(rows) > limit:
+                break
+            rows += conn.execute(sql, (*params, limit + 1 - len(rows))).fetchall()
+    finally:
+        conn.close()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        unknown, ts_us, file_no, offset = rows[-1][:4]
+        next_cursor = encode_cursor(unknown, ts_us, names[file_no], offset, descending)
+    return [dict(zip(_COLUMNS, row[4:])) for row in rows], next_cursor, total
+
+
+def timeline_histogram(
+    case_dir: str,
+    bucket: str = "hour",
+    group_by: Optional[str] = None,
+    source: Optional[str] = None,
+    event_id: Optional[int] = None,
+    computer: Optional[str] = None,
+    start_us: Optional[int] = None,
+    end_us: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Event counts per minute/hour/day bucket over the whole case, optionally
+    split by one of HISTOGRAM_GROUPS, filtered like query_timeline. Read
+    from the rollups, so the cost follows the number of buckets, not events;
+    a window edge inside a bucket counts the whole bucket. UNKNOWN_TIME
+    entries are counted apart as "undated" (and not at all in a window).
+
+    Raises ValueError for an unknown bucket or group_by, or a histogram of
+    more than HISTOGRAM_MAX_BUCKETS buckets, TimelineStoreBuilding while
+    a missing or stale store is rebuilt in the background.
+    """
+    if bucket not in _ROLLUPS:
+        raise ValueError(f"bucket must be one of {', '.join(_ROLLUPS)}")
+    if group_by is not None and group_by not in HISTOGRAM_GROUPS:
+        raise ValueError(f"group_by must be one of {', '.join(HISTOGRAM_GROUPS)}")
+    seconds = _ROLLUPS[bucket]
+
+    where, params = [], []
+    for column, value in (("source", source), ("event_id", event_id), ("computer", computer)):
+        if value is not None and value != "":
+            where.append(f"{column} = ?")
+            params.append(value)
+    filters = list(where)
+    # whole buckets overlapping the window
+    if start_us is not None:
+        where.append("bucket >= ?")
+        params.append(start_us // 1_000_000 - (start_us // 1_000_000) % seconds)
+    if end_us is not None:
+        where.append("bucket <= ?")
+        params.append(end_us // 1_000_000)
+    cond = (" WHERE " + " AND ".join(where)) if where else ""
+    group = f", {group_by}" if group_by else ""
+
+    conn = _connect_or_refresh(case_dir)
+    try:
+        span = conn.execute(f"SELECT MIN(bucket), MAX(bucket) FROM rollup_{bucket}{cond}", params).fetchone()
+        if span[0] is not None and (span[1] - span[0]) // seconds + 1 > HISTOGRAM_MAX_BUCKETS:
+            raise ValueError(
+                f"Histogram would span more than {HISTOGRAM_MAX_BUCKETS} {bucket} buckets; "
+                "use a coarser bucket or a narrower start/end window"
+            )
+        rows = conn.execute(
+            f"SELECT bucket{group}, SUM(n) FROM rollup_{bucket}{cond} GROUP BY bucket{group} ORDER BY bucket",
+            params,
+        ).fetchall()
+        undated = 0
+        if start_us is None and end_us is None:
+            undated = conn.execute(
+                "SELECT COUNT(*) FROM events WHERE unknown = 1" + "".join(f" AND {w}" for w in filters),
+                params,
+            ).fetchone()[0]
+    finally:
+        conn.close()
+
+    buckets: List[Dict[str, Any]] = []
+    for row in rows:
+        b, n = row[0], row[-1]
+        if not buckets or buckets[-1]["_b"] != b:
+            buckets.append({"_b": b, "start": (_EPOCH + timedelta(seconds=b)).isoformat(), "count": 0})
+            if group_by:
+                buckets[-1]["groups"] = {}
+        buckets[-1]["count"] += n
+        if group_by:
+            label = "" if row[1] is None else str(row[1])
+            buckets[-1]["groups"][label] = buckets[-1]["groups"].get(label, 0) + n
+    for b in buckets:
+        del b["_b"]
+
+    return {
+        "bucket": bucket,
+        "group_by": group_by,
+        "buckets": buckets,
+        "total": sum(b["count"] for b in buckets),
+        "undated": undated,
+    }
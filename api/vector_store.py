@@ -0,0 +1,249 @@
+# api/vector_store.py
+import os
+import time
+import threading
+from typing import Any, Callable, Dict, List, Optional, Set
+
+# chroma = the Chroma HTTP service (docker-compose); local = in-process NumPy
+# store under each case dir, for offline laptops and CI (api/local_vector_store.py)
+VECTOR_STORES = ("chroma", "local")
+VECTOR_STORE = os.getenv("VECTOR_STORE", "chroma").strip().lower()
+
+CHROMA_HOST = os.getenv("CHROMA_HOST", "chroma")  # docker-compose service name
+CHROMA_PORT = int(os.getenv("CHROMA_PORT", "8000"))
+
+
+class VectorStore:
+    """
+    What the embedder needs from a vector store, per case. Vectors are
+    L2-normalized and distances are cosine (0 = identical). query() returns
+    Chroma's result shape: {"ids", "distances", "documents", "metadatas"},
+    one list per query embedding.
+    """
+
+    name = ""
+
+    def connect(self) -> None:
+        """Open connections/clients now rather than on first use."""
+
+    def connected(self) -> bool:
+        return True
+
+    def existing_ids(self, case_id: str, ids: List[str]) -> Set[str]:
+        raise NotImplementedError
+
+    def update_metadata(self, case_id: str, ids: List[str], metadatas: List[Dict[str, Any]]) -> None:
+        raise NotImplementedError
+
+    def upsert(
+        self,
+        case_id: str,
+        ids: List[str],
+        documents: List[str],
+        metadatas: List[Dict[str, Any]],
+        embeddings: List[List[float]],
+    ) -> None:
+        raise NotImplementedError
+
+    def prune(
+        self, case_id: str, where: Dict[str, Any], keep: Callable[[Dict[str, Any]], bool], page_size: int = 5000
+    ) -> int:
+        """Delete chunks matching where for which keep(metadata) is False; returns the number removed."""
+        raise NotImplementedError
+
+    def query(
+        self,
+        case_id: str,
+        embeddings: List[List[float]],
+        n_results: int,
+        where: Optional[Dict[str, Any]] = None,
+        where_document: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def delete_case(self, case_id: str) -> None:
+        raise NotImplementedError
+
+    def forget_case(self, case_id: str) -> None:
+        """Drop anything cached for the case; the next use reopens it."""
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+
+def _make_client():
+    """
+    In docker-compose you should ALWAYS talk to the chroma service.
+    Avoid falling back to PersistentClient('/data') because that creates a *different*
+    DB in your artifacts volume and causes confusing 'count=0' mismatches.
+    Use VECTOR_STORE=local instead when there is no Chroma service at all.
+    """
+    import chromadb
+
+    return chromadb.HttpClient(host=CHROMA_HOST, port=CHROMA_PORT)
+
+
+def _is_stale_collection(e: Exception) -> bool:
+    # chromadb.errors.InvalidCollectionException, matched by name so this
+    # module doesn't import chromadb before the client is needed
+    return type(e).__name__ == "InvalidCollectionException"
+
+
+class ChromaVectorStore(VectorStore):
+    """
+    One collection per case (case_<id>, cosine space) on the Chroma service.
+    The client connects on first use; collection handles are cached per case,
+    so get_or_create_collection (an HTTP round-trip) runs once per case
+    instead of on every batch and query.
+    """
+
+    name = "chroma"
+
+    def __init__(self):
+        self._client = None
+        self._client_lock = threading.Lock()
+        self.connect_s: Optional[float] = None
+
+        self._collections: Dict[str, Any] = {}
+        self._collections_lock = threading.Lock()
+        self._collection_stats = {"hits": 0, "misses": 0, "invalidations": 0, "lookup_s_total": 0.0}
+
+    def _get_client(self):
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    t0 = time.perf_counter()
+                    client = _make_client()
+                    self.connect_s = round(time.perf_counter() - t0, 3)
+                    self._client = client
+        return self._client
+
+    def connect(self) -> None:
+        try:
+            self._get_client()
+        except Exception as e:
+            print(f"[VECTOR_STORE] could not reach Chroma at {CHROMA_HOST}:{CHROMA_PORT}: {e}")
+
+    def connected(self) -> bool:
+        return self._client is not None
+
+    def _get_collection(self, case_id: str):
+        coll = self._collections.get(case_id)
+        if coll is not None:
+            self._collection_stats["hits"] += 1
+            return coll
+
+        t0 = time.perf_counter()
+        coll = self._get_client().get_or_create_collection(
+            name=f"case_{case_id}",
+            metadata={"hnsw:space": "cosine"},
+        )
+        with self._collections_lock:
+            self._collections[case_id] = coll
+            self._collection_stats["misses"] += 1
+            self._collection_stats["lookup_s_total"] += time.perf_counter() - t0
+        return coll
+
+    def forget_case(self, case_id: str) -> None:
+        with self._collections_lock:
+            if self._collections.pop(case_id, None) is not None:
+                self._collection_stats["invalidations"] += 1
+
+    def _with_collection(self, case_id: str, op):
+        """
+        Run op(collection) on the cached handle. If the collection was deleted or
+        recreated since (its id is gone), drop the handle and retry once.
+        """
+        try:
+            return op(self._get_collection(case_id))
+        except Exception as e:
+            if not _is_stale_collection(e):
+                raise
+            self.forget_case(case_id)
+            return op(self._get_collection(case_id))
+
+    def existing_ids(self, case_id: str, ids: List[str]) -> Set[str]:
+        return set(self._with_collection(case_id, lambda coll: coll.get(ids=ids, include=[])).get("ids") or [])
+
+    def update_metadata(self, case_id: str, ids: List[str], metadatas: List[Dict[str, Any]]) -> None:
+        self._with_collection(case_id, lambda coll: coll.update(ids=ids, metadatas=metadatas))
+
+    def upsert(self, case_id, ids, documents, metadatas, embeddings) -> None:
+        self._with_collection(
+            case_id,
+            lambda coll: coll.upsert(ids=ids, documents=documents, metadatas=metadatas, embeddings=embeddings),
+        )
+
+    def prune(self, case_id, where, keep, page_size=5000) -> int:
+        def _prune(coll) -> int:
+            removed = 0
+            offset = 0
+            while True:
+                page = coll.get(where=where, include=["metadatas"], limit=page_size, offset=offset)
+                ids = page.get("ids") or []
+                if not ids:
+                    break
+                metas = page.get("metadatas") or [None] * len(ids)
+
+                stale = [cid for cid, meta in zip(ids, metas) if not keep(meta or {})]
+                if stale:
+                    coll.delete(ids=stale)
+                    removed += len(stale)
+
+                # deleted rows no longer take up positions before the next page
+                offset += len(ids) - len(stale)
+                if len(ids) < page_size:
+                    break
+            return removed
+
+        return self._with_collection(case_id, _prune)
+
+    def query(self, case_id, embeddings, n_results, where=None, where_document=None) -> Dict[str, Any]:
+        # IMPORTANT (Chroma 0.5.3):
+        # include cannot contain "ids" — ids come back automatically.
+        return self._with_collection(
+            case_id,
+            lambda coll: coll.query(
+                query_embeddings=embeddings,
+                n_results=n_results,
+                where=where,
+                where_document=where_document,
+                include=["documents", "metadatas", "distances"],
+            ),
+        )
+
+    def delete_case(self, case_id: str) -> None:
+        try:
+            self._get_client().delete_collection(f"case_{case_id}")
+        finally:
+            self.forget_case(case_id)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._collections_lock:
+            misses = self._collection_stats["misses"]
+            avg_lookup_ms = (self._collection_stats["lookup_s_total"] / misses * 1000) if misses else 0.0
+            return {
+                "backend": self.name,
+                "connected": self._client is not None,
+                "connect_s": self.connect_s,
+                "collections": {
+                    "cached": len(self._collections),
+                    "hits": self._collection_stats["hits"],
+                    "misses": misses,
+                    "invalidations": self._collection_stats["invalidations"],
+                    "avg_lookup_ms": round(avg_lookup_ms, 3),
+                    # each hit skips one get_or_create_collection round-trip
+                    "saved_ms_per_call": round(avg_lookup_ms, 3),
+                    "saved_ms_total": round(avg_lookup_ms * self._collection_stats["hits"], 1),
+                },
+            }
+
+
+def make_vector_store(name: str = VECTOR_STORE) -> VectorStore:
+    if name == "chroma":
+        return ChromaVectorStore()
+    if name == "local":
+        from api.local_vector_store import LocalVectorStore
+
+        return LocalVectorStore()
+    raise ValueError(f"VECTOR_STORE must be one of {', '.join(VECTOR_STORES)}, got {name!r}")
@@ -0,0 +1,103 @@
+# bench_embed.py
+import os
+import sys
+import glob
+import time
+
+import numpy as np
+
+from api.derivative_io import ZSTD_SUFFIX, logical_path, open_derivative
+from api.embedder import EMBED_BACKENDS, load_model
+
+DFIR_QUERIES = [
+    "failed logon attempts",
+    "new service installed",
+    "powershell encoded command",
+    "process creation cmd.exe",
+    "user logged on remotely",
+    "run key persistence",
+    "service entered the stopped state",
+    "privileged logon special privileges assigned",
+]
+
+
+def load_case_texts(case_dir, max_texts):
+    """One-line EVTX/registry summaries already derived for the case (what gets indexed)."""
+    texts = []
+    for pattern in ("artifacts/evtx/*.txt", "artifacts/registry/*.txt"):
+        # stored plain or zstd-compressed (api/derivative_io.py)
+        stored = glob.glob(os.path.join(case_dir, pattern)) + glob.glob(os.path.join(case_dir, pattern + ZSTD_SUFFIX))
+        for path in sorted({logical_path(p) for p in stored}):
+            with open_derivative(path, "r") as f:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        texts.append(line)
+                    if len(texts) >= max_texts:
+                        return texts
+    return texts
+
+
+def encode_timed(model, texts):
+    t0 = time.perf_counter()
+    vecs = np.asarray(model.encode(texts, normalize_embeddings=True), dtype=np.float32)
+    return vecs, time.perf_counter() - t0
+
+
+def top_k(corpus_vecs, query_vecs, k):
+    scores = query_vecs @ corpus_vecs.T
+    k = min(k, corpus_vecs.shape[0])
+    idx = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    return [set(row) for row in idx]
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("usage: python bench_embed.py <case_dir> [backends] [max_texts] [top_k]")
+        print(f"       backends: comma separated, first is the reference (default {','.join(EMBED_BACKENDS)})")
+        sys.exit(1)
+
+    case_dir = sys.argv[1]
+    backends = sys.argv[2].split(",") if len(sys.argv) > 2 else list(EMBED_BACKENDS)
+    max_texts = int(sys.argv[3]) if len(sys.argv) > 3 else 5000
+    k = int(sys.argv[4]) if len(sys.argv) > 4 else 10
+
+    corpus = load_case_texts(case_dir, max_texts)
+    if not corpus:
+        print(f"[-] no derivative .txt files under {case_dir}/artifacts")
+        sys.exit(1)
+
+    # Queries: the fixed DFIR set plus every Nth corpus line
+    queries = DFIR_QUERIES + corpus[:: max(1, len(corpus) // 100)]
+
+    print(f"[+] Case      : {case_dir}")
+    print(f"Corpus texts  : {len(corpus)}")
+    print(f"Queries       : {len(queries)} (recall@{k} against {backends[0]})")
+
+    ref_vecs = ref_hits = None
+    for backend in backends:
+        t0 = time.perf_counter()
+        model = load_model(backend)
+        load_s = time.perf_counter() - t0
+
+        model.encode(corpus[:32], normalize_embeddings=True)  # warm-up, not timed
+        corpus_vecs, corpus_s = encode_timed(model, corpus)
+        query_vecs, _ = encode_timed(model, queries)
+        hits = top_k(corpus_vecs, query_vecs, k)
+
+        line = (
+            f"{backend:<10}: load {load_s:6.2f}s | {len(corpus) / corpus_s:8.1f} texts/s "
+            f"| dim {corpus_vecs.shape[1]}"
+        )
+        if ref_vecs is None:
+            ref_vecs, ref_hits = corpus_vecs, hits
+            line += " | reference"
+        else:
+            cos = np.sum(ref_vecs * corpus_vecs, axis=1)
+            recall = np.mean([len(a & b) / len(a) for a, b in zip(ref_hits, hits)])
+            line += f" | cos vs ref mean {cos.mean():.5f} min {cos.min():.5f} | recall@{k} {recall:.4f}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
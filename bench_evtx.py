@@ -0,0 +1,66 @@
+# bench_evtx.py
+import sys
+import time
+
+from Evtx.Evtx import Evtx
+
+from api.evtx_parser import _record_to_event, _iter_chunk_events, _new_stats
+
+
+def run_xml_path(evtx_path):
+    """Previous path: render every record to XML and parse it back."""
+    out = []
+    with Evtx(evtx_path) as log:
+        for record in log.records():
+            event = _record_to_event(record)
+            if event is not None:
+                out.append(event)
+    return out
+
+
+def run_decoder_path(evtx_path, stats):
+    """Template-cached decoder (with EventID pre-filter and XML fallback)."""
+    out = []
+    with Evtx(evtx_path) as log:
+        for chunk in log.chunks():
+            out.extend(_iter_chunk_events(chunk, stats))
+    return out
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("usage: python bench_evtx.py <file.evtx> [rounds]")
+        sys.exit(1)
+
+    evtx_path = sys.argv[1]
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+
+    xml_times = []
+    dec_times = []
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        xml_events = run_xml_path(evtx_path)
+        xml_times.append(time.perf_counter() - t0)
+
+        stats = _new_stats()
+        t0 = time.perf_counter()
+        dec_events = run_decoder_path(evtx_path, stats)
+        dec_times.append(time.perf_counter() - t0)
+
+    xml_best = min(xml_times)
+    dec_best = min(dec_times)
+    seen = stats["records_seen"] or 1
+
+    print(f"[+] File          : {evtx_path}")
+    print(f"Records         : {stats['records_seen']}")
+    print(f"Events kept     : {len(dec_events)}")
+    print(f"Skipped (EID)   : {stats['records_skipped']}")
+    print(f"XML fallbacks   : {stats['records_rendered']}")
+    print(f"XML path        : {xml_best:.3f}s ({xml_best / seen * 1e6:.1f} us/record)")
+    print(f"Decoder path    : {dec_best:.3f}s ({dec_best / seen * 1e6:.1f} us/record)")
+    print(f"Speedup         : {xml_best / dec_best if dec_best else float('inf'):.1f}x")
+    print(f"Identical output: {xml_events == dec_events}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+# bench_timeline.py
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import resource
+import tempfile
+import multiprocessing as mp
+from datetime import datetime, timedelta
+
+from api.timeline import _iter_records, _record_filter, _scan_timeline, timeline_event
+from api.timeline_store import build_timeline_store, query_timeline, timeline_histogram
+
+EVTX_FILES = 8
+REGISTRY_SHARE = 0.05  # of all events; a third of those have no last_write
+EVENT_IDS = [4624, 4625, 4634, 4672, 4688, 7036, 7045]
+
+
+def make_case(case_dir, events, seed=0):
+    """Synthetic derivatives: shuffled EVTX JSONL across a few files plus registry entries."""
+    rng = random.Random(seed)
+    evtx_dir = os.path.join(case_dir, "artifacts", "evtx")
+    reg_dir = os.path.join(case_dir, "artifacts", "registry")
+    os.makedirs(evtx_dir)
+    os.makedirs(reg_dir)
+
+    start = datetime(2024, 1, 1)
+    n_reg = int(events * REGISTRY_SHARE)
+    n_evtx = events - n_reg
+
+    outs = [open(os.path.join(evtx_dir, f"Log{i}.jsonl"), "w", encoding="utf-8") for i in range(EVTX_FILES)]
+    for i in range(n_evtx):
+        ts = (start + timedelta(seconds=rng.randrange(90 * 86400), microseconds=rng.randrange(10**6))).isoformat()
+        eid = EVENT_IDS[i % len(EVENT_IDS)]
+        outs[i % EVTX_FILES].write(
+            f'{{"timestamp": "{ts}Z", "event_id": {eid}, "channel": "Security", "computer": "WS{i % 50:02d}", '
+            f'"data": {{"SubjectUserName": "user{i % 997}", "IpAddress": "10.0.{i % 255}.{i % 253}", '
+            f'"ProcessName": "C:\\\\Windows\\\\System32\\\\svc{i % 31}.exe", "LogonType": "3"}}}}\n'
+        )
+    for f in outs:
+        f.close()
+
+    with open(os.path.join(reg_dir, "SOFTWARE.jsonl"), "w", encoding="utf-8") as f:
+        for i in range(n_reg):
+            lw = None if i % 3 == 0 else (start + timedelta(seconds=rng.randrange(90 * 86400))).isoformat()
+            f.write(json.dumps({
+                "hive": "SOFTWARE", "category": "run_key", "key_path": f"Microsoft\\Windows\\Run\\{i}",
+                "value_name": f"v{i}", "value": f"C:\\tools\\{i}.exe", "last_write": lw,
+            }) + "\n")
+
+
+def full_sort_timeline(case_dir, limit, descending):
+    """The previous build_timeline: format every event, sort them all, slice."""
+    events = []
+    for source, evt in _iter_records(case_dir):
+        e = timeline_event(source, evt)
+        if e is not None:
+            events.append(e)
+    known = [e for e in events if not e["unknown_time"]]
+    unknown = [e for e in events if e["unknown_time"]]
+    known.sort(key=lambda e: e["sort_ts"], reverse=descending)
+    unknown.sort(key=lambda e: e["sort_ts"])
+    merged = (known + unknown)[:limit]
+    for e in merged:
+        e.pop("sort_ts", None)
+        e.pop("unknown_time", None)
+    return merged
+
+
+def _phase(name, case_dir, limit, descending):
+    t0 = time.perf_counter()
+    if name == "full sort":
+        out = full_sort_timeline(case_dir, limit, descending)
+    elif name == "heap":
+        out = _scan_timeline(case_dir, limit, descending, _record_filter(None, None, None))
+    elif name == "store build":
+        out = build_timeline_store(case_dir)
+    elif name == "histogram":
+        out = timeline_histogram(case_dir, "hour", "event_id")
+    else:
+        out = query_timeline(case_dir, limit, descending)
+    seconds = time.perf_counter() - t0
+    return seconds, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, out
+
+
+def run_phase(name, case_dir, limit, descending):
+    """In a fresh process, so each phase reports its own peak RSS."""
+    with mp.get_context("fork").Pool(1) as pool:
+        return pool.apply(_phase, (name, case_dir, limit, descending))
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] in ("-h", "--help"):
+        print("usage: python bench_timeline.py [events] [limit] [case_dir]")
+        print("       generates a synthetic case (default 5,000,000 events) unless case_dir already has one")
+        sys.exit(1)
+
+    events = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000_000
+    limit = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    case_dir = sys.argv[3] if len(sys.argv) > 3 else None
+
+    cleanup = case_dir is None
+    if case_dir is None:
+        case_dir = os.path.join(tempfile.mkdtemp(prefix="timeline_bench_"), "case")
+    if not os.path.isdir(os.path.join(case_dir, "artifacts")):
+        t0 = time.perf_counter()
+        make_case(case_dir, events)
+        print(f"Generated {events} events in {time.perf_counter() - t0:.1f}s under {case_dir}")
+
+    try:
+        print(f"\n{'phase':<14} {'seconds':>9} {'peak MB':>9}   (limit={limit}, descending)")
+        results = {}
+        for name in ("full sort", "heap", "store build", "store page", "histogram"):
+            seconds, peak_mb, out = run_phase(name, case_dir, limit, True)
+            results[name] = out
+            print(f"{name:<14} {seconds:>9.3f} {peak_mb:>9.0f}")
+
+        same = results["full sort"] == results["heap"] == results["store page"]
+        print(f"\nsame {limit} events from all three: {same}")
+        hist = results["histogram"]
+        print(f"histogram: {len(hist['buckets'])} hourly buckets, {hist['total']} dated + {hist['undated']} undated events")
+        sys.exit(0 if same else 1)
+    finally:
+        if cleanup:
+            shutil.rmtree(os.path.dirname(case_dir), ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
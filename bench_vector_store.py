@@ -0,0 +1,128 @@
+# bench_vector_store.py
+import os
+import sys
+import time
+import tempfile
+
+import numpy as np
+
+# The local store writes under ARTIFACT_DIR/<case>; keep it out of real cases
+os.environ.setdefault("ARTIFACT_DIR", tempfile.mkdtemp(prefix="vector_parity_"))
+
+from api import local_vector_store
+from api.search_filters import where_matcher
+from api.vector_store import make_vector_store
+
+WORDS = ["logon", "service", "powershell", "registry", "failed", "admin", "cmd.exe", "run", "network", "token"]
+EVENT_IDS = [4624, 4625, 4688, 7045, 4672]
+
+
+def synthetic_corpus(n, dim, seed=0):
+    """Clustered unit vectors (like real embeddings) with EVTX-like metadata."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(8, n // 200), dim)).astype(np.float32)
+    vecs = centers[rng.integers(0, len(centers), n)] + 0.35 * rng.normal(size=(n, dim)).astype(np.float32)
+    vecs /= np.linalg.norm(vecs, axis=1, keepdims=True)
+
+    ids, docs, metas = [], [], []
+    for i in range(n):
+        eid = EVENT_IDS[i % len(EVENT_IDS)]
+        ids.append(f"parity_{i}")
+        docs.append(f"EventID={eid} " + " ".join(rng.choice(WORDS, 6)))
+        metas.append({"source": "evtx", "event_id": eid, "ts_epoch": 1.7e9 + i, "line": i})
+    return ids, docs, metas, vecs
+
+
+def load(store, case_id, ids, docs, metas, vecs, batch=2000):
+    for start in range(0, len(ids), batch):
+        end = start + batch
+        store.upsert(case_id, ids[start:end], docs[start:end], metas[start:end], vecs[start:end].tolist())
+
+
+def run_queries(store, case_id, queries, k, where, where_document):
+    store.query(case_id, queries[:1].tolist(), k, where=where, where_document=where_document)  # warm (HNSW build)
+    t0 = time.perf_counter()
+    res = store.query(case_id, queries.tolist(), k, where=where, where_document=where_document)
+    return res, (time.perf_counter() - t0) * 1000 / len(queries)
+
+
+def exact_top_k(vecs, docs, metas, queries, k, where, where_document):
+    """Reference answer: NumPy over the whole corpus, filters applied in Python."""
+    accept = where_matcher(where, where_document)
+    rows = np.array([i for i in range(len(docs)) if accept is None or accept(docs[i], metas[i])], dtype=np.int64)
+    if not len(rows):
+        return [[] for _ in queries], [[] for _ in queries]
+    dist = 1.0 - queries @ vecs[rows].T
+    order = np.argsort(dist, axis=1, kind="stable")[:, :k]
+    return rows[order], np.take_along_axis(dist, order, axis=1)
+
+
+def compare(ref_rows, ref_dist, res, ids):
+    """(recall@k against the exact answer, max |distance difference| on shared hits)"""
+    recalls, diffs = [], []
+    for want_rows, want_d, got_ids, got_d in zip(ref_rows, ref_dist, res["ids"], res["distances"]):
+        want = {ids[r]: d for r, d in zip(want_rows, want_d)}
+        if want:
+            recalls.append(len(want.keys() & set(got_ids)) / len(want))
+        diffs += [abs(d - want[i]) for i, d in zip(got_ids, got_d) if i in want]
+    return (float(np.mean(recalls)) if recalls else 1.0), max(diffs, default=0.0)
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] in ("-h", "--help"):
+        print("usage: python bench_vector_store.py [rows] [queries] [top_k] [dim]")
+        print("       compares VECTOR_STORE=local (brute force and HNSW) against Chroma at CHROMA_HOST:CHROMA_PORT")
+        sys.exit(1)
+
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    n_queries = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    k = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+    dim = int(sys.argv[4]) if len(sys.argv) > 4 else 384
+
+    ids, docs, metas, vecs = synthetic_corpus(rows, dim)
+    rng = np.random.default_rng(1)
+    queries = vecs[rng.integers(0, rows, n_queries)] + 0.1 * rng.normal(size=(n_queries, dim)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    case_id = f"parity{os.getpid()}"
+    chroma = make_vector_store("chroma")
+    local = make_vector_store("local")
+
+    print(f"Loading {rows} vectors (dim {dim}) into both stores...")
+    for name, store in (("chroma", chroma), ("local", local)):
+        t0 = time.perf_counter()
+        load(store, case_id, ids, docs, metas, vecs)
+        print(f"  {name:<7} {rows / (time.perf_counter() - t0):10.0f} vectors/s")
+
+    cases = [
+        ("unfiltered", None, None),
+        ("event_id", {"event_id": {"$in": [4625, 4688]}}, None),
+        ("time window", {"$and": [{"ts_epoch": {"$gte": 1.7e9 + rows * 0.25}}, {"ts_epoch": {"$lte": 1.7e9 + rows * 0.5}}]}, None),
+        ("contains", None, {"$contains": "powershell failed"}),
+    ]
+
+    print(f"\n{'query set':<12} {'store':<12} {'recall@k':>9} {'max |dd|':>10} {'ms/query':>9}")
+    recall = {}
+    try:
+        for label, where, where_document in cases:
+            ref_rows, ref_dist = exact_top_k(vecs, docs, metas, queries, k, where, where_document)
+            runs = [("chroma", chroma, None), ("local exact", local, sys.maxsize), ("local hnsw", local, 0)]
+            for name, store, min_rows in runs:
+                if min_rows is not None:
+                    local_vector_store.LOCAL_HNSW_MIN_ROWS = min_rows
+                res, ms = run_queries(store, case_id, queries, k, where, where_document)
+                r, dd = compare(ref_rows, ref_dist, res, ids)
+                recall[name] = min(recall.get(name, 1.0), r)
+                print(f"{label:<12} {name:<12} {r:>9.3f} {dd:>10.2e} {ms:>9.2f}")
+    finally:
+        chroma.delete_case(case_id)
+        local.delete_case(case_id)
+
+    # Exact local search must match the reference; the HNSW paths (Chroma's
+    # and ours) are approximate and are reported for comparison
+    print("\nworst recall@{}: {}".format(k, ", ".join(f"{n} {r:.3f}" for n, r in recall.items())))
+    sys.exit(0 if recall["local exact"] >= 0.99 else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+# tests/test_columnar_store.py
+# Columnar copies of the derivatives (api/columnar_store.py), read back by the timeline.
+import os
+
+import pytest
+
+pytest.importorskip("regipy")
+
+from api.columnar_store import columnar_path, open_columnar
+from api.registry_parser import iter_registry_derivatives
+from api.timeline import iter_derivative, timeline_files
+from api.timeline_store import build_timeline_store, query_timeline
+
+REG_HEADER = "Windows Registry Editor Version 5.00\r\n\r\n"
+RUN_KEY = r"[HKEY_LOCAL_MACHINE\SOFTWARE\Microsoft\Windows\CurrentVersion\Run]"
+
+
+def ingest_reg(tmp_path, name, body):
+    path = tmp_path / name
+    path.write_text(REG_HEADER + body, encoding="utf-16")
+    stats = {}
+    events = list(iter_registry_derivatives(str(path), str(tmp_path / "case"), stats))
+    return events, stats
+
+
+def test_empty_derivative(tmp_path, capsys):
+    empty, stats = ingest_reg(tmp_path, "NTUSER.reg", "")
+    assert empty == [] and stats["events_count"] == 0
+    events, _ = ingest_reg(tmp_path, "SOFTWARE.reg", RUN_KEY + '\r\n"Updater"="C:\\\\Temp\\\\u.exe"\r\n')
+    assert len(events) == 1
+
+    case_dir = str(tmp_path / "case")
+    empty_jsonl = os.path.join(case_dir, "artifacts", "registry", "NTUSER.jsonl")
+    assert os.path.exists(columnar_path(empty_jsonl))
+    pf = open_columnar(empty_jsonl)
+    assert pf is not None and pf.metadata.num_rows == 0
+    assert list(iter_derivative("registry", empty_jsonl)) == []
+
+    assert len(timeline_files(case_dir)) == 2
+    assert build_timeline_store(case_dir)["events"] == 1
+    assert "skipped" not in capsys.readouterr().out
+    timeline = query_timeline(case_dir, limit=10, rebuild=False)
+    assert [e["timestamp"] for e in timeline] == ["UNKNOWN_TIME"]
@@ -0,0 +1,214 @@
+# tests/test_local_vector_store.py
+# Parity of the local vector store (api/local_vector_store.py) with Chroma,
+# run against an in-process Chroma client instead of the HTTP service.
+import os
+import uuid
+import threading
+
+import numpy as np
+import pytest
+
+chromadb = pytest.importorskip("chromadb")
+
+from api import local_vector_store, vector_store
+from api.local_vector_store import LocalVectorStore, vector_index_path
+
+DIM = 16
+EVENT_IDS = [4624, 4625, 4688, 7045]
+WORDS = ["logon", "service", "powershell", "registry", "failed", "admin"]
+
+
+def corpus(n, seed=0, prefix="c"):
+    rng = np.random.default_rng(seed)
+    vecs = rng.normal(size=(n, DIM)).astype(np.float32)
+    ids, docs, metas = [], [], []
+    for i in range(n):
+        eid = EVENT_IDS[i % len(EVENT_IDS)]
+        ids.append(f"{prefix}{i}")
+        docs.append(f"EventID={eid} " + " ".join(rng.choice(WORDS, 3)))
+        metas.append({
+            "source": "evtx" if i % 5 else "registry",
+            "event_id": eid,
+            "ts_epoch": 1.7e9 + i,
+            "line": i,
+            "index_run": "run1",
+        })
+    return ids, docs, metas, vecs
+
+
+@pytest.fixture
+def stores(tmp_path, monkeypatch):
+    """(local, chroma, case_id): both stores empty for a fresh case."""
+    monkeypatch.setattr(local_vector_store, "ARTIFACT_DIR", str(tmp_path))
+    client = chromadb.EphemeralClient()
+    monkeypatch.setattr(vector_store, "_make_client", lambda: client)
+
+    case_id = uuid.uuid4().hex[:12]
+    # exact search on the Chroma side, so results can be compared row for row
+    client.get_or_create_collection(
+        name=f"case_{case_id}", metadata={"hnsw:space": "cosine", "hnsw:search_ef": 500}
+    )
+    local, chroma = LocalVectorStore(), vector_store.ChromaVectorStore()
+    yield local, chroma, case_id
+    local.forget_case(case_id)
+
+
+def upsert_both(stores, ids, docs, metas, vecs):
+    local, chroma, case_id = stores
+    for store in (local, chroma):
+        store.upsert(case_id, ids, docs, metas, vecs.tolist())
+
+
+def assert_same(stores, queries, k, where=None, where_document=None):
+    local, chroma, case_id = stores
+    got = local.query(case_id, queries.tolist(), k, where=where, where_document=where_document)
+    want = chroma.query(case_id, queries.tolist(), k, where=where, where_document=where_document)
+    assert got["ids"] == want["ids"]
+    assert got["documents"] == want["documents"]
+    assert got["metadatas"] == want["metadatas"]
+    for g, w in zip(got["distances"], want["distances"]):
+        np.testing.assert_allclose(g, w, atol=1e-4)
+    return got
+
+
+def test_add(stores):
+    ids, docs, metas, vecs = corpus(300)
+    upsert_both(stores, ids, docs, metas, vecs)
+    queries = corpus(8, seed=1)[3]
+    got = assert_same(stores, queries, 10)
+    assert all(len(row) == 10 for row in got["ids"])
+    assert stores[0].existing_ids(stores[2], ids[:5] + ["missing"]) == set(ids[:5])
+
+
+def test_add_hnsw(stores, monkeypatch):
+    monkeypatch.setattr(local_vector_store, "LOCAL_HNSW_MIN_ROWS", 1)
+    ids, docs, metas, vecs = corpus(300)
+    upsert_both(stores, ids, docs, metas, vecs)
+    assert_same(stores, corpus(8, seed=1)[3], 10)
+    assert stores[0].stats()["cases"][stores[2]]["hnsw"]
+
+
+def test_queries_run_alongside_writes(stores, monkeypatch):
+    monkeypatch.setattr(local_vector_store, "LOCAL_HNSW_MIN_ROWS", 100)
+    ids, docs, metas, vecs = corpus(400)
+    local, chroma, case_id = stores
+    local.upsert(case_id, ids[:100], docs[:100], metas[:100], vecs[:100].tolist())
+    queries = corpus(4, seed=10)[3].tolist()
+    errors = []
+
+    def search():
+        try:
+            for i in range(30):
+                local.query(case_id, queries, 5, where={"source": "evtx"} if i % 2 else None)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=search) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for start in range(100, 400, 20):
+        local.upsert(case_id, ids[start:start + 20], docs[start:start + 20], metas[start:start + 20],
+                     vecs[start:start + 20].tolist())
+    for t in threads:
+        t.join()
+    assert not errors
+    chroma.upsert(case_id, ids, docs, metas, vecs.tolist())
+    assert_same(stores, corpus(8, seed=11)[3], 10)
+    assert_same(stores, corpus(8, seed=11)[3], 10, where={"source": "evtx"})
+
+
+def test_upsert_replaces_vectors_documents_and_metadata(stores):
+    ids, docs, metas, vecs = corpus(200)
+    upsert_both(stores, ids, docs, metas, vecs)
+
+    _, new_docs, new_metas, new_vecs = corpus(50, seed=2)
+    new_metas = [dict(m, index_run="run2") for m in new_metas]
+    upsert_both(stores, ids[:50], new_docs, new_metas, new_vecs)
+    assert_same(stores, corpus(8, seed=3)[3], 10)
+    # a query equal to a replaced vector finds the replacement first
+    got = assert_same(stores, new_vecs[:3], 1)
+    assert got["ids"] == [[ids[0]], [ids[1]], [ids[2]]]
+
+    local, chroma, case_id = stores
+    for store in (local, chroma):
+        store.update_metadata(case_id, ids[50:60], [dict(m, index_run="run3") for m in metas[50:60]])
+    assert_same(stores, corpus(8, seed=4)[3], 20, where={"index_run": "run3"})
+
+
+def test_delete_by_prune(stores):
+    ids, docs, metas, vecs = corpus(300)
+    upsert_both(stores, ids, docs, metas, vecs)
+    local, chroma, case_id = stores
+
+    def keep(meta):
+        return meta.get("line", 0) % 3 != 0
+
+    removed = [store.prune(case_id, {"source": {"$in": ["evtx", "registry"]}}, keep) for store in (local, chroma)]
+    assert removed[0] == removed[1] == 100
+    got = assert_same(stores, corpus(8, seed=5)[3], 15)
+    assert not any(int(cid[1:]) % 3 == 0 for row in got["ids"] for cid in row)
+
+
+@pytest.mark.parametrize(
+    "where, where_document",
+    [
+        ({"source": "registry"}, None),
+        ({"event_id": {"$in": [4624, 7045]}}, None),
+        ({"$and": [{"source": "evtx"}, {"ts_epoch": {"$gte": 1.7e9 + 50}}, {"ts_epoch": {"$lte": 1.7e9 + 250}}]}, None),
+        ({"$and": [{"source": {"$in": ["evtx"]}}, {"event_id": 4688}]}, {"$contains": "admin"}),
+        (None, {"$contains": "powershell"}),
+        ({"event_id": 1}, None),
+    ],
+)
+def test_filtered_query(stores, where, where_document):
+    ids, docs, metas, vecs = corpus(300)
+    upsert_both(stores, ids, docs, metas, vecs)
+    assert_same(stores, corpus(6, seed=6)[3], 10, where=where, where_document=where_document)
+
+
+def test_filtered_query_after_metadata_changes(stores):
+    ids, docs, metas, vecs = corpus(200)
+    upsert_both(stores, ids, docs, metas, vecs)
+    queries = corpus(6, seed=7)[3]
+    where = {"source": "registry"}
+    assert_same(stores, queries, 10, where=where)  # builds the local "source" column
+
+    local, chroma, case_id = stores
+    for store in (local, chroma):
+        store.update_metadata(case_id, ids[:40], [dict(m, source="registry") for m in metas[:40]])
+    more_ids, more_docs, more_metas, more_vecs = corpus(40, seed=8, prefix="n")
+    upsert_both(stores, more_ids, more_docs, more_metas, more_vecs)
+    assert_same(stores, queries, 25, where=where)
+
+
+def test_replay_after_truncation(stores):
+    ids, docs, metas, vecs = corpus(250)
+    local, chroma, case_id = stores
+    upsert_both(stores, ids[:200], docs[:200], metas[:200], vecs[:200])
+    upsert_both(stores, ids[200:], docs[200:], metas[200:], vecs[200:])
+    local.forget_case(case_id)
+
+    # Crash while the last batch was written: its vectors reached vectors.bin,
+    # its log records only partly (the last line torn)
+    path = vector_index_path(os.path.join(local_vector_store.ARTIFACT_DIR, case_id))
+    log_path = os.path.join(path, "log.jsonl")
+    with open(log_path, "rb") as f:
+        lines = f.readlines()
+    with open(log_path, "wb") as f:
+        f.writelines(lines[:220])
+        f.write(lines[220][: len(lines[220]) // 2])
+    chroma.prune(case_id, {"source": {"$in": ["evtx", "registry"]}}, lambda m: m["line"] < 220)
+
+    reopened = LocalVectorStore()
+    try:
+        assert reopened.existing_ids(case_id, ids) == set(ids[:220])
+        queries = corpus(8, seed=9)[3]
+        assert_same((reopened, chroma, case_id), queries, 10)
+        assert_same((reopened, chroma, case_id), queries, 10, where={"event_id": 4625})
+
+        # the store keeps working after the replay: vectors.bin was cut back to the log
+        upsert_both((reopened, chroma, case_id), ids[220:], docs[220:], metas[220:], vecs[220:])
+        assert_same((reopened, chroma, case_id), queries, 10)
+        assert_same((reopened, chroma, case_id), vecs[240:243], 1)
+    finally:
+        reopened.forget_case(case_id)